@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Pootle.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import os
+os.environ['DJANGO_SETTINGS_MODULE'] = 'pootle.settings'
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+
+from pootle_store import checkqueue
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers', type='int', dest='workers', default=None,
+                    help="number of worker processes, defaults to QUALITYCHECK_WORKERS"),
+        make_option('--worker', action='store_true', dest='worker', default=False,
+                    help="keep running and check units as they get queued"),
+        )
+    help = "Run queued quality checks."
+
+    def handle_noargs(self, **options):
+        workers = options.get('workers', None)
+        if workers is None:
+            workers = settings.QUALITYCHECK_WORKERS
+        if options.get('worker', False):
+            checkqueue.run(workers)
+        else:
+            count = checkqueue.drain(workers)
+            print "%d units checked" % count
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Pootle.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import os
+os.environ['DJANGO_SETTINGS_MODULE'] = 'pootle.settings'
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from pootle_store import syncqueue
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+        make_option('--worker', action='store_true', dest='worker', default=False,
+                    help="keep running and write queued files to disk once per AUTOSYNC_INTERVAL"),
+        make_option('--stats', action='store_true', dest='stats', default=False,
+                    help="print queue depth and flush latency instead of flushing"),
+        )
+    help = "Write files queued by AUTOSYNC_INTERVAL to disk."
+
+    def handle_noargs(self, **options):
+        if options.get('stats', False):
+            stats = syncqueue.get_stats()
+            for key in sorted(stats):
+                print "%s: %s" % (key, stats[key])
+        elif options.get('worker', False):
+            syncqueue.run()
+        else:
+            # flush everything, including stores queued before a restart
+            count = syncqueue.flush(interval=0)
+            print "%d files written" % count
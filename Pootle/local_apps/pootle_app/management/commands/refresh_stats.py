@@ -21,7 +21,11 @@
 import os
 os.environ['DJANGO_SETTINGS_MODULE'] = 'pootle.settings'
 
+from django.conf import settings
+
 from pootle_app.management.commands import PootleCommand
+from pootle_misc.util import deletefromcache
+from pootle_store.models import QuickStats, SearchTrigram
 
 class Command(PootleCommand):
     help = "Allow stats and text indices to be refreshed manually."
@@ -30,13 +34,21 @@ class Command(PootleCommand):
         # This will force the indexer of a TranslationProject to be
         # initialized. The indexer will update the text index of the
         # TranslationProject if it is out of date.
-        translation_project.indexer
+        if settings.SEARCH_BACKEND == 'database':
+            SearchTrigram.objects.require_index(translation_project)
+        else:
+            translation_project.indexer
 
     def handle_all_stores(self, translation_project, **options):
+        # rebuild materialised stats of the whole translation project
+        # in bulk
+        translation_project.directory.refresh_quickstats()
         translation_project.getcompletestats()
         translation_project.getquickstats()
 
     def handle_store(self, store, **options):
+        QuickStats.objects.invalidate(store.pootle_path)
+        deletefromcache(store, ["getquickstats"])
         store.getcompletestats()
         store.getquickstats()
 
@@ -19,12 +19,19 @@
 # along with translate; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
-from django.db import models
+import logging
 
-from pootle_store.util import empty_quickstats, empty_completestats, statssum, completestatssum
-from pootle_store.models import Suggestion, Unit
+from django.db import models, IntegrityError
+from django.db.models.signals import pre_delete
 
-from pootle_misc.util import getfromcache, dictsum
+from translate.storage.base import ParseError
+
+from pootle_store.util import empty_quickstats, empty_completestats, completestatssum
+from pootle_store.util import calculate_stats_by_store, stats_from_groups, OBSOLETE
+from pootle_store.models import Suggestion, Unit, QuickStats, PARSED
+from pootle_store.models import invalidate_quickstats
+
+from pootle_misc.util import getfromcache, setincache, deletefromcache, dictsum
 from pootle_misc.aggregate import max_column
 from pootle_misc.baseurl import l
 
@@ -91,7 +98,7 @@ class Directory(models.Model):
     def _get_stores(self):
         """queryset with all descending stores"""
         from pootle_store.models import Store
-        return Store.object.filter(pootle_path__startswith=self.pootle_path)
+        return Store.objects.filter(pootle_path__startswith=self.pootle_path)
 
     stores = property(_get_stores)
 
@@ -105,6 +112,58 @@ class Directory(models.Model):
     def get_absolute_url(self):
         return l(self.pootle_path)
 
+    def require_units(self):
+        """makes sure all descending stores are parsed, returns the
+        pootle_paths of stores that failed to parse"""
+        failed = []
+        for store in self.stores.filter(state__lt=PARSED).iterator():
+            try:
+                store.require_units()
+                continue
+            except IntegrityError:
+                logging.info(u"Duplicate IDs in %s", store.abs_real_path)
+            except ParseError, e:
+                logging.info(u"Failed to parse %s\n%s", store.abs_real_path, e)
+            except (IOError, OSError), e:
+                logging.info(u"Can't access %s\n%s", store.abs_real_path, e)
+            failed.append(store.pootle_path)
+        return failed
+
+    def calculate_quickstats(self):
+        """calculate stats for this directory and all descending stores
+        and dirs with a single aggregate query, returns a dictionary
+        mapping pootle_paths to stats"""
+        failed = set(self.require_units())
+        store_stats = calculate_stats_by_store(
+            Unit.objects.filter(store__pootle_path__startswith=self.pootle_path,
+                                state__gt=OBSOLETE))
+
+        results = {}
+        for pootle_path in Directory.objects.filter(pootle_path__startswith=self.pootle_path) \
+                .values_list('pootle_path', flat=True).iterator():
+            if not pootle_path.startswith('/templates/') or self.is_template_project:
+                results[pootle_path] = dict(empty_quickstats)
+
+        for store_id, pootle_path in self.stores.values_list('id', 'pootle_path').iterator():
+            if pootle_path.startswith('/templates/') and not self.is_template_project:
+                continue
+            if pootle_path in failed:
+                stats = dict(empty_quickstats)
+                stats['errors'] += 1
+            else:
+                stats = store_stats.get(store_id) or stats_from_groups([])
+            results[pootle_path] = stats
+
+            # roll up to every ancestor directory inside the subtree
+            parent_path = pootle_path[:pootle_path.rfind('/') + 1]
+            while len(parent_path) >= len(self.pootle_path):
+                if parent_path in results:
+                    parent_stats = results[parent_path]
+                    for key, value in stats.iteritems():
+                        parent_stats[key] = parent_stats.get(key, 0) + value
+                parent_path = parent_path[:parent_path.rfind('/', 0, len(parent_path) - 1) + 1]
+        return results
+
     @getfromcache
     def getquickstats(self):
         """calculate aggregate stats for all directory based on stats
@@ -113,13 +172,27 @@ class Directory(models.Model):
             #FIXME: Hackish return empty_stats to avoid messing up
             # with project and language stats
             return empty_quickstats
-        #FIXME: can we replace this with a quicker path query?
-        file_result = statssum(self.child_stores.iterator())
-        dir_result  = statssum(self.child_dirs.iterator())
-        stats = dictsum(file_result, dir_result)
-        return stats
-
-        #return calculate_stats(Unit.objects.filter(store__pootle_path__startswith=self.pootle_path))
+        stats = QuickStats.objects.lookup(self.pootle_path)
+        if stats is not None:
+            result = dict(empty_quickstats)
+            result.update(stats)
+            return result
+        results = self.calculate_quickstats()
+        QuickStats.objects.materialise(results)
+        # prime the cache of descending stores and dirs so browsing
+        # the tree doesn't recalculate them one by one
+        setincache('getquickstats', results)
+        return results[self.pootle_path]
+
+    def refresh_quickstats(self):
+        """rebuild materialised stats of this directory and all
+        descending stores and dirs"""
+        QuickStats.objects.invalidate(self.pootle_path)
+        deletefromcache(self, ["getquickstats"])
+        results = self.calculate_quickstats()
+        QuickStats.objects.materialise(results)
+        setincache('getquickstats', results)
+        return results[self.pootle_path]
 
     @getfromcache
     def getcompletestats(self):
@@ -193,3 +266,5 @@ class Directory(models.Model):
         if translation_project:
             path_prefix = self.pootle_path[len(translation_project.pootle_path)-1:-1]
             return translation_project.real_path + path_prefix
+
+pre_delete.connect(invalidate_quickstats, sender=Directory)
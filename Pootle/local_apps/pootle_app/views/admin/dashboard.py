@@ -26,6 +26,7 @@ from django.utils.translation import ugettext as _
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.core.cache import cache
+from django.conf import settings
 from django.utils import simplejson
 
 from django.contrib.auth.models import User
@@ -36,6 +37,7 @@ from pootle_app.views.admin.util import user_is_admin
 from pootle_misc.aggregate import sum_column
 from pootle_app.models import Suggestion as SuggestiontStat
 from pootle_store.models import Unit, Suggestion
+from pootle_store import syncqueue
 from pootle_profile.models import PootleProfile
 from pootle_store.util import TRANSLATED
 from pootle_statistics.models import Submission
@@ -209,4 +211,6 @@ def view(request):
         'optional': optional_depcheck(),
         'optimal': optimal_depcheck(),
         }
+    if settings.AUTOSYNC and settings.AUTOSYNC_INTERVAL:
+        template_vars['sync_queue'] = syncqueue.get_stats()
     return render_to_response("admin/dashboard.html", template_vars, context_instance=RequestContext(request))
@@ -26,7 +26,7 @@ from django.utils.translation import ungettext
 
 from translate.storage import versioncontrol
 from pootle_app.models.permissions     import check_permission
-from pootle_store.models               import Store
+from pootle_store.models               import Store, PendingCheck
 from pootle_app.views.language         import dispatch
 from pootle_misc.util import add_percentages
 
@@ -87,6 +87,13 @@ def getcheckdetails(request, path_obj):
                              'text': checkname,
                              'stats': stats}
                 checklinks += [checklink]
+        pending = PendingCheck.objects.count_pending(path_obj.pootle_path)
+        if pending:
+            checklinks.insert(0, {'href': dispatch.translate(path_obj),
+                                  'text': _('Checks pending'),
+                                  'stats': ungettext('%d string waiting to be checked',
+                                                     '%d strings waiting to be checked',
+                                                     pending, pending)})
     except IOError:
         pass
     return checklinks
@@ -97,9 +97,11 @@ def get_view_units_dir(request, translation_project, dir_path):
     if dir_path:
         pootle_path = translation_project.pootle_path + dir_path
         units_query = Unit.objects.filter(store__pootle_path__startswith=pootle_path)
+        pathobj = Directory.objects.get(pootle_path=pootle_path)
     else:
         units_query = Unit.objects.filter(store__translation_project=translation_project)
-    return get_view_units(request, units_query)
+        pathobj = translation_project
+    return get_view_units(request, units_query, pathobj)
 
 
 ################################################################################
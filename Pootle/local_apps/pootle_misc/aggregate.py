@@ -47,6 +47,13 @@ try:
     def group_by_sort(queryset, column, fields):
         return queryset.annotate(count=Count(column)).order_by('-count').values('count', *fields)
 
+    def group_by_sum(queryset, fields, columns):
+        arg_dict = {'count': Count('id')}
+        for column in columns:
+            arg_dict[column] = Sum(column)
+        # clear default ordering, it would end up in the GROUP BY clause
+        return queryset.order_by().values(*fields).annotate(**arg_dict)
+
 except ImportError:
     # pure python alternative implementation of aggregate queries
 
@@ -76,6 +83,21 @@ except ImportError:
             result[item] += 1
         return result
 
+    def group_by_sum(queryset, fields, columns):
+        groups = {}
+        for item in queryset.values(*(list(fields) + list(columns))).iterator():
+            key = tuple(item[field] for field in fields)
+            if key not in groups:
+                groups[key] = dict((field, item[field]) for field in fields)
+                groups[key]['count'] = 0
+                for column in columns:
+                    groups[key][column] = 0
+            group = groups[key]
+            group['count'] += 1
+            for column in columns:
+                group[column] += item[column] or 0
+        return groups.values()
+
     def group_by_sort(queryset, column, fields):
         items = queryset.values('id', *fields).distinct()
         result = []
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Pootle.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""bulk database operations not supported by the Django ORM"""
+
+from django.db import connection, models, transaction
+
+# SQLite refuses statements with more than 999 parameters
+MAX_PARAMS = 999
+
+def bulk_insert(model, objects):
+    """insert model instances using multi-row INSERT statements instead
+    of one query per instance. the instances don't get their primary
+    keys set and no signals are sent."""
+    fields = [field for field in model._meta.local_fields
+              if not isinstance(field, models.AutoField)]
+    qn = connection.ops.quote_name
+    columns = ', '.join([qn(field.column) for field in fields])
+    row = '(%s)' % ', '.join(['%s'] * len(fields))
+    chunks = max(1, MAX_PARAMS // len(fields))
+    cursor = connection.cursor()
+    for i in xrange(0, len(objects), chunks):
+        chunk = objects[i:i+chunks]
+        params = []
+        for obj in chunk:
+            for field in fields:
+                value = field.pre_save(obj, True)
+                params.append(field.get_db_prep_save(value, connection=connection))
+        cursor.execute("INSERT INTO %s (%s) VALUES %s" % (qn(model._meta.db_table), columns,
+                                                           ', '.join([row] * len(chunk))), params)
+    transaction.commit_unless_managed()
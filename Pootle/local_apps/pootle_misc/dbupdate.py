@@ -163,7 +163,7 @@ def update_stats_21060():
     """ %_('Removing potentially incorrect cached stats, will be recalculated...')
     logging.info('flushing cached stats')
     for tp in TranslationProject.objects.filter(stores__unit__state=OBSOLETE).distinct().iterator():
-        deletefromcache(tp, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions"])
+        deletefromcache(tp, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions", "altsrcs_token"])
     return text
 
 def update_ts_tt_12008():
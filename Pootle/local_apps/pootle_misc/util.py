@@ -26,9 +26,12 @@ from django.core.paginator import Paginator
 from django.utils.encoding import iri_to_uri
 from django.http import HttpResponseBadRequest
 
+def cachekey(pootle_path, function_name):
+    return iri_to_uri(pootle_path + ":" + function_name)
+
 def getfromcache(function, timeout=settings.OBJECT_CACHE_TIMEOUT):
     def _getfromcache(instance, *args, **kwargs):
-        key = iri_to_uri(instance.pootle_path + ":" + function.__name__)
+        key = cachekey(instance.pootle_path, function.__name__)
         result = cache.get(key)
         if result is None:
             logging.debug(u"cache miss for %s", key)
@@ -37,6 +40,12 @@ def getfromcache(function, timeout=settings.OBJECT_CACHE_TIMEOUT):
         return result
     return _getfromcache
 
+def setincache(function_name, results, timeout=settings.OBJECT_CACHE_TIMEOUT):
+    """store precalculated results of a cached function, results is a
+    dictionary mapping pootle_paths to values"""
+    cache.set_many(dict((cachekey(pootle_path, function_name), result)
+                        for pootle_path, result in results.iteritems()), timeout)
+
 def deletefromcache(sender, functions, **kwargs):
     path = iri_to_uri(sender.pootle_path)
     path_parts = path.split("/")
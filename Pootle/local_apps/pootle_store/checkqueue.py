@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Pootle.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""asynchronous quality checks
+
+when settings.QUALITYCHECK_WORKERS is set, changed units are queued
+(PendingCheck) instead of being checked while saving. the
+drain_qualitychecks management command feeds the queue to a pool of
+worker processes, each job is a checker configuration plus a chunk of
+units, and writes the results back in batches."""
+
+import time
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.transaction import commit_on_success
+
+from translate.filters import checks
+
+from pootle_misc.bulk import bulk_insert
+from pootle_misc.util import deletefromcache
+from pootle_store.models import Unit, Store, QualityCheck, PendingCheck
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+BATCH_SIZE = 2000
+"""number of queued units read and written back at once"""
+CHUNK_SIZE = 100
+"""number of units sent to a worker in one job"""
+
+def filtererrorhandler(functionname, str1, str2, e):
+    logging.error(u"error in filter %s: %r, %r, %s", functionname, str1, str2, e)
+    return False
+
+def get_checker(checkstyle, languagecode, errorhandler=filtererrorhandler):
+    checkerclasses = [checks.projectcheckers.get(checkstyle, checks.StandardChecker),
+                      checks.StandardUnitChecker]
+    return checks.TeeChecker(checkerclasses=checkerclasses,
+                             errorhandler=errorhandler,
+                             languagecode=languagecode)
+
+_local = threading.local()
+
+def get_shared_checker(checkstyle, languagecode):
+    """returns a checker that is kept for later calls with the same
+    configuration (per thread, checkers aren't thread safe), so its
+    check plan is only built once"""
+    checkers = getattr(_local, 'checkers', None)
+    if checkers is None:
+        checkers = _local.checkers = {}
+    config = (checkstyle, languagecode)
+    checker = checkers.get(config)
+    if checker is None:
+        checker = checkers[config] = get_checker(checkstyle, languagecode)
+    return checker
+
+def run_checks(job):
+    """run quality checks over a chunk of units, returns a list of
+    (unit id, check name, message) tuples. runs in the worker
+    processes so results are returned rather than saved"""
+    config, units = job
+    checker = get_shared_checker(*config)
+    units = [unit for unit in units if unit.target]
+    results = []
+    for unit, failures in zip(units, checker.run_filters_batch(units)):
+        for name, message in failures.iteritems():
+            if name == 'isfuzzy':
+                continue
+            results.append((unit.id, name, message))
+    return results
+
+def make_jobs(units):
+    """group units by checker configuration and split them in chunks"""
+    store_ids = set(unit.store_id for unit in units)
+    configs = dict((store_id, (checkstyle, languagecode)) for store_id, checkstyle, languagecode in
+                   Store.objects.filter(id__in=store_ids).values_list(
+                       'id', 'translation_project__project__checkstyle',
+                       'translation_project__language__code'))
+    groups = {}
+    for unit in units:
+        groups.setdefault(configs[unit.store_id], []).append(unit)
+    for config, units in groups.iteritems():
+        for i in xrange(0, len(units), CHUNK_SIZE):
+            yield config, units[i:i+CHUNK_SIZE]
+
+@commit_on_success
+def write_results(entries, results):
+    """replace quality checks of checked units and remove them from
+    the queue unless they changed again while being checked"""
+    unit_ids = [unit_id for pk, unit_id, changes in entries]
+    QualityCheck.objects.filter(unit__in=unit_ids).delete()
+    bulk_insert(QualityCheck, [QualityCheck(unit_id=unit_id, name=name, message=message)
+                               for unit_id, name, message in results])
+    current = dict(PendingCheck.objects.filter(pk__in=[pk for pk, unit_id, changes in entries]) \
+                   .values_list('pk', 'changes'))
+    done = [pk for pk, unit_id, changes in entries if current.get(pk) == changes]
+    PendingCheck.objects.filter(pk__in=done).delete()
+
+def drain_batch(imap):
+    """check the oldest batch of queued units, returns the number of
+    units checked"""
+    entries = list(PendingCheck.objects.order_by('id').values_list('id', 'unit', 'changes')[:BATCH_SIZE])
+    if not entries:
+        return 0
+    units = list(Unit.objects.filter(id__in=[unit_id for pk, unit_id, changes in entries]))
+    results = []
+    for chunk in imap(run_checks, make_jobs(units)):
+        results.extend(chunk)
+    write_results(entries, results)
+    for store in Store.objects.filter(id__in=set(unit.store_id for unit in units)).iterator():
+        deletefromcache(store, ["getcompletestats"])
+    return len(entries)
+
+def drain(workers=None):
+    """check all queued units using a pool of worker processes,
+    returns the number of units checked"""
+    if workers is None:
+        workers = settings.QUALITYCHECK_WORKERS
+    pool = None
+    if workers > 1 and multiprocessing is not None:
+        # don't share the database connection with the workers
+        connection.close()
+        pool = multiprocessing.Pool(workers)
+        imap = pool.imap_unordered
+    else:
+        imap = map
+    try:
+        count = 0
+        while True:
+            checked = drain_batch(imap)
+            if not checked:
+                break
+            count += checked
+            logging.info(u"checked %d queued units", count)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return count
+
+def run(workers=None, poll=10):
+    """keep draining the queue, sleeping poll seconds whenever it is
+    empty"""
+    while True:
+        try:
+            drain(workers)
+        except Exception, e:
+            logging.error(u"failed to drain quality check queue:\n%s", e)
+        finally:
+            connection.close()
+        time.sleep(poll)
@@ -23,7 +23,10 @@ import logging
 import re
 import datetime
 
-from django.db import models, IntegrityError
+from django.db import models, IntegrityError, DatabaseError
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.core.signals import request_started
 from django.core.cache import cache
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
@@ -39,12 +42,14 @@ from translate.search import match
 from pootle.__version__ import sver as pootle_version
 
 from pootle_app.lib.util import RelatedManager
-from pootle_misc.util import getfromcache, deletefromcache
+from pootle_misc.util import getfromcache, deletefromcache, dictsum
+from pootle_misc.bulk import bulk_insert
 from pootle_misc.aggregate import group_by_count, max_column
 from pootle_misc.baseurl import l
 
 from pootle_store.fields  import TranslationStoreField, MultiStringField, PLURAL_PLACEHOLDER
 from pootle_store.util import calculate_stats, empty_quickstats
+from pootle_store.util import unit_stats, stats_delta, stats_paths, trigrams
 from pootle_store.util import OBSOLETE, UNTRANSLATED, FUZZY, TRANSLATED
 from pootle_store.filetypes import factory_classes, is_monolingual
 
@@ -107,6 +112,282 @@ class Suggestion(models.Model, base.TranslationUnit):
     _target = property(_get_target, _set_target)
     _source = property(lambda self: self.unit._source)
 
+############### Stats ###################
+
+class QuickStatsManager(models.Manager):
+    def lookup(self, pootle_path):
+        """materialised stats for pootle_path or None if they were
+        never calculated"""
+        try:
+            return self.get(pootle_path=pootle_path).get_stats()
+        except QuickStats.DoesNotExist:
+            return None
+
+    @commit_on_success
+    def materialise(self, results):
+        """store calculated stats, results is a dictionary mapping
+        pootle_paths to stats. stats with errors are not stored so
+        they get recalculated once the errors are fixed"""
+        results = dict((pootle_path, stats) for pootle_path, stats in results.iteritems()
+                       if not stats.get('errors', 0))
+        paths = results.keys()
+        chunks = 200
+        for i in xrange(0, len(paths), chunks):
+            self.filter(pootle_path__in=paths[i:i+chunks]).delete()
+        for pootle_path, stats in results.iteritems():
+            quickstats = QuickStats(pootle_path=pootle_path)
+            for field in QuickStats.stats_fields:
+                setattr(quickstats, field, stats.get(field, 0))
+            quickstats.save()
+
+    def apply_delta(self, pootle_path, delta):
+        """add delta to the materialised stats of pootle_path and all
+        directories containing it"""
+        if delta:
+            updates = dict((field, F(field) + value) for field, value in delta.iteritems())
+            self.filter(pootle_path__in=stats_paths(pootle_path)).update(**updates)
+
+    def invalidate(self, pootle_path):
+        """drop materialised stats of pootle_path, everything below it
+        and all directories containing it"""
+        self.filter(pootle_path__startswith=pootle_path).delete()
+        self.filter(pootle_path__in=stats_paths(pootle_path)).delete()
+
+class QuickStats(models.Model):
+    """materialised translation statistics of a store or directory,
+    kept up to date as units change"""
+    objects = QuickStatsManager()
+    stats_fields = ('total', 'totalsourcewords',
+                    'fuzzy', 'fuzzysourcewords',
+                    'untranslated', 'untranslatedsourcewords',
+                    'translated', 'translatedsourcewords', 'translatedtargetwords')
+
+    pootle_path = models.CharField(max_length=255, null=False, unique=True, db_index=True)
+    total = models.IntegerField(default=0)
+    totalsourcewords = models.IntegerField(default=0)
+    fuzzy = models.IntegerField(default=0)
+    fuzzysourcewords = models.IntegerField(default=0)
+    untranslated = models.IntegerField(default=0)
+    untranslatedsourcewords = models.IntegerField(default=0)
+    translated = models.IntegerField(default=0)
+    translatedsourcewords = models.IntegerField(default=0)
+    translatedtargetwords = models.IntegerField(default=0)
+
+    def __unicode__(self):
+        return self.pootle_path
+
+    def get_stats(self):
+        return dict((field, getattr(self, field)) for field in self.stats_fields)
+
+############### Sync queue ##############
+
+class PendingSyncManager(models.Manager):
+    def mark_dirty(self, store, profile=None):
+        """queue store to be written to disk, repeated changes to the
+        same store are coalesced into a single entry"""
+        updates = {'changes': F('changes') + 1}
+        if profile is not None:
+            updates['profile'] = profile
+        if self.filter(store=store).update(**updates):
+            return
+        try:
+            self.create(store=store, profile=profile)
+        except IntegrityError:
+            # somebody else queued it first
+            self.filter(store=store).update(**updates)
+
+    def due(self, interval=0):
+        """entries that have been dirty for at least interval seconds
+        and are not being flushed by another worker"""
+        now = datetime.datetime.now()
+        stale = now - datetime.timedelta(seconds=max(interval * 10, 600))
+        queryset = self.filter(dirty_since__lte=now - datetime.timedelta(seconds=interval))
+        return queryset.filter(models.Q(claimed=None) | models.Q(claimed__lt=stale)).order_by('dirty_since')
+
+    def claim(self, entry):
+        """mark entry as being flushed, returns False if another worker
+        got to it first"""
+        query = self.filter(pk=entry.pk)
+        if entry.claimed is None:
+            query = query.filter(claimed=None)
+        else:
+            query = query.filter(claimed=entry.claimed)
+        if query.update(claimed=datetime.datetime.now()) != 1:
+            return False
+        # changes made from now on need another flush
+        entry.changes = self.filter(pk=entry.pk).values_list('changes', flat=True)[0]
+        return True
+
+    def release(self, entry):
+        """remove flushed entry from the queue, if the store changed
+        again while it was being flushed it is requeued instead"""
+        if self.filter(pk=entry.pk, changes=entry.changes).update(changes=0):
+            self.filter(pk=entry.pk, changes=0).delete()
+        self.requeue(entry)
+
+    def requeue(self, entry):
+        """give up claim on entry, it will be flushed again once it is due"""
+        self.filter(pk=entry.pk).update(claimed=None, dirty_since=datetime.datetime.now())
+
+class PendingSync(models.Model):
+    """store with translations that still need to be written to disk"""
+    objects = PendingSyncManager()
+
+    store = models.ForeignKey('pootle_store.Store', unique=True, db_index=True)
+    profile = models.ForeignKey('pootle_profile.PootleProfile', null=True)
+    dirty_since = models.DateTimeField(auto_now_add=True, db_index=True)
+    changes = models.IntegerField(default=1)
+    claimed = models.DateTimeField(null=True)
+
+    def __unicode__(self):
+        return self.store.pootle_path
+
+############### Check queue #############
+
+class PendingCheckManager(models.Manager):
+    def queue_unit(self, unit):
+        """queue unit for the quality check workers, queueing a unit
+        that is already waiting makes sure it gets checked again"""
+        if self.filter(unit=unit).update(changes=F('changes') + 1):
+            return
+        try:
+            self.create(unit=unit)
+        except IntegrityError:
+            self.filter(unit=unit).update(changes=F('changes') + 1)
+
+    def queue_units(self, units):
+        """queue units that were just added for the quality check
+        workers"""
+        bulk_insert(PendingCheck, [PendingCheck(unit_id=unit.id) for unit in units])
+
+    @commit_on_success
+    def queue_store(self, store):
+        """queue all units of store for the quality check workers"""
+        self.filter(unit__store=store).delete()
+        bulk_insert(PendingCheck, [PendingCheck(unit_id=unit_id) for unit_id in
+                                   store.unit_set.values_list('id', flat=True).iterator()])
+
+    def count_pending(self, pootle_path):
+        """number of units in or below pootle_path waiting to be checked"""
+        if pootle_path.endswith('/'):
+            return self.filter(unit__store__pootle_path__startswith=pootle_path).count()
+        return self.filter(unit__store__pootle_path=pootle_path).count()
+
+class PendingCheck(models.Model):
+    """unit waiting for the quality check workers, see
+    pootle_store.checkqueue"""
+    objects = PendingCheckManager()
+
+    unit = models.ForeignKey('pootle_store.Unit', unique=True, db_index=True)
+    changes = models.IntegerField(default=1)
+
+    def __unicode__(self):
+        return unicode(self.unit_id)
+
+############### Search index ############
+
+class SearchTrigramManager(models.Manager):
+    # search fields and the unit fields they cover, with the code
+    # used to store their trigrams
+    search_fields = {
+        'source': (('s', 'source_f'),),
+        'target': (('t', 'target_f'),),
+        'notes': (('n', 'translator_comment'), ('d', 'developer_comment')),
+        'locations': (('l', 'locations'),),
+        }
+    max_query_trigrams = 8
+
+    def index_units(self, units):
+        """replace the trigrams of units, units must have database ids"""
+        units = list(units)
+        chunks = 200
+        for i in xrange(0, len(units), chunks):
+            self.filter(unit__in=[unit.id for unit in units[i:i+chunks]]).delete()
+        rows = []
+        for unit in units:
+            for fields in self.search_fields.itervalues():
+                for code, column in fields:
+                    for trigram in trigrams(getattr(unit, column)):
+                        rows.append(SearchTrigram(unit_id=unit.id, field=code, trigram=trigram))
+        bulk_insert(SearchTrigram, rows)
+
+    @commit_on_success
+    def require_index(self, translation_project):
+        """index all units of stores in translation_project that were
+        not indexed yet"""
+        stores = translation_project.stores.filter(state__gte=PARSED, indexedstore=None)
+        for store in stores.iterator():
+            self.index_units(store.unit_set.iterator())
+            IndexedStore.objects.mark(store)
+
+    def filter_word(self, queryset, column, code, word):
+        """narrow down queryset to units whose column contains word,
+        trigram lookups rule out most units before the substring
+        match"""
+        query_trigrams = []
+        word_l = word.lower()
+        for i in xrange(len(word_l) - 2):
+            trigram = word_l[i:i+3]
+            if trigram not in query_trigrams:
+                query_trigrams.append(trigram)
+        for trigram in query_trigrams[:self.max_query_trigrams]:
+            units = self.filter(field=code, trigram=trigram).values('unit')
+            queryset = queryset.filter(id__in=units)
+        return queryset.filter(**{column + '__icontains': word})
+
+    def search(self, queryset, words, fields):
+        """units in queryset containing all words in one of fields"""
+        result = queryset.none()
+        for field in fields:
+            for code, column in self.search_fields.get(field, ()):
+                subresult = queryset
+                for word in words:
+                    subresult = self.filter_word(subresult, column, code, word)
+                result = result | subresult
+        return result
+
+class SearchTrigram(models.Model):
+    """posting of a character trigram in a field of a unit, used by
+    the database search backend"""
+    objects = SearchTrigramManager()
+
+    unit = models.ForeignKey('pootle_store.Unit', db_index=True)
+    field = models.CharField(max_length=1)
+    trigram = models.CharField(max_length=3, db_index=True)
+
+class IndexedStoreManager(models.Manager):
+    # ids of the stores with a marker, markers are only added by
+    # require_index, so they are read from the database once per process
+    _marked = None
+
+    def mark(self, store):
+        """record that the units of store are in the database search index"""
+        self.create(store=store)
+        if self._marked is not None:
+            self._marked.add(store.id)
+
+    def invalidate(self, store_id):
+        """drop the marker of a store whose units changed while another
+        backend is in use"""
+        if self._marked is None:
+            self._marked = set(self.values_list('store', flat=True))
+        if store_id in self._marked:
+            self.filter(store=store_id).delete()
+            self._marked.discard(store_id)
+
+class IndexedStore(models.Model):
+    """store whose units are in the database search index, dropped
+    when one of its units changes while another backend is in use"""
+    objects = IndexedStoreManager()
+
+    store = models.OneToOneField('pootle_store.Store', db_index=True)
+
+class IndexerMtime(models.Model):
+    """mtime of a store when its units were last written to the search
+    index of its translation project, used by the indexer search backend"""
+    store = models.OneToOneField('pootle_store.Store', db_index=True)
+    mtime = models.DateTimeField(null=True)
+
 ############### Unit ####################
 
 def fix_monolingual(oldunit, newunit, monolingual=None):
@@ -181,8 +462,35 @@ class Unit(models.Model, base.TranslationUnit):
         self._rich_target = None
         self._target_updated = False
         self._encoding = 'UTF-8'
-
-    def save(self, *args, **kwargs):
+        if self.id is None:
+            # not in the database yet, doesn't count towards any stats
+            # and isn't in the search index
+            self._stats = {}
+            self._search_values = None
+        else:
+            self._stats = self.get_stats()
+            self._search_values = self.get_search_values()
+
+    def get_stats(self):
+        """translation statistics this unit contributes to its store"""
+        return unit_stats(self.state, self.source_wordcount, self.target_wordcount)
+
+    def get_search_values(self):
+        """the fields of this unit in the database search index"""
+        return tuple(getattr(self, column)
+                     for fields in SearchTrigramManager.search_fields.itervalues()
+                     for code, column in fields)
+
+    def update_stats(self):
+        """apply the change in this unit's statistics to materialised
+        store and directory stats"""
+        newstats = self.get_stats()
+        QuickStats.objects.apply_delta(self.store.pootle_path, stats_delta(self._stats, newstats))
+        self._stats = newstats
+
+    def update_fields(self):
+        """update hashes, wordcounts and state after source or target
+        changed"""
         if self._source_updated:
             # update source related fields
             self.source_hash = md5_f(self.source_f.encode("utf-8")).hexdigest()
@@ -199,18 +507,33 @@ class Unit(models.Model, base.TranslationUnit):
             elif self.state > FUZZY:
                 self.state = UNTRANSLATED
 
+    def save(self, *args, **kwargs):
+        self.update_fields()
         super(Unit, self).save(*args, **kwargs)
+        self.update_stats()
 
         if settings.AUTOSYNC and self.store.file and self.store.state >= PARSED and \
                (self._target_updated or self._source_updated):
-            #FIXME: last translator information is lost
-            self.sync(self.getorig())
-            self.store.update_store_header()
-            self.store.file.savestore()
+            if settings.AUTOSYNC_INTERVAL:
+                self.store.queue_sync()
+            else:
+                #FIXME: last translator information is lost
+                self.sync(self.getorig())
+                self.store.update_store_header()
+                self.store.file.savestore()
+
+        search_values = self.get_search_values()
+        if search_values != self._search_values:
+            self._search_values = search_values
+            if settings.SEARCH_BACKEND == 'database':
+                SearchTrigram.objects.index_units([self])
+            else:
+                # the trigrams are out of date now
+                IndexedStore.objects.invalidate(self.store_id)
 
         if self.store.state >= CHECKED and (self._source_updated or self._target_updated):
             #FIXME: are we sure only source and target affect quality checks?
-            self.update_qualitychecks()
+            self.schedule_qualitychecks()
 
         # done processing source/target update remove flag
         self._source_updated = False
@@ -222,7 +545,12 @@ class Unit(models.Model, base.TranslationUnit):
             #translation_project = store.translation_project
             #translation_project.update_index(translation_project.indexer, store, self.id)
             deletefromcache(store,
-                            ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions"])
+                            ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions", "altsrcs_token"])
+
+    def delete(self, *args, **kwargs):
+        super(Unit, self).delete(*args, **kwargs)
+        QuickStats.objects.apply_delta(self.store.pootle_path, stats_delta(self._stats, {}))
+        self._stats = {}
 
     def _get_source(self):
         return self.source_f
@@ -407,6 +735,14 @@ class Unit(models.Model, base.TranslationUnit):
                 continue
             self.qualitycheck_set.create(name=name, message=message)
 
+    def schedule_qualitychecks(self, created=False):
+        """leave the quality checks to the workers if there are any,
+        run them right away otherwise"""
+        if settings.QUALITYCHECK_WORKERS:
+            PendingCheck.objects.queue_unit(self)
+        else:
+            self.update_qualitychecks(created=created)
+
     def get_qualitychecks(self):
         return self.qualitycheck_set.filter(false_positive=False)
 
@@ -589,10 +925,13 @@ class Unit(models.Model, base.TranslationUnit):
         self.save()
         suggestion.delete()
         if settings.AUTOSYNC and self.file:
-            #FIXME: update alttrans
-            self.sync(self.getorig())
-            self.store.update_store_header(profile=suggestion.user)
-            self.file.savestore()
+            if settings.AUTOSYNC_INTERVAL:
+                self.store.queue_sync(profile=suggestion.user)
+            else:
+                #FIXME: update alttrans
+                self.sync(self.getorig())
+                self.store.update_store_header(profile=suggestion.user)
+                self.file.savestore()
         return True
 
     def reject_suggestion(self, suggid):
@@ -667,11 +1006,11 @@ class Store(models.Model, base.TranslationStore):
                 # update search index
                 #self.translation_project.update_index(self.translation_project.indexer, self)
             # new units, let's flush cache
-            deletefromcache(self, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions"])
+            deletefromcache(self, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions", "altsrcs_token"])
 
     def delete(self, *args, **kwargs):
         super(Store, self).delete(*args, **kwargs)
-        deletefromcache(self, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions"])
+        deletefromcache(self, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions", "altsrcs_token"])
 
     @getfromcache
     def get_mtime(self):
@@ -766,16 +1105,13 @@ class Store(models.Model, base.TranslationStore):
             self.state = LOCKED
             self.save()
             try:
-                for index, unit in enumerate(store.units):
-                    if unit.istranslatable():
-                        try:
-                            self.addunit(unit, index)
-                        except IntegrityError, e:
-                            logging.warning(u'Data integrity error while importing unit %s:\n%s', unit.getid(), e)
+                self.addunits_bulk((index, unit) for index, unit in enumerate(store.units)
+                                   if unit.istranslatable())
             except:
                 # something broke, delete any units that got created
                 # and return store state to its original value
                 self.unit_set.all().delete()
+                QuickStats.objects.invalidate(self.pootle_path)
                 self.state = oldstate
                 self.save()
                 raise
@@ -848,15 +1184,23 @@ class Store(models.Model, base.TranslationStore):
                         unit.save()
 
                 new_units = (store.findid(uid) for uid in new_ids - old_ids)
-                for unit in new_units:
-                    newunit = self.addunit(unit, unit.index)
-                    if fuzzy and not filter(None, newunit.target.strings):
-                        match_unit = newunit.fuzzy_translate(matcher)
-                        if match_unit:
-                            newunit.save()
-                            self._remove_obsolete(match_unit.source, store=store)
+                if fuzzy:
+                    for unit in new_units:
+                        newunit = self.addunit(unit, unit.index)
+                        if not filter(None, newunit.target.strings):
+                            match_unit = newunit.fuzzy_translate(matcher)
+                            if match_unit:
+                                newunit.save()
+                                self._remove_obsolete(match_unit.source, store=store)
+                        if oldstate >= CHECKED:
+                            newunit.schedule_qualitychecks(created=True)
+                else:
+                    newunits = self.addunits_bulk((unit.index, unit) for unit in new_units)
                     if oldstate >= CHECKED:
-                        newunit.update_qualitychecks(created=True)
+                        if settings.QUALITYCHECK_WORKERS:
+                            PendingCheck.objects.queue_units(newunits)
+                        else:
+                            self.addqualitychecks_bulk(newunits)
 
             if update_translation:
                 shared_dbids = [self.dbid_index.get(uid) for uid in old_ids & new_ids]
@@ -878,7 +1222,7 @@ class Store(models.Model, base.TranslationStore):
                         do_checks = unit._source_updated or unit._target_updated
                         unit.save()
                         if do_checks and oldstate >= CHECKED:
-                            unit.update_qualitychecks()
+                            unit.schedule_qualitychecks()
 
         finally:
             # unlock store
@@ -890,15 +1234,22 @@ class Store(models.Model, base.TranslationStore):
     def require_qualitychecks(self):
         """make sure quality checks are run"""
         if self.state < CHECKED:
-            self.update_qualitychecks()
+            if settings.QUALITYCHECK_WORKERS:
+                # leave the actual checking to the workers, stats
+                # report the units as pending until they are done
+                PendingCheck.objects.queue_store(self)
+                self.state = CHECKED
+                self.save()
+            else:
+                self.update_qualitychecks()
             # new qualitychecks, let's flush cache
             deletefromcache(self, ["getcompletestats"])
 
     @commit_on_success
     def update_qualitychecks(self):
         logging.debug(u"Updating quality checks for %s", self.pootle_path)
-        for unit in self.units.iterator():
-            unit.update_qualitychecks()
+        QualityCheck.objects.filter(unit__store=self).delete()
+        self.addqualitychecks_bulk(self.units.iterator())
 
         if self.state < CHECKED:
             self.state = CHECKED
@@ -974,6 +1325,12 @@ class Store(models.Model, base.TranslationStore):
 
         cache.set(key, self.get_mtime(), settings.OBJECT_CACHE_TIMEOUT)
 
+    def queue_sync(self, profile=None):
+        """write translations to disk later, see pootle_store.syncqueue"""
+        PendingSync.objects.mark_dirty(self, profile)
+        from pootle_store import syncqueue
+        syncqueue.start_worker()
+
     def get_file_class(self):
         try:
             return self.translation_project.project.get_file_class()
@@ -1044,6 +1401,69 @@ class Store(models.Model, base.TranslationStore):
             self._units.append(newunit)
         return newunit
 
+    def addunits_bulk(self, indexedunits):
+        """add the given (index, unit) pairs using multi-row inserts,
+        returns the new units with their database ids"""
+        newunits = []
+        alttransunits = []
+        unitid_hashes = set()
+        stats = {}
+        for index, unit in indexedunits:
+            if hasattr(unit, 'getalttrans') and unit.getalttrans():
+                # alternative translations become suggestions, which
+                # need the unit to be saved first
+                alttransunits.append((index, unit))
+                continue
+            newunit = Unit(store=self, index=index)
+            newunit.update(unit)
+            newunit.update_fields()
+            if newunit.unitid_hash in unitid_hashes:
+                logging.warning(u'Data integrity error while importing unit %s:\nduplicate unit id', unit.getid())
+                continue
+            unitid_hashes.add(newunit.unitid_hash)
+            newunits.append(newunit)
+            stats = dictsum(stats, newunit.get_stats())
+
+        bulk_insert(Unit, newunits)
+        QuickStats.objects.apply_delta(self.pootle_path, stats)
+
+        # fetch the ids of the inserted units
+        hashes = [unit.unitid_hash for unit in newunits]
+        dbids = {}
+        chunks = 200
+        for i in xrange(0, len(hashes), chunks):
+            dbids.update(self.unit_set.filter(unitid_hash__in=hashes[i:i+chunks]).values_list('unitid_hash', 'id'))
+        for unit in newunits:
+            unit.id = dbids[unit.unitid_hash]
+            unit._stats = unit.get_stats()
+            unit._search_values = unit.get_search_values()
+            unit._source_updated = False
+            unit._target_updated = False
+        if settings.SEARCH_BACKEND == 'database':
+            SearchTrigram.objects.index_units(newunits)
+        else:
+            IndexedStore.objects.invalidate(self.id)
+
+        for index, unit in alttransunits:
+            try:
+                newunits.append(self.addunit(unit, index))
+            except IntegrityError, e:
+                logging.warning(u'Data integrity error while importing unit %s:\n%s', unit.getid(), e)
+        return newunits
+
+    def addqualitychecks_bulk(self, units):
+        """run quality checks on units and insert the results using
+        multi-row inserts"""
+        checker = self.translation_project.checker
+        units = [unit for unit in units if unit.target]
+        checks = []
+        for unit, failures in zip(units, checker.run_filters_batch(units)):
+            for name, message in failures.iteritems():
+                if name == 'isfuzzy':
+                    continue
+                checks.append(QualityCheck(unit_id=unit.id, name=name, message=message))
+        bulk_insert(QualityCheck, checks)
+
     def findunits(self, source, obsolete=False):
         if not obsolete and hasattr(self, "sourceindex"):
             return super(Store, self).findunits(source)
@@ -1093,8 +1513,13 @@ class Store(models.Model, base.TranslationStore):
     @getfromcache
     def getquickstats(self):
         """calculate translation statistics"""
+        stats = QuickStats.objects.lookup(self.pootle_path)
+        if stats is not None:
+            return stats
         try:
-            return calculate_stats(self.units)
+            stats = calculate_stats(self.units)
+            QuickStats.objects.materialise({self.pootle_path: stats})
+            return stats
         except IntegrityError:
             logging.info(u"Duplicate IDs in %s", self.abs_real_path)
         except base.ParseError, e:
@@ -1173,7 +1598,7 @@ class Store(models.Model, base.TranslationStore):
                 for unit in new_units:
                     newunit = self.addunit(unit)
                     if oldstate >= CHECKED:
-                        newunit.update_qualitychecks(created=True)
+                        newunit.schedule_qualitychecks(created=True)
 
 
             if obsoletemissing:
@@ -1200,7 +1625,7 @@ class Store(models.Model, base.TranslationStore):
                             do_checks = oldunit._source_updated or oldunit._target_updated
                             oldunit.save()
                             if do_checks and oldstate >= CHECKED:
-                                oldunit.update_qualitychecks()
+                                oldunit.schedule_qualitychecks()
 
             if allownewstrings or obsoletemissing:
                 self.sync(update_structure=True, update_translation=True, conservative=False, create=False, profile=profile)
@@ -1309,3 +1734,26 @@ class Store(models.Model, base.TranslationStore):
             except PootleProfile.DoesNotExist:
                 pass
         return None
+
+def invalidate_quickstats(sender, instance, **kwargs):
+    QuickStats.objects.invalidate(instance.pootle_path)
+
+pre_delete.connect(invalidate_quickstats, sender=Store)
+
+def resume_sync_queue(sender, **kwargs):
+    """start the sync worker on the first request of the process if
+    stores were left queued by a previous one"""
+    if not (settings.AUTOSYNC and settings.AUTOSYNC_INTERVAL and settings.AUTOSYNC_WORKER):
+        request_started.disconnect(resume_sync_queue)
+        return
+    try:
+        pending = PendingSync.objects.exists()
+    except DatabaseError:
+        # database not installed yet, try again on the next request
+        return
+    request_started.disconnect(resume_sync_queue)
+    if pending:
+        from pootle_store import syncqueue
+        syncqueue.start_worker()
+
+request_started.connect(resume_sync_queue)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Pootle.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""write-behind queue for AUTOSYNC
+
+when settings.AUTOSYNC_INTERVAL is set, saving a unit only marks its
+store as dirty, the dirty set lives in the database (PendingSync) so it
+survives restarts. dirty stores are written to disk at most once per
+interval by a background thread in each server process (started by
+the first change, or by the first request if stores are still queued)
+or, with settings.AUTOSYNC_WORKER turned off, by running the
+flush_sync_queue management command as a worker."""
+
+import time
+import logging
+import datetime
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Min
+
+from pootle_store.models import PendingSync
+
+STATS_KEY = "pootle_store:syncqueue"
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def _record_flush(latency, duration):
+    stats = cache.get(STATS_KEY) or {'flushed': 0, 'total_latency': 0.0, 'max_latency': 0.0}
+    stats['flushed'] += 1
+    stats['total_latency'] += latency
+    stats['max_latency'] = max(stats['max_latency'], latency)
+    stats['last_latency'] = latency
+    stats['last_duration'] = duration
+    stats['last_flush'] = datetime.datetime.now()
+    cache.set(STATS_KEY, stats, settings.OBJECT_CACHE_TIMEOUT)
+
+def flush_entry(entry):
+    """write a single queued store to disk, returns False if another
+    worker is already flushing it or syncing failed"""
+    if not PendingSync.objects.claim(entry):
+        return False
+    start = time.time()
+    store = entry.store
+    try:
+        store.sync(update_translation=True, conservative=False, profile=entry.profile)
+    except Exception, e:
+        logging.error(u"failed to sync %s:\n%s", store.pootle_path, e)
+        PendingSync.objects.requeue(entry)
+        return False
+    PendingSync.objects.release(entry)
+    now = time.time()
+    dirty_since = time.mktime(entry.dirty_since.timetuple())
+    _record_flush(max(now - dirty_since, 0.0), now - start)
+    return True
+
+def flush(interval=None):
+    """write all stores that have been dirty for at least interval
+    seconds to disk, returns the number of stores written"""
+    if interval is None:
+        interval = settings.AUTOSYNC_INTERVAL
+    entries = list(PendingSync.objects.due(interval).select_related('store', 'profile'))
+    count = 0
+    for entry in entries:
+        if flush_entry(entry):
+            count += 1
+    return count
+
+def get_stats():
+    """queue depth and flush latency in seconds
+
+    depth and oldest come from the database, the flush counters are
+    kept in the cache by whichever process did the flushing"""
+    stats = {'flushed': 0, 'average_latency': None, 'max_latency': None,
+             'last_latency': None, 'last_duration': None, 'last_flush': None}
+    recorded = cache.get(STATS_KEY)
+    if recorded:
+        stats.update(recorded)
+        stats['average_latency'] = recorded['total_latency'] / recorded['flushed']
+        del stats['total_latency']
+    stats['depth'] = PendingSync.objects.count()
+    oldest = PendingSync.objects.aggregate(oldest=Min('dirty_since'))['oldest']
+    if oldest is not None:
+        delta = datetime.datetime.now() - oldest
+        stats['oldest'] = max(delta.days * 86400 + delta.seconds, 0)
+    else:
+        stats['oldest'] = None
+    return stats
+
+def run(interval=None):
+    """flush due stores forever, polls a few times per interval so no
+    store waits much longer than interval"""
+    if interval is None:
+        interval = settings.AUTOSYNC_INTERVAL
+    poll = max(interval / 4.0, 1)
+    while True:
+        try:
+            flush(interval)
+        except Exception, e:
+            logging.error(u"failed to flush sync queue:\n%s", e)
+        finally:
+            # don't hold on to a connection between polls
+            connection.close()
+        time.sleep(poll)
+
+def start_worker():
+    """start the background flushing thread of this process if it is
+    not running yet"""
+    global _worker
+    if not settings.AUTOSYNC_WORKER:
+        return
+    if _worker is not None and _worker.isAlive():
+        return
+    _worker_lock.acquire()
+    try:
+        if _worker is None or not _worker.isAlive():
+            _worker = threading.Thread(target=run, name="pootle-syncqueue")
+            _worker.setDaemon(True)
+            _worker.start()
+    finally:
+        _worker_lock.release()
@@ -18,33 +18,91 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import time
+
 from django.utils.safestring import mark_safe
 
 from django import template
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import ugettext as _
 from django.core.exceptions import  ObjectDoesNotExist
 from django.template.loaders.app_directories import load_template_source
 
 from pootle_store.fields import list_empty
-from pootle_store.models import Unit
+from pootle_store.models import Store, Unit
 from pootle_store.util import TRANSLATED
 from pootle_misc.templatetags.cleanhtml import fancy_escape
-from pootle_misc.util import add_percentages
+from pootle_misc.util import add_percentages, cachekey
 from pootle_misc.templatetags.cleanhtml import fancy_highlight
 
 from translate.misc.multistring import multistring
 
 register = template.Library()
 
+def _altsrcs_query(alt_src_langs, project):
+    return Unit.objects.filter(store__translation_project__project=project,
+                               store__translation_project__language__in=alt_src_langs,
+                               state=TRANSLATED).select_related('store', 'store__translation_project', 'store__translation_project__language')
+
+def _altsrcs_key_prefix(alt_src_langs, project):
+    """cache keys of alternative source units change with the languages
+    and with the token of their translation projects, which is deleted
+    from the cache with get_mtime whenever one of their units changes"""
+    keys = [cachekey("/%s/%s/" % (lang.code, project.code), "altsrcs_token") for lang in alt_src_langs]
+    tokens = cache.get_many(keys)
+    missing = dict((key, time.time()) for key in keys if key not in tokens)
+    if missing:
+        cache.set_many(missing, settings.OBJECT_CACHE_TIMEOUT)
+        tokens.update(missing)
+    return "altsrcs:%s" % str(hash((project.code, tuple(sorted(tokens.items())))))
+
+def _altsrcs_key(prefix, unit, store_name):
+    """nongnu projects only use units from stores with the same name"""
+    if store_name is not None:
+        return "%s:%s:%s" % (prefix, unit.unitid_hash, str(hash(store_name)))
+    return "%s:%s" % (prefix, unit.unitid_hash)
+
+def prefetch_altsrcs(units, alt_src_langs, project):
+    """look up the alternative source units of a whole page of units with
+    one query and cache them for L{find_altsrcs}"""
+    if not units or not alt_src_langs:
+        return
+    prefix = _altsrcs_key_prefix(alt_src_langs, project)
+    if project.get_treestyle() == 'nongnu':
+        store_names = dict(Store.objects.filter(id__in=set(unit.store_id for unit in units)).values_list('id', 'name'))
+    else:
+        store_names = {}
+    keys = dict((_altsrcs_key(prefix, unit, store_names.get(unit.store_id, None)), unit) for unit in units)
+    missing = set(keys) - set(cache.get_many(keys.keys()))
+    if not missing:
+        return
+
+    results = dict((key, []) for key in missing)
+    hashes = set(keys[key].unitid_hash for key in missing)
+    for altunit in _altsrcs_query(alt_src_langs, project).filter(unitid_hash__in=hashes).iterator():
+        if store_names:
+            key = _altsrcs_key(prefix, altunit, altunit.store.name)
+        else:
+            key = _altsrcs_key(prefix, altunit, None)
+        if key in results:
+            results[key].append(altunit)
+    cache.set_many(results, settings.OBJECT_CACHE_TIMEOUT)
+
 def find_altsrcs(unit, alt_src_langs, store=None, project=None):
     store = store or unit.store
     project = project or store.translation_project.project
-    altsrcs = Unit.objects.filter(unitid_hash=unit.unitid_hash,
-                                 store__translation_project__project=project,
-                                 store__translation_project__language__in=alt_src_langs,
-                                 state=TRANSLATED).select_related('store', 'store__translation_project', 'store__translation_project__language')
-    if project.get_treestyle() == 'nongnu':
-        altsrcs = altsrcs.filter(store__name=store.name)
+    if not alt_src_langs:
+        return []
+    nongnu = project.get_treestyle() == 'nongnu'
+    key = _altsrcs_key(_altsrcs_key_prefix(alt_src_langs, project), unit, nongnu and store.name or None)
+    altsrcs = cache.get(key)
+    if altsrcs is None:
+        altsrcs = _altsrcs_query(alt_src_langs, project).filter(unitid_hash=unit.unitid_hash)
+        if nongnu:
+            altsrcs = altsrcs.filter(store__name=store.name)
+        altsrcs = list(altsrcs)
+        cache.set(key, altsrcs, settings.OBJECT_CACHE_TIMEOUT)
     return altsrcs
 
 def call_highlight(old, new):
@@ -17,6 +17,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
+import os
 import time
 
 from django.utils import simplejson
@@ -25,7 +26,17 @@ from translate.storage import factory
 from translate.storage import statsdb
 
 from pootle.tests import PootleTestCase
-from pootle_store.models import Store, Unit
+from django.conf import settings
+
+from pootle_store.models import Store, Unit, QuickStats, QualityCheck, PendingSync, PendingCheck
+from pootle_store.models import PARSED, SearchTrigram, IndexedStore, resume_sync_queue
+from pootle_translationproject.forms import SearchForm
+from pootle_store.views import get_non_indexed_search_step_query
+from pootle_store import syncqueue, checkqueue
+from pootle_store.templatetags.store_tags import find_altsrcs, prefetch_altsrcs
+from pootle_language.models import Language
+from pootle_translationproject.models import TranslationProject
+from pootle_store.util import calculate_stats, statssum, empty_quickstats
 
 class UnitTests(PootleTestCase):
     def setUp(self):
@@ -151,6 +162,226 @@ class StoreTests(PootleTestCase):
         self.assertEqual(dbstats['translatedsourcewords'], filestats['translatedsourcewords'])
         self.assertEqual(dbstats['translatedtargetwords'], filestats['translatedtargetwords'])
 
+    def test_directory_quickstats(self):
+        directory = self.store.parent
+        stats = directory.calculate_quickstats()
+        expected = statssum(directory.stores.iterator(), dict(empty_quickstats))
+
+        self.assertEqual(stats[directory.pootle_path], expected)
+        for store in directory.stores.iterator():
+            self.assertEqual(stats[store.pootle_path], calculate_stats(store.units))
+
+    def test_materialised_quickstats(self):
+        directory = self.store.parent
+        directory.refresh_quickstats()
+
+        unit = self.store.units.filter(state=0)[0]
+        unit.target = u'samaka'
+        unit.save()
+        unit = self.store.units.filter(state=200)[0]
+        unit.markfuzzy()
+        unit.save()
+        self.store.units.filter(state=200)[0].delete()
+
+        self.assertEqual(QuickStats.objects.lookup(self.store.pootle_path),
+                         calculate_stats(self.store.units))
+        expected = directory.calculate_quickstats()[directory.pootle_path]
+        del expected['errors'], expected['review']
+        self.assertEqual(QuickStats.objects.lookup(directory.pootle_path), expected)
+
+    def test_parse_bulk(self):
+        """units imported in bulk match units added one by one"""
+        self.store.require_units()
+        dbunits = dict((unit.unitid_hash, unit) for unit in self.store.unit_set.all())
+        count = 0
+        for index, unit in enumerate(self.store.file.store.units):
+            if not unit.istranslatable():
+                continue
+            count += 1
+            newunit = Unit(store=self.store, index=index)
+            newunit.update(unit)
+            newunit.update_fields()
+            dbunit = dbunits[newunit.unitid_hash]
+            for field in ('index', 'unitid', 'source_f', 'source_hash', 'source_wordcount',
+                          'source_length', 'target_f', 'target_wordcount', 'target_length',
+                          'developer_comment', 'translator_comment', 'locations',
+                          'context', 'state'):
+                self.assertEqual(getattr(dbunit, field), getattr(newunit, field))
+        self.assertEqual(len(dbunits), count)
+
+    def test_qualitychecks_bulk(self):
+        """quality checks inserted in bulk match checks run one by one"""
+        for unit in self.store.units[:10]:
+            unit.target = u"  samaka %s" % unit.source
+            unit.save()
+        self.store.require_qualitychecks()
+        checks = QualityCheck.objects.filter(unit__store=self.store)
+        bulk = sorted(checks.values_list('unit', 'name', 'message'))
+        for unit in self.store.units.iterator():
+            unit.update_qualitychecks()
+        self.assertEqual(sorted(checks.values_list('unit', 'name', 'message')), bulk)
+        self.assertNotEqual(bulk, [])
+
+    def test_check_queue(self):
+        """queued quality checks match checks run while saving"""
+        for unit in self.store.units[:10]:
+            unit.target = u"  samaka %s" % unit.source
+            unit.save()
+        self.store.require_qualitychecks()
+        checks = QualityCheck.objects.filter(unit__store=self.store)
+        expected = sorted(checks.values_list('unit', 'name', 'message'))
+
+        saved = settings.QUALITYCHECK_WORKERS
+        settings.QUALITYCHECK_WORKERS = 1
+        try:
+            checks.delete()
+            self.store.state = PARSED
+            self.store.save()
+            self.store.getcompletestats()
+            self.assertEqual(PendingCheck.objects.count_pending(self.store.pootle_path),
+                             self.store.unit_set.count())
+            self.assertEqual(checks.count(), 0)
+
+            unit = self.store.units[0]
+            unit.target = u"  samaka tena"
+            unit.save()
+            self.assertEqual(PendingCheck.objects.get(unit=unit).changes, 2)
+
+            checkqueue.drain(workers=0)
+            self.assertEqual(PendingCheck.objects.count_pending(self.store.parent.pootle_path), 0)
+            unit.target = u"  samaka %s" % unit.source
+            unit.save()
+            checkqueue.drain(workers=0)
+            self.assertEqual(sorted(checks.values_list('unit', 'name', 'message')), expected)
+
+            # units added or changed by updating from the file are queued too
+            newstore = factory.getobject(self.store.file.path)
+            newstore.findid(unit.getid()).target = u"  samaka tena"
+            newunit = newstore.addsourceunit(u"samaka mpya")
+            newunit.target = u"  samaka mpya"
+            newstore.makeindex()
+            self.store.update(update_structure=True, update_translation=True, conservative=False,
+                              store=newstore)
+            dbunit = self.store.unit_set.get(unitid=u"samaka mpya")
+            for queued in (unit, dbunit):
+                self.assertTrue(PendingCheck.objects.filter(unit=queued).exists())
+            self.assertEqual(QualityCheck.objects.filter(unit=dbunit).count(), 0)
+        finally:
+            settings.QUALITYCHECK_WORKERS = saved
+
+    def test_altsrcs(self):
+        pofile = open(os.path.join(self.testpodir, "tutorial", "ar", "pootle.po"), 'w')
+        pofile.write('#: test.c\nmsgid "test"\nmsgstr "arest"\n')
+        pofile.close()
+        ar_tp = TranslationProject.objects.get(pootle_path='/ar/tutorial/')
+        ar_tp.scan_files()
+        ar_tp.require_units()
+
+        project = self.store.translation_project.project
+        alt_src_langs = Language.objects.filter(code='ar')
+        units = list(self.store.units)
+        prefetch_altsrcs(units, alt_src_langs, project)
+        unit = self.store.findunit("test")
+        altsrcs = find_altsrcs(unit, alt_src_langs, store=self.store, project=project)
+        self.assertEqual([altunit.target for altunit in altsrcs], [u"arest"])
+        self.assertEqual(altsrcs[0].store.translation_project.language.code, 'ar')
+        self.assertEqual(find_altsrcs(self.store.findunit("fish"), alt_src_langs,
+                                      store=self.store, project=project), [])
+
+        # changing a unit of the translation project invalidates the cache
+        arunit = altsrcs[0]
+        arunit.target = u"arest2"
+        arunit.save()
+        altsrcs = find_altsrcs(unit, alt_src_langs, store=self.store, project=project)
+        self.assertEqual([altunit.target for altunit in altsrcs], [u"arest2"])
+
+    def test_database_search(self):
+        """trigram index finds the same units as scanning the database"""
+        saved = settings.SEARCH_BACKEND
+        settings.SEARCH_BACKEND = 'database'
+        try:
+            translation_project = self.store.translation_project
+            self.store.require_units()
+            SearchTrigram.objects.require_index(translation_project)
+            units = self.store.units
+            for search in (u"the", u"Pootle", u"on is", u"a", u"samaka", u"zzzz"):
+                for sfields in (['source'], ['target'], ['source', 'notes', 'locations']):
+                    form = SearchForm({'search': search, 'sfields': sfields})
+                    self.assertTrue(form.is_valid())
+                    expected = get_non_indexed_search_step_query(form, units)
+                    actual = SearchTrigram.objects.search(units, search.split(), sfields)
+                    self.assertEqual(sorted(actual.values_list('id', flat=True)),
+                                     sorted(expected.values_list('id', flat=True)))
+
+            unit = units[0]
+            unit.target = u"samaka"
+            unit.save()
+            found = SearchTrigram.objects.search(units, [u"SAMAK"], ['target'])
+            self.assertEqual(list(found.values_list('id', flat=True)), [unit.id])
+
+            # changes made while another backend is in use are indexed
+            # once the database backend is back
+            settings.SEARCH_BACKEND = 'indexer'
+            unit.target = u"arraina"
+            unit.save()
+            settings.SEARCH_BACKEND = 'database'
+            SearchTrigram.objects.require_index(translation_project)
+            found = SearchTrigram.objects.search(units, [u"arraina"], ['target'])
+            self.assertEqual(list(found.values_list('id', flat=True)), [unit.id])
+
+            # saves that don't change the indexed fields leave the index
+            # and the marker of the store alone
+            SearchTrigram.objects.filter(unit=unit).delete()
+            unit.save()
+            self.assertFalse(SearchTrigram.objects.filter(unit=unit).exists())
+            settings.SEARCH_BACKEND = 'indexer'
+            unit.save()
+            self.assertTrue(IndexedStore.objects.filter(store=self.store).exists())
+        finally:
+            settings.SEARCH_BACKEND = saved
+
+    def test_sync_queue(self):
+        """with AUTOSYNC_INTERVAL changes are coalesced and written later"""
+        saved = settings.AUTOSYNC, settings.AUTOSYNC_INTERVAL, settings.AUTOSYNC_WORKER
+        settings.AUTOSYNC, settings.AUTOSYNC_INTERVAL, settings.AUTOSYNC_WORKER = True, 3600, False
+        try:
+            self.store.require_units()
+            units = self.store.units[:2]
+            for unit in units:
+                unit.target = u"samaka %s" % unit.source
+                unit.save()
+            self.assertEqual(PendingSync.objects.get(store=self.store).changes, 2)
+            self.assertEqual(syncqueue.flush(), 0)
+            self.assertEqual(syncqueue.get_stats()['depth'], 1)
+
+            self.assertEqual(syncqueue.flush(interval=0), 1)
+            self.assertEqual(PendingSync.objects.count(), 0)
+            filestore = factory.getobject(self.store.file.path)
+            for unit in units:
+                self.assertEqual(filestore.findid(unit.getid()).target, unit.target)
+            stats = syncqueue.get_stats()
+            self.assertEqual(stats['depth'], 0)
+            self.assertTrue(stats['flushed'] >= 1)
+        finally:
+            settings.AUTOSYNC, settings.AUTOSYNC_INTERVAL, settings.AUTOSYNC_WORKER = saved
+
+    def test_sync_queue_resume(self):
+        """stores left queued by a previous process start the worker"""
+        saved = settings.AUTOSYNC, settings.AUTOSYNC_INTERVAL, settings.AUTOSYNC_WORKER
+        settings.AUTOSYNC, settings.AUTOSYNC_INTERVAL, settings.AUTOSYNC_WORKER = True, 3600, True
+        started = []
+        start_worker = syncqueue.start_worker
+        syncqueue.start_worker = lambda: started.append(True)
+        try:
+            resume_sync_queue(None)
+            self.assertEqual(started, [])
+            PendingSync.objects.mark_dirty(self.store)
+            resume_sync_queue(None)
+            self.assertEqual(started, [True])
+        finally:
+            syncqueue.start_worker = start_worker
+            settings.AUTOSYNC, settings.AUTOSYNC_INTERVAL, settings.AUTOSYNC_WORKER = saved
+
 
 class XHRTestAnonymous(PootleTestCase):
     """
@@ -183,6 +414,38 @@ class XHRTestAnonymous(PootleTestCase):
                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
         self.assertEqual(r.status_code, 200)
 
+    def test_get_view_units_paging(self):
+        """Pages, uid jumps and after/before follow the store order."""
+        ids = list(self.store.units.values_list('id', flat=True))
+        url = "%s/view/limit/1" % self.path
+
+        def get_ids(**params):
+            r = self.client.get(url, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            json = simplejson.loads(r.content)
+            return [unit['id'] for unit in json['units']], json.get('pager')
+
+        self.assertEqual(get_ids(page=2)[0], ids[1:2])
+        page_ids, pager = get_ids(uid=ids[2], pager=1)
+        self.assertEqual(page_ids, ids[2:3])
+        self.assertEqual(pager['number'], 3)
+        self.assertEqual(pager['num_pages'], len(ids))
+        self.assertEqual(get_ids(after=ids[0])[0], ids[1:2])
+        self.assertEqual(get_ids(before=ids[2])[0], ids[1:2])
+
+    def test_get_view_units_search_fields(self):
+        """Searches in different fields don't share their cached ids."""
+        self.unit.target = u"samaka"
+        self.unit.save()
+        url = "%s/view/limit/1" % self.path
+
+        def num_found(sfields):
+            r = self.client.get(url, {'search': u"samaka", 'sfields': sfields},
+                                HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            return len(simplejson.loads(r.content)['units'])
+
+        self.assertEqual(num_found(['target', 'source']), 1)
+        self.assertEqual(num_found(['source']), 0)
+
     def test_get_view_units_bad_store(self):
         """Checks for store correctness when passing an invalid path."""
         r = self.client.get("%(pootle_path)s/view" %\
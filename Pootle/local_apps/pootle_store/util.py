@@ -23,7 +23,7 @@ import os
 
 from django.conf import settings
 
-from pootle_misc.aggregate import sum_column
+from pootle_misc.aggregate import group_by_sum
 from pootle_misc.util import dictsum
 
 # Unit States
@@ -92,37 +92,89 @@ def completestatssum(queryset, empty_stats=empty_completestats):
             totals['errors'] += 1
     return totals
 
+def stats_from_groups(groups):
+    """build translation statistics from unit counts and wordcounts grouped
+    by state"""
+    result = {'total': 0,
+              'totalsourcewords': 0,
+              'fuzzy': 0,
+              'fuzzysourcewords': 0,
+              'untranslated': 0,
+              'untranslatedsourcewords': 0,
+              'translated': 0,
+              'translatedsourcewords': 0,
+              'translatedtargetwords': 0}
+    for group in groups:
+        if group['state'] <= OBSOLETE:
+            continue
+        count = group['count']
+        sourcewords = group['source_wordcount'] or 0
+        result['total'] += count
+        result['totalsourcewords'] += sourcewords
+        if group['state'] == UNTRANSLATED:
+            result['untranslated'] += count
+            result['untranslatedsourcewords'] += sourcewords
+        elif group['state'] == FUZZY:
+            result['fuzzy'] += count
+            result['fuzzysourcewords'] += sourcewords
+        elif group['state'] == TRANSLATED:
+            result['translated'] += count
+            result['translatedsourcewords'] += sourcewords
+            result['translatedtargetwords'] += group['target_wordcount'] or 0
+    return result
+
+def unit_stats(state, source_wordcount, target_wordcount):
+    """translation statistics a single unit contributes to its store"""
+    return stats_from_groups([{'state': state,
+                               'count': 1,
+                               'source_wordcount': source_wordcount,
+                               'target_wordcount': target_wordcount}])
+
+def stats_delta(oldstats, newstats):
+    """difference between two sets of statistics, leaving out unchanged
+    values"""
+    delta = {}
+    for key in set(oldstats) | set(newstats):
+        value = newstats.get(key, 0) - oldstats.get(key, 0)
+        if value:
+            delta[key] = value
+    return delta
+
+def stats_paths(pootle_path):
+    """pootle_paths of the item and all directories whose statistics
+    include it"""
+    paths = [pootle_path]
+    end = pootle_path.rfind('/', 0, len(pootle_path) - 1)
+    while end >= 0:
+        paths.append(pootle_path[:end + 1])
+        end = pootle_path.rfind('/', 0, end)
+    if pootle_path.startswith('/templates/'):
+        # templates are not counted in root directory stats
+        paths = [path for path in paths if path.startswith('/templates/')]
+    return paths
+
 def calculate_stats(units):
     """calculate translation statistics for given unit queryset"""
-    total = sum_column(units,
-                       ['source_wordcount'], count=True)
-    untranslated = sum_column(units.filter(state=UNTRANSLATED),
-                              ['source_wordcount'], count=True)
-    fuzzy = sum_column(units.filter(state=FUZZY),
-                       ['source_wordcount'], count=True)
-    translated = sum_column(units.filter(state=TRANSLATED),
-                            ['source_wordcount', 'target_wordcount'], count=True)
-    result = {}
-    result['total'] = total['count']
-    if result['total'] == 0:
-        result['totalsourcewords'] = 0
-    else:
-        result['totalsourcewords'] = total['source_wordcount']
-    result['fuzzy'] = fuzzy['count']
-    if result['fuzzy'] == 0:
-        result['fuzzysourcewords'] = 0
-    else:
-        result['fuzzysourcewords'] = fuzzy['source_wordcount']
-    result['untranslated'] = untranslated['count']
-    if result['untranslated'] == 0:
-        result['untranslatedsourcewords'] = 0
-    else:
-        result['untranslatedsourcewords'] = untranslated['source_wordcount']
-    result['translated'] = translated['count']
-    if result['translated'] == 0:
-        result['translatedsourcewords'] = 0
-        result['translatedtargetwords'] = 0
-    else:
-        result['translatedsourcewords'] = translated['source_wordcount']
-        result['translatedtargetwords'] = translated['target_wordcount']
-    return result
+    return stats_from_groups(group_by_sum(units, ['state'],
+                                          ['source_wordcount', 'target_wordcount']))
+
+def calculate_stats_by_store(units):
+    """calculate translation statistics for every store in given unit
+    queryset with a single query, returns a dictionary mapping store ids
+    to statistics"""
+    groups = {}
+    for group in group_by_sum(units, ['store', 'state'],
+                              ['source_wordcount', 'target_wordcount']):
+        groups.setdefault(group['store'], []).append(group)
+    return dict((store_id, stats_from_groups(store_groups))
+                for store_id, store_groups in groups.iteritems())
+
+def trigrams(text):
+    """set of lower case character trigrams in text, used by the
+    database search index"""
+    if not text:
+        return set()
+    if hasattr(text, 'strings'):
+        text = u"\n".join(text.strings)
+    text = text.lower()
+    return set(text[i:i+3] for i in xrange(len(text) - 2))
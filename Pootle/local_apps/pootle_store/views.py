@@ -22,6 +22,7 @@ import os
 import logging
 import tempfile
 import shutil
+from array import array
 
 from translate.storage.poxliff import PoXliffFile
 from translate.lang import data
@@ -43,15 +44,16 @@ from django.utils.encoding import iri_to_uri
 from pootle_misc.baseurl import redirect
 from pootle_app.models.permissions import get_matching_permissions, check_permission, check_profile_permission
 from pootle_misc.util import paginate, ajax_required
+from pootle_misc.aggregate import max_column
 from pootle_profile.models import get_profile
 from pootle_translationproject.forms import SearchForm
 from pootle_statistics.models import Submission
 from pootle_app.models import Suggestion as SuggestionStat
 from pootle_app.project_tree import ensure_target_dir_exists
 
-from pootle_store.models import Store, Unit
+from pootle_store.models import Store, Unit, PendingCheck, SearchTrigram, QualityCheck, Suggestion
 from pootle_store.forms import unit_form_factory, highlight_whitespace
-from pootle_store.templatetags.store_tags import fancy_highlight, find_altsrcs, get_sugg_list, highlight_diffs, pluralize_source, pluralize_target
+from pootle_store.templatetags.store_tags import fancy_highlight, find_altsrcs, prefetch_altsrcs, get_sugg_list, highlight_diffs, pluralize_source, pluralize_target
 from pootle_store.util import UNTRANSLATED, FUZZY, TRANSLATED, absolute_real_path
 from pootle_store.filetypes import factory_classes, is_monolingual
 from pootle_store.signals import translation_submitted
@@ -216,6 +218,12 @@ def get_non_indexed_search_step_query(form, units_queryset):
 def get_search_step_query(translation_project, form, units_queryset):
     """Narrows down units query to units matching search string"""
 
+    if settings.SEARCH_BACKEND == 'database':
+        logging.debug(u"Using database search index for %s", translation_project)
+        SearchTrigram.objects.require_index(translation_project)
+        return SearchTrigram.objects.search(units_queryset, form.cleaned_data['search'].split(),
+                                            form.cleaned_data['sfields'])
+
     if translation_project.indexer is None:
         logging.debug(u"No indexer for %s, using database search", translation_project)
         return get_non_indexed_search_step_query(form, units_queryset)
@@ -349,7 +357,7 @@ def _build_units_list(units, reverse=False):
     having plural forms, a title for the plural form is also provided.
     """
     return_units = []
-    for unit in units.iterator():
+    for unit in units:
         source_unit = []
         target_unit = []
         for i, source, title in pluralize_source(unit):
@@ -392,22 +400,55 @@ def _build_pager_dict(pager):
             "per_page": pager.paginator.per_page
            }
 
-def _get_index_in_qs(qs, unit):
+def get_step_ids(request, pathobj, units_queryset):
     """
-    Given a queryset C{qs}, returns the position (index) of the unit C{unit}
-    within that queryset.
+    Returns the ordered ids of the units below C{pathobj} matching the
+    conditions in GET.
+
+    The list is cached until a unit below C{pathobj} changes, so paging
+    through it only needs to query the units of the requested page.
+
+    @return: An C{array} of unit ids.
+    """
+    key_parts = [pathobj.pootle_path, pathobj.get_mtime()]
+    for param in ('unitstates', 'matchnames', 'search', 'sfields'):
+        key_parts.append(request.GET.getlist(param))
+    if 'matchnames' in request.GET:
+        # checks and suggestions change without touching the units
+        key_parts.extend([request.profile.id,
+                          max_column(QualityCheck.objects.all(), 'id', 0),
+                          max_column(Suggestion.objects.all(), 'id', 0)])
+    cache_key = "stepids:%s" % str(hash(repr(key_parts)))
+
+    step_ids = array('l')
+    cached = cache.get(cache_key)
+    if cached is None:
+        step_queryset = get_step_query(request, units_queryset)
+        step_ids.extend(step_queryset.values_list('id', flat=True).iterator())
+        cache.set(cache_key, step_ids.tostring(), settings.OBJECT_CACHE_TIMEOUT)
+    else:
+        step_ids.fromstring(cached)
+    return step_ids
 
-    @return: Integer value representing the position of the unit C{unit}.
+def _get_units_by_id(units_queryset, ids):
+    """
+    Returns the units with the given C{ids} in the same order.
     """
-    return qs.filter(index__lt=unit.index).count()
+    ids = list(ids)
+    units = units_queryset.order_by().in_bulk(ids)
+    return [units[id] for id in ids if id in units]
 
-def get_view_units(request, units_queryset, limit=0):
+def get_view_units(request, units_queryset, pathobj, limit=0):
     """
     @return: An object in JSON notation that contains the source and target
     texts for units that will be displayed before and after editing unit.
 
     If asked by using the 'meta' and 'pager' parameters, metadata and pager
     information will be calculated and returned too.
+
+    Instead of a page number, the 'after' or 'before' parameters may
+    give the id of a unit, then the units following or preceding it are
+    returned.
     """
     current_unit = None
     json = {}
@@ -420,7 +461,7 @@ def get_view_units(request, units_queryset, limit=0):
     if not limit:
         limit = request.profile.get_unit_rows()
 
-    step_queryset = get_step_query(request, units_queryset)
+    step_ids = get_step_ids(request, pathobj, units_queryset)
 
     # Return metadata it has been explicitely requested
     if request.GET.get('meta', False):
@@ -433,16 +474,37 @@ def get_view_units(request, units_queryset, limit=0):
     # Maybe we are trying to load directly a specific unit, so we have
     # to calculate its page number
     uid = request.GET.get('uid', None)
-    if uid:
-        current_unit = units_queryset.get(id=uid)
-        preceding = _get_index_in_qs(step_queryset, current_unit)
-        page = preceding / limit + 1
+    after = request.GET.get('after', None)
+    before = request.GET.get('before', None)
+    page = None
+    start = None
+    try:
+        if uid:
+            current_unit = units_queryset.get(id=uid)
+            page = step_ids.index(current_unit.id) / limit + 1
+        elif after:
+            start = step_ids.index(int(after)) + 1
+        elif before:
+            start = max(step_ids.index(int(before)) - limit, 0)
+    except ValueError:
+        # the unit is not in the list
+        page = 1
+
+    if start is not None:
+        page = start / limit + 1
+    pager = paginate(request, step_ids, items=limit, page=page)
+    if start is None:
+        page_ids = pager.object_list
     else:
-        page = None
+        page_ids = step_ids[start:start+limit]
 
-    pager = paginate(request, step_queryset, items=limit, page=page)
+    units = _get_units_by_id(units_queryset, page_ids)
+    json["units"] = _build_units_list(units)
 
-    json["units"] = _build_units_list(pager.object_list)
+    # The units of this page will be edited next
+    tp = request.translation_project
+    alt_src_langs = get_alt_src_langs(request, request.profile, tp)
+    prefetch_altsrcs(units, alt_src_langs, tp.project)
 
     # Return paging information if requested to do so
     if request.GET.get('pager', False):
@@ -466,7 +528,7 @@ def get_view_units_store(request, store, limit=0):
     @return: An object in JSON notation that contains the source and target
     texts for units that will be displayed before and after unit C{uid}.
     """
-    return get_view_units(request, store.units, limit=limit)
+    return get_view_units(request, store.units, store, limit=limit)
 
 def _is_filtered(request):
     """checks if unit list is filtered"""
@@ -574,6 +636,9 @@ def get_failing_checks(request, pathobj):
                         'text': stats}
             checkopts.append(checkopt)
             json["checks"] = checkopts
+    pending = PendingCheck.objects.count_pending(pathobj.pootle_path)
+    if pending:
+        json["pending"] = pending
     response = jsonify(json)
     return HttpResponse(response, mimetype="application/json")
 
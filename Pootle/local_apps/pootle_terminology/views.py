@@ -29,7 +29,7 @@ from translate.tools.poterminology import TerminologyExtractor
 
 from pootle_app.views.language.view import get_translation_project
 from pootle_app.views.admin import util
-from pootle_store.models import Store, Unit, PARSED, LOCKED
+from pootle_store.models import Store, Unit, QuickStats, PARSED, LOCKED
 from pootle_store.forms import unit_form_factory
 from pootle_misc.baseurl import redirect
 
@@ -95,6 +95,7 @@ def extract(request, translation_project):
 
         if not created:
             store.units.delete()
+            QuickStats.objects.invalidate(store.pootle_path)
 
         # calculate maximum terms
         maxunits = int(translation_project.getquickstats()['totalsourcewords'] * 0.02)
@@ -32,7 +32,6 @@ from django.db.models.signals      import post_save
 from django.core.exceptions import PermissionDenied
 from django.utils.translation import ugettext_lazy as _
 
-from translate.filters import checks
 from translate.search  import match, indexing
 from translate.storage import versioncontrol
 from translate.storage.base import ParseError
@@ -43,9 +42,10 @@ from pootle_misc.util import getfromcache, dictsum, deletefromcache
 from pootle_misc.baseurl import l
 from pootle_misc.aggregate import group_by_count, max_column
 from pootle_store.util import calculate_stats
-from pootle_store.models           import Store, Unit, QualityCheck, PARSED, CHECKED
-from pootle_store.util             import relative_real_path, absolute_real_path, OBSOLETE
+from pootle_store.models           import Store, Unit, QualityCheck, QuickStats, IndexerMtime, PARSED, CHECKED
+from pootle_store.util             import relative_real_path, absolute_real_path, OBSOLETE, TRANSLATED
 from pootle_store.util import empty_quickstats, empty_completestats
+from pootle_store.checkqueue import get_shared_checker
 
 from pootle_app.lib.util           import RelatedManager
 from pootle_project.models     import Project
@@ -64,6 +64,9 @@ class TranslationProjectNonDBState(object):
         # terminology matcher
         self.termmatcher = None
         self.termmatchermtime = None
+        # live translation catalog
+        self.catalog = None
+        self.catalogmtime = None
         self._indexing_enabled = True
         self._index_initialized = False
         self.indexer = None
@@ -128,7 +131,7 @@ class TranslationProject(models.Model):
         directory = self.directory
         super(TranslationProject, self).delete(*args, **kwargs)
         directory.delete()
-        deletefromcache(self, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions"])
+        deletefromcache(self, ["getquickstats", "getcompletestats", "get_mtime", "has_suggestions", "altsrcs_token"])
 
 
     def get_absolute_url(self):
@@ -150,12 +153,7 @@ class TranslationProject(models.Model):
     file_style = property(_get_treestyle)
 
     def _get_checker(self):
-        checkerclasses = [checks.projectcheckers.get(self.project.checkstyle,
-                                                     checks.StandardChecker),
-                          checks.StandardUnitChecker]
-        return checks.TeeChecker(checkerclasses=checkerclasses,
-                                 errorhandler=self.filtererrorhandler,
-                                 languagecode=self.language.code)
+        return get_shared_checker(self.project.checkstyle, self.language.code)
 
     checker = property(_get_checker)
 
@@ -210,9 +208,14 @@ class TranslationProject(models.Model):
     def getquickstats(self):
         if self.is_template_project:
             return empty_quickstats
+        stats = QuickStats.objects.lookup(self.pootle_path)
+        if stats is not None:
+            stats['errors'] = 0
+            return stats
         errors = self.require_units()
         stats = calculate_stats(Unit.objects.filter(store__translation_project=self, state__gt=OBSOLETE))
         stats['errors'] = errors
+        QuickStats.objects.materialise({self.pootle_path: stats})
         return stats
 
     @getfromcache
@@ -275,6 +278,8 @@ class TranslationProject(models.Model):
             add_files(self, ignored_files, ext, self.abs_real_path, self.directory)
 
     def _get_indexer(self):
+        if settings.SEARCH_BACKEND not in ('indexer', 'sqlite'):
+            return None
         if self.non_db_state.indexer is None and self.non_db_state._indexing_enabled:
             try:
                 indexer = self.make_indexer()
@@ -490,34 +495,42 @@ class TranslationProject(models.Model):
         """
         logging.debug(u"Loading indexer for %s", self.pootle_path)
         indexdir = os.path.join(self.abs_real_path, self.index_directory)
-        index = indexing.get_indexer(indexdir)
+        if os.path.isdir(indexdir):
+            existing = os.listdir(indexdir)
+        else:
+            existing = []
+        if settings.SEARCH_BACKEND == 'sqlite':
+            index = indexing.get_indexer(indexdir, ['SQLiteIndexer'])
+        else:
+            # without Xapian or Lucene the database is searched directly,
+            # the SQLite engine has to be asked for
+            index = indexing.get_indexer(indexdir, fallback=False)
+        if os.path.basename(index.location) not in existing:
+            # new index (every engine has its own subdirectory or file), all
+            # stores have to be indexed again
+            IndexerMtime.objects.filter(store__translation_project=self).delete()
         index.set_field_analyzers({
                         "pofilename": index.ANALYZER_EXACT,
                         "itemno": index.ANALYZER_EXACT,
-                        "pomtime": index.ANALYZER_EXACT,
                         "dbid": index.ANALYZER_EXACT,
                         })
         return index
 
     def init_index(self, indexer):
-        """initializes the search index"""
-        #FIXME: stop relying on pomtime so virtual files can be searchable?
+        """initializes the search index
+
+        every store is indexed in its own transaction, so an interrupted
+        run continues with the stores that were not indexed yet"""
         try:
-            indexer.begin_transaction()
             for store in self.stores.iterator():
                 self.update_index(indexer, store)
-            indexer.commit_transaction()
             indexer.flush(optimize=True)
         except Exception, e:
             logging.error(u"Error opening indexer for %s:\n%s", self, e)
-            try:
-                indexer.cancel_transaction()
-            except:
-                pass
 
 
     def update_index(self, indexer, store, unitid=None):
-        """updates the index with the contents of pofilename (limit to items if given)
+        """updates the index with the contents of store (limit to items if given)
 
         There are three reasons for calling this function:
             1. creating a new instance of L{TranslationProject} (see L{initindex})
@@ -527,6 +540,9 @@ class TranslationProject(models.Model):
 
         The argument L{item} should be None for 1.
 
+        The mtime of the store is recorded in L{IndexerMtime} after
+        indexing it, stores that did not change since are skipped.
+
         known problems:
             1. This function should get called, when the po file changes externally.
                  WARNING: You have to stop the pootle server before manually changing
@@ -534,61 +550,71 @@ class TranslationProject(models.Model):
 
         @param unitid: pk of unit within the po file OR None (=rebuild all)
         @type unitid: int
-        @param optimize: should the indexing database be optimized afterwards
-        @type optimize: bool
         """
         #FIXME: leverage file updated signal to check if index needs updating
         if indexer == None:
             return False
-        # check if the pomtime in the index == the latest pomtime
-        pomtime = str(hash(store.get_mtime()) ** 2)
-        pofilenamequery = indexer.make_query([("pofilename", store.pootle_path)], True)
-        pomtimequery = indexer.make_query([("pomtime", pomtime)], True)
-        gooditemsquery = indexer.make_query([pofilenamequery, pomtimequery], True)
-        gooditemsnum = indexer.get_query_result(gooditemsquery).get_matches_count()
-        # if there is at least one up-to-date indexing item, then the po file
-        # was not changed externally -> no need to update the database
-        units = None
-        if (gooditemsnum > 0) and (not unitid):
-            # nothing to be done
-            return
-        elif unitid is not None:
+        if unitid is not None:
             # Update only specific item - usually translation via the web
             # interface. All other items should still be up-to-date (even with an
-            # older pomtime).
+            # older mtime).
             # delete the relevant item from the database
-            units = store.units.filter(id=unitid)
+            pofilenamequery = indexer.make_query([("pofilename", store.pootle_path)], True)
             itemsquery = indexer.make_query([("dbid", str(unitid))], False)
             indexer.delete_doc([pofilenamequery, itemsquery])
-        else:
-            # (item is None)
-            # The po file is not indexed - or it was changed externally
-            # delete all items of this file
-            logging.debug(u"Updating %s indexer for file %s", self.pootle_path, store.pootle_path)
-            indexer.delete_doc({"pofilename": store.pootle_path})
-            units = store.units
-        addlist = []
-        for unit in units.iterator():
-            doc = {"pofilename": store.pootle_path,
-                   "pomtime": pomtime,
-                   "itemno": str(unit.index),
-                   "dbid": str(unit.id),
-                   }
-            if unit.hasplural():
-                orig = "\n".join(unit.source.strings)
-                trans = "\n".join(unit.target.strings)
-            else:
-                orig = unit.source
-                trans = unit.target
-            doc["source"] = orig
-            doc["target"] = trans
-            doc["notes"] = unit.getnotes()
-            doc["locations"] = unit.getlocations()
-            addlist.append(doc)
-        if addlist:
-            for add_item in addlist:
-                indexer.index_document(add_item)
+            for unit in store.units.filter(id=unitid):
+                indexer.index_document(self._index_document(store, unit))
+            return
 
+        mtime = store.get_mtime()
+        try:
+            indexed = IndexerMtime.objects.get(store=store)
+            if indexed.mtime == mtime:
+                # the po file was not changed since it was indexed ->
+                # no need to update the database
+                return
+        except IndexerMtime.DoesNotExist:
+            indexed = IndexerMtime(store=store)
+
+        # The po file is not indexed - or it was changed
+        # delete all items of this file and add them again in batches
+        logging.debug(u"Updating %s indexer for file %s", self.pootle_path, store.pootle_path)
+        indexer.begin_transaction()
+        try:
+            indexer.delete_doc({"pofilename": store.pootle_path})
+            units = store.units.order_by('id')
+            last_id = 0
+            while True:
+                batch = list(units.filter(id__gt=last_id)[:settings.INDEXER_BATCH_SIZE])
+                if not batch:
+                    break
+                for unit in batch:
+                    indexer.index_document(self._index_document(store, unit))
+                last_id = batch[-1].id
+            indexer.commit_transaction()
+        except:
+            indexer.cancel_transaction()
+            raise
+        indexed.mtime = mtime
+        indexed.save()
+
+    def _index_document(self, store, unit):
+        """fields of the index document of unit"""
+        doc = {"pofilename": store.pootle_path,
+               "itemno": str(unit.index),
+               "dbid": str(unit.id),
+               }
+        if unit.hasplural():
+            orig = "\n".join(unit.source.strings)
+            trans = "\n".join(unit.target.strings)
+        else:
+            orig = unit.source
+            trans = unit.target
+        doc["source"] = orig
+        doc["target"] = trans
+        doc["notes"] = unit.getnotes()
+        doc["locations"] = unit.getlocations()
+        return doc
 
     ########################################################################################
 
@@ -624,20 +650,40 @@ class TranslationProject(models.Model):
 
     ##############################################################################################
 
-    #FIXME: we should cache results to ease live translation
+    def getcatalog(self):
+        """returns a dictionary mapping source strings to the target
+        strings of their translations and a plural function, rebuilt
+        whenever units in the translation project change"""
+        mtime = self.get_mtime()
+        if self.non_db_state.catalog is None or mtime != self.non_db_state.catalogmtime:
+            catalog = {}
+            units = Unit.objects.filter(store__translation_project=self, state__gte=TRANSLATED) \
+                    .order_by('store__pootle_path', 'index')
+            for unit in units.iterator():
+                source = unicode(unit.source)
+                if source not in catalog:
+                    catalog[source] = (unit.hasplural(), unit.target.strings)
+            pluralfn = None
+            if self.language.pluralequation:
+                pluralfn = gettext.c2py(self.language.pluralequation)
+            self.non_db_state.catalog = (catalog, pluralfn)
+            self.non_db_state.catalogmtime = mtime
+        return self.non_db_state.catalog
+
     def translate_message(self, singular, plural=None, n=1):
-        for store in self.stores.iterator():
-            unit = store.findunit(singular)
-            if unit is not None and unit.istranslated():
-                if unit.hasplural() and n != 1:
-                    pluralequation = self.language.pluralequation
-                    if pluralequation:
-                        pluralfn = gettext.c2py(pluralequation)
-                        target =  unit.target.strings[pluralfn(n)]
+        catalog, pluralfn = self.getcatalog()
+        if singular in catalog:
+            hasplural, strings = catalog[singular]
+            if hasplural and n != 1:
+                if pluralfn is not None:
+                    try:
+                        target = strings[pluralfn(n)]
                         if target is not None:
                             return target
-                else:
-                    return unit.target
+                    except IndexError:
+                        pass
+            else:
+                return strings[0]
 
         # no translation found
         if n != 1 and plural is not None:
@@ -19,15 +19,110 @@
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
 import os
+import shutil
+import time
+
+from django.conf import settings
 
 from pootle.tests import PootleTestCase
 
 from pootle_project.models import Project
-from pootle_store.models import Store
+from pootle_store.models import Store, IndexerMtime
 from pootle_app.project_tree import get_translated_name, get_translated_name_gnu
 from pootle_language.models import Language
 from pootle_app.management import require_english
 from pootle_store.util import OBSOLETE
+from pootle_translationproject.models import TranslationProject
+
+
+class LiveTranslationTests(PootleTestCase):
+    """Tests for translating messages from a translation project"""
+
+    def setUp(self):
+        super(LiveTranslationTests, self).setUp()
+        self.tp = TranslationProject.objects.get(pootle_path='/af/tutorial/')
+        self.tp.require_units()
+
+    def test_translate_message(self):
+        self.assertEqual(self.tp.translate_message("test"), "rest")
+        self.assertEqual(self.tp.translate_message("fish"), "fish")
+        self.assertEqual(self.tp.translate_message("%d fish", "%d fishies", 2), "%d fishies")
+
+    def test_catalog_update(self):
+        catalog = self.tp.getcatalog()
+        self.assertTrue(self.tp.getcatalog() is catalog)
+
+        time.sleep(1)
+        store = self.tp.stores.get(name='pootle.po')
+        unit = store.findunit("%d fish")
+        unit.target = [u"%d vis", u"%d visse"]
+        unit.save()
+        self.assertEqual(self.tp.translate_message("%d fish", "%d fishies", 1), "%d vis")
+        self.assertEqual(self.tp.translate_message("%d fish", "%d fishies", 2), "%d visse")
+
+
+class IndexerTests(PootleTestCase):
+    """Tests for keeping the search index of a translation project up to date"""
+
+    def setUp(self):
+        super(IndexerTests, self).setUp()
+        self.search_backend = settings.SEARCH_BACKEND
+        settings.SEARCH_BACKEND = 'sqlite'
+        self.tp = TranslationProject.objects.get(pootle_path='/af/tutorial/')
+        self.tp.require_units()
+        self.store = self.tp.stores.get(name='pootle.po')
+
+    def tearDown(self):
+        settings.SEARCH_BACKEND = self.search_backend
+        super(IndexerTests, self).tearDown()
+
+    def _count_documents(self, indexer):
+        query = indexer.make_query([("pofilename", self.store.pootle_path)], True)
+        return indexer.get_query_result(query).get_matches_count()
+
+    def test_init_index(self):
+        saved = settings.INDEXER_BATCH_SIZE
+        settings.INDEXER_BATCH_SIZE = 2
+        try:
+            indexer = self.tp.make_indexer()
+            self.tp.init_index(indexer)
+        finally:
+            settings.INDEXER_BATCH_SIZE = saved
+        self.assertEqual(self._count_documents(indexer), self.store.units.count())
+        indexed = IndexerMtime.objects.get(store=self.store)
+        self.assertEqual(indexed.mtime, self.store.get_mtime())
+
+    def test_skip_indexed(self):
+        indexer = self.tp.make_indexer()
+        self.tp.init_index(indexer)
+        # unchanged stores are not indexed again
+        indexer.delete_doc({"pofilename": self.store.pootle_path})
+        self.tp.update_index(indexer, self.store)
+        self.assertEqual(self._count_documents(indexer), 0)
+
+        time.sleep(1)
+        unit = self.store.findunit("test")
+        unit.target = u"toets"
+        unit.save()
+        self.tp.update_index(indexer, self.store)
+        self.assertEqual(self._count_documents(indexer), self.store.units.count())
+
+    def test_new_engine(self):
+        indexer = self.tp.make_indexer()
+        self.tp.init_index(indexer)
+        self.assertTrue(IndexerMtime.objects.filter(store=self.store).exists())
+        # another indexing engine starts with an empty index in its own
+        # subdirectory (or file), while the index directory is still there
+        location = indexer.location
+        del indexer
+        if os.path.isdir(location):
+            shutil.rmtree(location)
+        else:
+            os.remove(location)
+        indexer = self.tp.make_indexer()
+        self.assertFalse(IndexerMtime.objects.filter(store=self.store).exists())
+        self.tp.init_index(indexer)
+        self.assertEqual(self._count_documents(indexer), self.store.units.count())
 
 
 class GnuTests(PootleTestCase):
@@ -136,6 +136,32 @@ USE_CAPTCHA = True
 # the files.
 AUTOSYNC = False
 
+# With AUTOSYNC enabled, set this to a number of seconds to write changed
+# files to disk in the background at most once per interval instead of on
+# every change. Pending files are remembered across restarts.
+AUTOSYNC_INTERVAL = 0
+
+# Set this to False if you run "manage.py flush_sync_queue --worker" to
+# write files to disk instead of a background thread in every server process.
+AUTOSYNC_WORKER = True
+
+# Set this to the number of worker processes to run quality checks in the
+# background instead of while saving translations or viewing statistics.
+# Queued checks are run by "manage.py drain_qualitychecks", use --worker to
+# keep it running.
+QUALITYCHECK_WORKERS = 0
+
+# Search backend used on the translate page. 'indexer' uses Xapian or Lucene
+# when installed and searches the database directly otherwise, 'sqlite' uses
+# a SQLite index instead of Xapian or Lucene. Both indexes are brought up to
+# date with changed files when the server starts. 'database' keeps a trigram
+# index of all strings in the database instead.
+SEARCH_BACKEND = 'indexer'
+
+# Number of units read from the database at a time while adding a file to
+# the search index of the 'indexer' backend.
+INDEXER_BATCH_SIZE = 1000
+
 # Set the backends you want to use to enable translation suggestions through
 # several online services. To disable this feature completely just comment all
 # the lines to set an empty list [] to the MT_BACKENDS setting.
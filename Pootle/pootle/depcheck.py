@@ -98,8 +98,13 @@ def test_levenshtein():
         return False
 
 def test_indexer():
-    from translate.search.indexing import _get_available_indexers
-    return [indexer.__module__.split('.')[-1] for indexer in _get_available_indexers()]
+    if settings.SEARCH_BACKEND == 'database':
+        return ['database']
+    from translate.search.indexing import _get_available_indexers, _FALLBACK_INDEXERS
+    indexers = [indexer.__module__.split('.')[-1] for indexer in _get_available_indexers()]
+    if settings.SEARCH_BACKEND == 'sqlite':
+        return [indexer for indexer in indexers if indexer in _FALLBACK_INDEXERS]
+    return [indexer for indexer in indexers if indexer not in _FALLBACK_INDEXERS]
 
 def test_gaupol():
     try:
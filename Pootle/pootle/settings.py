@@ -170,6 +170,11 @@ MAX_AUTOTERMS = 600
 CONTACT_EMAIL = None
 USE_CAPTCHA = False
 AUTOSYNC = False
+AUTOSYNC_INTERVAL = 0
+AUTOSYNC_WORKER = True
+QUALITYCHECK_WORKERS = 0
+SEARCH_BACKEND = 'indexer'
+INDEXER_BATCH_SIZE = 1000
 MT_BACKENDS = ()
 CAN_CONTACT = True
 
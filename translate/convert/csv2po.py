@@ -122,19 +122,22 @@ class csv2po:
             # we need to work out whether we matched the singular or the plural
             singularid = pounit.source.strings[0]
             pluralid = pounit.source.strings[1]
+            msgstr = pounit.msgstr
             if csvunit.source == singularid:
-                pounit.msgstr[0] = csvunit.target
+                msgstr[0] = csvunit.target
             elif csvunit.source == pluralid:
-                pounit.msgstr[1] = csvunit.target
+                msgstr[1] = csvunit.target
             elif simplify(csvunit.source) == simplify(singularid):
-                pounit.msgstr[0] = csvunit.target
+                msgstr[0] = csvunit.target
             elif simplify(csvunit.source) == simplify(pluralid):
-                pounit.msgstr[1] = csvunit.target
+                msgstr[1] = csvunit.target
             else:
                 print >> sys.stderr, "couldn't work out singular or plural: %r, %r, %r" %  \
                     (csvunit.source, singularid, pluralid)
                 self.unmatched += 1
                 return
+            # assign it again so that the unit drops its cached target
+            pounit.msgstr = msgstr
         else:
             pounit.target = csvunit.target
 
@@ -31,6 +31,7 @@ U{wiki <http://translate.sourceforge.net/wiki/toolkit/pofilter_tests>}.
 """
 
 import re
+import time
 
 from translate.filters import helpers
 from translate.filters import decoration
@@ -237,6 +238,10 @@ class CheckerConfig(object):
         self.lang = factory.getlanguage(langcode)
 
 
+# The number of prefilter results that run_filters_batch() keeps
+MAX_CACHED_RESULTS = 10000
+
+
 def cache_results(f):
 
     def cached_f(self, param1):
@@ -251,10 +256,47 @@ def cache_results(f):
     return cached_f
 
 
+class CheckPlan(object):
+    """The filters of a checker in the order they are run, built once so that
+    checking a unit doesn't need to look them up again."""
+
+    def __init__(self, checker):
+        self.lang = checker.config.lang
+        self.defaultfilters = checker.defaultfilters
+        ignores = self.lang.ignoretests
+        functionnames = checker.preconditions.keys()
+        functionnames += [functionname for functionname in checker.defaultfilters
+                          if functionname not in checker.preconditions]
+        self.filters = []
+        for functionname in functionnames:
+            if functionname in ignores:
+                continue
+            filterfunction = getattr(checker, functionname, None)
+            # this filterfunction may only be defined on another checker if
+            # using TeeChecker
+            if filterfunction is None:
+                continue
+            self.filters.append((functionname, filterfunction,
+                                 filterfunction.__doc__,
+                                 functionname in checker.defaultfilters))
+        # the filters to skip when a precondition fails
+        self.skips = dict([(functionname, set(ignored)) for functionname, ignored
+                           in checker.preconditions.iteritems()])
+
+    def isvalid(self, checker):
+        """checks whether this plan still matches the checker's filters and
+        target language"""
+        return checker.config.lang is self.lang and \
+               checker.defaultfilters is self.defaultfilters
+
+
 class UnitChecker(object):
     """Parent Checker class which does the checking based on functions available
     in derived classes."""
     preconditions = {}
+    # if a dictionary, run_checkplan() adds the number of units each filter
+    # checked and the processor time it took as functionname: [units, seconds]
+    timings = None
 
     def __init__(self, checkerconfig=None, excludefilters=None,
                  limitfilters=None, errorhandler=None):
@@ -297,6 +339,7 @@ class UnitChecker(object):
     def setconfig(self, config):
         """sets the accelerator list"""
         self.config = config
+        self.checkplan = None
         self.accfilters = [prefilters.filteraccelerators(accelmarker) for accelmarker in self.config.accelmarkers]
         self.varfilters = [prefilters.filtervariables(startmatch, endmatch, prefilters.varname)
                 for startmatch, endmatch in self.config.varmatches]
@@ -347,24 +390,45 @@ class UnitChecker(object):
         Note that this can raise a FilterFailure as part of normal operation"""
         return test(unit)
 
+    def getcheckplan(self):
+        """returns the L{CheckPlan} for the current configuration"""
+        if self.checkplan is None or not self.checkplan.isvalid(self):
+            self.checkplan = CheckPlan(self)
+        return self.checkplan
+
     def run_filters(self, unit):
         """run all the tests in this suite, return failures as testname,
         message_or_exception"""
+        return self.run_filters_batch([unit])[0]
+
+    def run_filters_batch(self, units):
+        """run all the tests in this suite on each of the given units, return
+        a list with the failures of each unit as testname,
+        message_or_exception
+
+        The results of the prefilters are shared between the units."""
+        checkplan = self.getcheckplan()
         self.results_cache = {}
+        try:
+            failures = []
+            for unit in units:
+                if len(self.results_cache) > MAX_CACHED_RESULTS:
+                    self.results_cache = {}
+                failures.append(self.run_checkplan(checkplan, unit))
+            return failures
+        finally:
+            self.results_cache = {}
+
+    def run_checkplan(self, checkplan, unit):
+        """run the filters of the given plan on the unit"""
         failures = {}
-        ignores = self.config.lang.ignoretests[:]
-        functionnames = self.defaultfilters.keys()
-        priorityfunctionnames = self.preconditions.keys()
-        otherfunctionnames = filter(lambda functionname: functionname not in self.preconditions, functionnames)
-        for functionname in priorityfunctionnames + otherfunctionnames:
-            if functionname in ignores:
-                continue
-            filterfunction = getattr(self, functionname, None)
-            # this filterfunction may only be defined on another checker if
-            # using TeeChecker
-            if filterfunction is None:
+        skipped = set()
+        timings = self.timings
+        for functionname, filterfunction, filtermessage, isdefault in checkplan.filters:
+            if functionname in skipped:
                 continue
-            filtermessage = filterfunction.__doc__
+            if timings is not None:
+                start = time.clock()
             try:
                 filterresult = self.run_test(filterfunction, unit)
             except FilterFailure, e:
@@ -377,15 +441,17 @@ class UnitChecker(object):
                 else:
                     filterresult = self.errorhandler(functionname, unit.source,
                                                      unit.target, e)
+            if timings is not None:
+                timing = timings.setdefault(functionname, [0, 0.0])
+                timing[0] += 1
+                timing[1] += time.clock() - start
             if not filterresult:
                 # we test some preconditions that aren't actually a cause for
                 # failure
-                if functionname in self.defaultfilters:
+                if isdefault:
                     failures[functionname] = filtermessage
-                if functionname in self.preconditions:
-                    for ignoredfunctionname in self.preconditions[functionname]:
-                        ignores.append(ignoredfunctionname)
-        self.results_cache = {}
+                if functionname in checkplan.skips:
+                    skipped.update(checkplan.skips[functionname])
         return failures
 
 
@@ -421,14 +487,14 @@ class TranslationChecker(UnitChecker):
         else:
             return test(self.str1, self.str2)
 
-    def run_filters(self, unit):
+    def run_checkplan(self, checkplan, unit):
         """Do some optimisation by caching some data of the unit for the benefit
         of run_test()."""
         self.str1 = data.normalized_unicode(unit.source) or u""
         self.str2 = data.normalized_unicode(unit.target) or u""
         self.hasplural = unit.hasplural()
         self.locations = unit.getlocations()
-        return super(TranslationChecker, self).run_filters(unit)
+        return super(TranslationChecker, self).run_checkplan(checkplan, unit)
 
 
 class TeeChecker:
@@ -480,12 +546,28 @@ class TeeChecker:
             failures.update(checker.run_filters(unit))
         return failures
 
+    def run_filters_batch(self, units):
+        """run all the tests in the checker's suites on each of the given
+        units, return a list with the failures of each unit"""
+        units = list(units)
+        failures = [{} for unit in units]
+        for checker in self.checkers:
+            for unitfailures, checkerfailures in zip(failures, checker.run_filters_batch(units)):
+                unitfailures.update(checkerfailures)
+        return failures
+
     def setsuggestionstore(self, store):
         """Sets the filename that a checker should use for evaluating
         suggestions."""
         for checker in self.checkers:
             checker.setsuggestionstore(store)
 
+    def settimings(self, timings):
+        """Makes all the checkers add their timings to the given dictionary,
+        see L{UnitChecker.timings}. C{None} stops the timing."""
+        for checker in self.checkers:
+            checker.timings = timings
+
 
 class StandardChecker(TranslationChecker):
     """The basic test suite for source -> target translations."""
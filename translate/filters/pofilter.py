@@ -29,6 +29,11 @@ for full descriptions of all tests
 """
 
 import os
+import sys
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
 
 from translate.storage import factory
 from translate.storage.poheader import poheader
@@ -36,6 +41,9 @@ from translate.filters import checks
 from translate.filters import autocorrect
 from translate.misc import optrecurse
 
+# The number of units a worker process checks at a time
+UNITS_PER_JOB = 250
+
 
 def build_checkerconfig(options):
     """Prepare the checker config from the given options.  This is mainly
@@ -77,6 +85,14 @@ class pocheckfilter:
                                          checkerclasses=checkerclasses,
                                          languagecode=checkerconfig.targetlanguage)
         self.options = options
+        self.jobs = getattr(options, "jobs", 1)
+        if self.jobs == 0 and multiprocessing is not None:
+            self.jobs = multiprocessing.cpu_count()
+        if getattr(options, "timings", False):
+            self.timings = {}
+        else:
+            self.timings = None
+        self.checker.settimings(self.timings)
 
     def getfilterdocs(self):
         """lists the docs for filters available on checker..."""
@@ -85,15 +101,103 @@ class pocheckfilter:
         filterdocs.sort()
         return "\n".join(filterdocs)
 
-    def filterunit(self, unit):
-        """runs filters on an element"""
+    def addtimings(self, timings):
+        """adds the timings of another process to ours"""
+        for filtername, (units, seconds) in timings.iteritems():
+            timing = self.timings.setdefault(filtername, [0, 0.0])
+            timing[0] += units
+            timing[1] += seconds
+
+    def gettimingreport(self):
+        """lists the number of units checked per second by each filter, the
+        slowest filters first"""
+        timings = sorted(self.timings.iteritems(),
+                         key=lambda (filtername, (units, seconds)): -seconds)
+        lines = ["%-24s %10s %10s %12s" % ("filter", "units", "seconds", "units/s")]
+        for filtername, (units, seconds) in timings:
+            lines.append("%-24s %10d %10.3f %12.0f" % (filtername, units, seconds,
+                                                       units / max(seconds, 1e-6)))
+        return "\n".join(lines)
+
+    def shouldfilter(self, unit):
+        """checks whether the filters should be run on an element"""
         if unit.isheader():
-            return []
+            return False
         if not self.options.includefuzzy and unit.isfuzzy():
-            return []
+            return False
         if not self.options.includereview and unit.isreview():
+            return False
+        return True
+
+    def filterunit(self, unit):
+        """runs filters on an element"""
+        if not self.shouldfilter(unit):
             return []
-        failures = self.checker.run_filters(unit)
+        return self.handlefailures(unit, self.checker.run_filters(unit))
+
+    def filterunits(self, units):
+        """runs filters on a list of elements, returns the result of
+        filterunit() for each of them, with the failures as a list of
+        (filtername, message) pairs so that they always come out in the
+        same order"""
+        tofilter = [self.shouldfilter(unit) for unit in units]
+        failures = iter(self.runchecks(
+            [unit for unit, shouldfilter in zip(units, tofilter) if shouldfilter]))
+        results = []
+        for unit, shouldfilter in zip(units, tofilter):
+            if shouldfilter:
+                results.append(self.handlefailures(unit, failures.next()))
+            else:
+                results.append([])
+        return results
+
+    def runchecks(self, units):
+        """runs the checker on the units, returns the failures of each unit
+        as a list of (filtername, message) pairs. large lists are shared out
+        between worker processes if more than one job was requested"""
+        if self.canrunparallel(units):
+            return self.runparallel(units)
+        return [failures.items() for failures in self.checker.run_filters_batch(units)]
+
+    def canrunparallel(self, units):
+        """checks if the units can be checked in separate processes. this
+        needs fork() so the worker processes share the checker and the units"""
+        if self.jobs <= 1 or len(units) <= UNITS_PER_JOB:
+            return False
+        if multiprocessing is None or not hasattr(os, "fork"):
+            return False
+        # when the files are already processed in parallel, we are running
+        # in a daemonic worker process, which can't have children
+        return not multiprocessing.current_process().daemon
+
+    def runparallel(self, units):
+        """checks the units in a pool of worker processes, each with its own
+        copy of the checker, returns the failures in the original order"""
+        global _parallelcheck
+        _parallelcheck = (self, units)
+        slices = [(start, start + UNITS_PER_JOB)
+                  for start in xrange(0, len(units), UNITS_PER_JOB)]
+        pool = multiprocessing.Pool(min(self.jobs, len(slices)))
+        try:
+            failures = []
+            results = pool.imap(_runparallelchecks, slices)
+            for job in slices:
+                # a timeout keeps the wait interruptible by Ctrl-C
+                slicefailures, slicetimings = results.next(sys.maxint)
+                failures.extend(slicefailures)
+                if slicetimings:
+                    self.addtimings(slicetimings)
+            pool.close()
+            return failures
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _parallelcheck = None
+
+    def handlefailures(self, unit, failures):
+        """applies autocorrect to the failures of an element if requested"""
         if failures and self.options.autocorrect:
             # we can't get away with bad unquoting / requoting if we're going to change the result...
             correction = autocorrect.correct(unit.source, unit.target)
@@ -114,11 +218,10 @@ class pocheckfilter:
         newtransfile = type(transfile)()
         newtransfile.setsourcelanguage(transfile.getsourcelanguage())
         newtransfile.settargetlanguage(transfile.gettargetlanguage())
-        for unit in transfile.units:
-            filterresult = self.filterunit(unit)
+        for unit, filterresult in zip(transfile.units, self.filterunits(transfile.units)):
             if filterresult:
                 if filterresult != autocorrect:
-                    for filtername, filtermessage in filterresult.iteritems():
+                    for filtername, filtermessage in filterresult:
                         if self.options.addnotes:
                             unit.adderror(filtername, filtermessage)
                         if isinstance(filtermessage, checks.SeriousFilterFailure):
@@ -163,6 +266,51 @@ class FilterOptionParser(optrecurse.RecursiveOptionParser):
             print options.checkfilter.getfilterdocs()
         else:
             self.recursiveprocess(options)
+            if options.timings:
+                print >> sys.stderr, options.checkfilter.gettimingreport()
+
+    def processjob(self, options, job):
+        """runs processfile for a job. in a worker process of processparallel(),
+        the timings of the job are passed on with the result"""
+        success = optrecurse.RecursiveOptionParser.processjob(self, options, job)
+        timings = options.checkfilter.timings
+        if timings is not None and multiprocessing is not None and \
+               multiprocessing.current_process().daemon:
+            jobtimings = dict(timings)
+            timings.clear()
+            return success, jobtimings
+        return success
+
+    def processparallel(self, options, jobs, numjobs):
+        """processes jobs in a pool of worker processes, adds their timings to
+        ours"""
+        results = optrecurse.RecursiveOptionParser.processparallel(self, options, jobs, numjobs)
+        for inputpath, success in results:
+            if isinstance(success, tuple):
+                success, timings = success
+                options.checkfilter.addtimings(timings)
+            yield inputpath, success
+
+
+_parallelcheck = None
+"""the checkfilter and units being checked by L{pocheckfilter.runparallel},
+inherited by the forked worker processes"""
+
+def _runparallelchecks((start, end)):
+    """worker process side of L{pocheckfilter.runparallel}, returns the
+    failures and the timings of the units from start to end. the failures
+    are returned as lists of pairs, unpickling a dict doesn't always give
+    the same order of its items"""
+    checkfilter, units = _parallelcheck
+    if checkfilter.timings is not None:
+        # only report the timings of this slice
+        checkfilter.timings.clear()
+    try:
+        failures = checkfilter.checker.run_filters_batch(units[start:end])
+        return [unitfailures.items() for unitfailures in failures], checkfilter.timings
+    except KeyboardInterrupt:
+        # the parent process terminates the pool
+        return [], None
 
 
 def runfilter(inputfile, outputfile, templatefile, checkfilter=None):
@@ -235,6 +383,9 @@ def cmdlineparser():
     parser.add_option("", "--validcharsfile", dest="validcharsfile",
         default=None, type="string", metavar="FILE",
         help="read list of all valid characters from FILE (must be in UTF-8)")
+    parser.add_option("", "--timings", dest="timings",
+        action="store_true", default=False,
+        help="report the number of units checked per second by each filter")
     parser.passthrough.append('checkfilter')
     parser.description = __doc__
     return parser
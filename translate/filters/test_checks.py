@@ -1046,3 +1046,34 @@ def test_hassuggestion():
 </xliff>
 ''')
     assert not checker.hassuggestion(xliff_store.units[0])
+
+
+def test_run_filters_batch():
+    """test that run_filters_batch() gives the same results as run_filters()"""
+    checker = checks.TeeChecker(checkerclasses=[checks.StandardChecker, checks.StandardUnitChecker],
+                                languagecode="af")
+    po_store = po.pofile()
+    units = []
+    for source, target in [("Open the file", "Maak die lêer oop"),
+                           ("%d files", "%s lêers"),
+                           ("Untranslated", ""),
+                           ("Open the file", "Maak die lêer oop.")]:
+        unit = po_store.addsourceunit(source)
+        unit.target = target
+        units.append(unit)
+    failures = checker.run_filters_batch(units)
+    assert failures == [checker.run_filters(unit) for unit in units]
+    assert failures[0] == {}
+    assert "printf" in failures[1]
+    # untranslated units skip the checks that depend on a translation
+    assert "untranslated" in failures[2]
+    assert "blank" not in failures[2]
+    assert "endpunc" in failures[3]
+
+
+def test_checkplan():
+    """test that the check plan follows the target language"""
+    checker = checks.StandardChecker()
+    assert "startcaps" in [name for name, function, message, isdefault in checker.getcheckplan().filters]
+    checker.config.updatetargetlanguage("ja")
+    assert "startcaps" not in [name for name, function, message, isdefault in checker.getcheckplan().filters]
@@ -198,6 +198,52 @@ class BaseTestFilter(object):
         assert len(unit.geterrors()) == 1
 
 
+    def check_parallel(self, translations):
+        """checks that sharing the units out between worker processes gives
+        the same result as checking them in order"""
+        for source, target in translations:
+            unit = self.translationstore.addsourceunit(source)
+            unit.target = target
+        # filtering adds notes to the units, so each run needs its own copy
+        filetext = str(self.translationstore)
+        serial_result = str(self.filter(self.parse_text(filetext)))
+        units_per_job = pofilter.UNITS_PER_JOB
+        pofilter.UNITS_PER_JOB = 2
+        try:
+            parallel_result = str(self.filter(self.parse_text(filetext),
+                                              cmdlineoptions=["--jobs=3"]))
+        finally:
+            pofilter.UNITS_PER_JOB = units_per_job
+        assert parallel_result == serial_result
+
+    def test_parallel(self):
+        """checks that sharing the units out between worker processes gives
+        the same result as checking them in order"""
+        self.check_parallel([(u"Test", u"REST"), (u"%d files", u"lêers"),
+                             (u"Open the file.", u"Maak die lêer oop"),
+                             (u"Save", u"")])
+
+    def test_parallel_many_failures(self):
+        """checks that the failures of units failing many tests are noted in
+        the same order by worker processes"""
+        self.check_parallel([(u"Open the %s file: %d times (see http://x.org/a).",
+                              u"maak  die lêer oop %d (sien www)"),
+                             (u"Test &Save FILE...", u"toets stoor lêer lêer"),
+                             (u"%(count)d files <b>deleted</b>.", u"lêers <i>geskrap</i>!!"),
+                             (u"Open file", u"OPEN FILE")])
+
+    def test_timings(self):
+        """checks that the filters are timed if requested"""
+        checkerconfig = checks.CheckerConfig()
+        options, args = pofilter.cmdlineparser().parse_args([self.filename,
+                                                             "--timings"])
+        checkfilter = pofilter.pocheckfilter(options, None, checkerconfig)
+        checkfilter.filterfile(self.translationstore)
+        units, seconds = checkfilter.timings["startcaps"]
+        assert units == 1
+        assert "startcaps" in checkfilter.gettimingreport()
+
+
 class TestPOFilter(BaseTestFilter):
     """Test class for po-specific tests."""
     filetext = '#: test.c\nmsgid "test"\nmsgstr "rest"\n'
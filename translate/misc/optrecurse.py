@@ -28,6 +28,10 @@ try:
     from cStringIO import StringIO
 except ImportError:
     from StringIO import StringIO
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
 
 from translate.misc import progressbar
 from translate import __version__
@@ -92,6 +96,7 @@ class RecursiveOptionParser(optparse.OptionParser, object):
         self.setmanpageoption()
         self.setprogressoptions()
         self.seterrorleveloptions()
+        self.setjobsoptions()
         self.setformats(formats, usetemplates)
         self.setpsycooption()
         self.passthrough = []
@@ -329,6 +334,17 @@ class RecursiveOptionParser(optparse.OptionParser, object):
                 help="show errorlevel as: %s" % (", ".join(self.errorleveltypes)))
         self.define_option(errorleveloption)
 
+    def setjobsoptions(self):
+        """sets the options for parallel and incremental processing"""
+        jobsoption = optparse.Option(None, "--jobs", dest="jobs",
+                type="int", default=1, metavar="JOBS",
+                help="process JOBS files in parallel, 0 means one per CPU (default: 1)")
+        self.define_option(jobsoption)
+        changedoption = optparse.Option(None, "--changed-only",
+                dest="changedonly", action="store_true", default=False,
+                help="only process files whose output is older than their input or template")
+        self.define_option(changedoption)
+
     def getformathelp(self, formats):
         """make a nice help string for describing formats..."""
         if None in formats:
@@ -373,6 +389,8 @@ class RecursiveOptionParser(optparse.OptionParser, object):
             self.error("You need to give an inputfile or use - for stdin ; use --help for full usage instructions")
         elif options.input == '-':
             options.input = None
+        if getattr(options, "jobs", 1) < 0:
+            self.error("--jobs must not be negative")
         return (options, args)
 
     def getpassthroughoptions(self, options):
@@ -502,6 +520,22 @@ class RecursiveOptionParser(optparse.OptionParser, object):
         options.recursiveoutput = self.isrecursive(options.output, 'output') and getattr(options, "allowrecursiveoutput", True)
         options.recursivetemplate = self.usetemplates and self.isrecursive(options.template, 'template') and getattr(options, "allowrecursivetemplate", True)
         self.initprogressbar(inputfiles, options)
+        jobs = self.recursejobs(options, inputfiles)
+        numjobs = getattr(options, "jobs", 1)
+        if numjobs == 0 and multiprocessing is not None:
+            numjobs = multiprocessing.cpu_count()
+        if numjobs > 1 and self.canprocessparallel(options):
+            results = self.processparallel(options, list(jobs), numjobs)
+        else:
+            results = ((job[0], self.processjob(options, job)) for job in jobs)
+        for inputpath, success in results:
+            self.reportprogress(inputpath, success)
+        del self.progressbar
+
+    def recursejobs(self, options, inputfiles):
+        """works out the processor and full paths for each input file,
+        yields (inputpath, fileprocessor, fullinputpath, fulloutputpath,
+        fulltemplatepath) tuples"""
         for inputpath in inputfiles:
             try:
                 templatepath = self.gettemplatename(options, inputpath)
@@ -522,17 +556,75 @@ class RecursiveOptionParser(optparse.OptionParser, object):
                     raise
                 self.warning("Couldn't handle input file %s" % inputpath, options, sys.exc_info())
                 continue
-            try:
-                success = self.processfile(fileprocessor, options,
-                                           fullinputpath, fulloutputpath,
-                                           fulltemplatepath)
-            except Exception, error:
-                if isinstance(error, KeyboardInterrupt):
-                    raise
-                self.warning("Error processing: input %s, output %s, template %s" % (fullinputpath, fulloutputpath, fulltemplatepath), options, sys.exc_info())
-                success = False
-            self.reportprogress(inputpath, success)
-        del self.progressbar
+            if getattr(options, "changedonly", False) and \
+                   self.isuptodate(options, fullinputpath, fulloutputpath, fulltemplatepath):
+                self.reportprogress(inputpath, True)
+                continue
+            yield (inputpath, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath)
+
+    def isuptodate(self, options, fullinputpath, fulloutputpath, fulltemplatepath):
+        """checks if the output file is newer than its input and template"""
+        if not fullinputpath or not fulloutputpath or \
+               fulloutputpath in (fullinputpath, fulltemplatepath):
+            return False
+        if not os.path.isfile(fulloutputpath):
+            return False
+        outputmtime = os.path.getmtime(fulloutputpath)
+        for fullpath in (fullinputpath, fulltemplatepath):
+            if fullpath and os.path.exists(fullpath) and os.path.getmtime(fullpath) >= outputmtime:
+                return False
+        return True
+
+    def processjob(self, options, job):
+        """runs processfile for a job from L{recursejobs}, returns whether
+        it succeeded"""
+        inputpath, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath = job
+        try:
+            return self.processfile(fileprocessor, options,
+                                    fullinputpath, fulloutputpath,
+                                    fulltemplatepath)
+        except KeyboardInterrupt:
+            # don't leave a half written output behind, it would look up
+            # to date to --changed-only
+            if fulloutputpath and fulloutputpath not in (fullinputpath, fulltemplatepath) \
+                   and os.path.isfile(fulloutputpath):
+                os.unlink(fulloutputpath)
+            raise
+        except Exception, error:
+            self.warning("Error processing: input %s, output %s, template %s" % (fullinputpath, fulloutputpath, fulltemplatepath), options, sys.exc_info())
+            return False
+
+    def canprocessparallel(self, options):
+        """checks if files can be processed in separate processes. this
+        needs fork() so the worker processes share the parser and options,
+        and every file must go to its own output file"""
+        if multiprocessing is None or not hasattr(os, "fork"):
+            return False
+        if not options.recursiveoutput:
+            return False
+        for archive in ("inputarchive", "outputarchive", "templatearchive"):
+            if getattr(options, archive, None) is not None:
+                return False
+        return True
+
+    def processparallel(self, options, jobs, numjobs):
+        """processes jobs in a pool of numjobs worker processes, yields
+        (inputpath, success) in the original order"""
+        global _paralleljobs
+        _paralleljobs = (self, options, jobs)
+        pool = multiprocessing.Pool(min(numjobs, max(len(jobs), 1)))
+        try:
+            results = pool.imap(_processparalleljob, xrange(len(jobs)))
+            for job in jobs:
+                # a timeout keeps the wait interruptible by Ctrl-C
+                yield job[0], results.next(sys.maxint)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _paralleljobs = None
 
     def openinputfile(self, options, fullinputpath):
         """opens the input file"""
@@ -731,3 +823,17 @@ class RecursiveOptionParser(optparse.OptionParser, object):
         """checks if this is a valid input filename"""
         inputbase, inputext = self.splitinputext(inputname)
         return (inputext in options.inputformats) or ("*" in options.inputformats)
+
+
+_paralleljobs = None
+"""the parser, options and jobs being processed by L{RecursiveOptionParser.processparallel},
+inherited by the forked worker processes"""
+
+def _processparalleljob(index):
+    """worker process side of L{RecursiveOptionParser.processparallel}"""
+    parser, options, jobs = _paralleljobs
+    try:
+        return parser.processjob(options, jobs[index])
+    except KeyboardInterrupt:
+        # the parent process terminates the pool
+        return False
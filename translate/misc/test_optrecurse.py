@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
 import os
+import sys
+import time
+import shutil
+import tempfile
 
 from translate.misc import optrecurse
 
@@ -20,3 +24,80 @@ class TestRecursiveOptionParser:
         root = os.path.join(dirname, name)
         print fullpath
         assert self.parser.splitext(fullpath) == (root, extension)
+
+
+def uppercase(inputfile, outputfile, templatefile):
+    outputfile.write(inputfile.read().upper())
+    return True
+
+
+class TestRecursiveProcess:
+
+    def setup_method(self, method):
+        self.testdir = tempfile.mkdtemp()
+        self.inputdir = os.path.join(self.testdir, "input")
+        self.outputdir = os.path.join(self.testdir, "output")
+        os.mkdir(self.inputdir)
+        for i in range(10):
+            subdir = os.path.join(self.inputdir, "dir%d" % (i % 3))
+            if not os.path.isdir(subdir):
+                os.mkdir(subdir)
+            open(os.path.join(subdir, "file%d.txt" % i), "w").write("file %d\n" % i)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.testdir)
+
+    def run_parser(self, *args):
+        parser = optrecurse.RecursiveOptionParser({"txt": ("txt", uppercase)})
+        processed = []
+        reportprogress = parser.reportprogress
+        def recordprogress(filename, success):
+            processed.append((filename, success))
+            reportprogress(filename, success)
+        parser.reportprogress = recordprogress
+        argv = sys.argv
+        sys.argv = ["test", "--progress=none", self.inputdir, self.outputdir] + list(args)
+        try:
+            parser.run()
+        finally:
+            sys.argv = argv
+        return processed
+
+    def read_outputs(self):
+        outputs = {}
+        for dirpath, dirnames, filenames in os.walk(self.outputdir):
+            for filename in filenames:
+                outputs[os.path.join(dirpath, filename)] = open(os.path.join(dirpath, filename)).read()
+        return outputs
+
+    def test_jobs(self):
+        """test that parallel processing gives the same output and progress order"""
+        serial = self.run_parser()
+        serialoutputs = self.read_outputs()
+        assert len(serialoutputs) == 10
+        assert serialoutputs[os.path.join(self.outputdir, "dir1", "file4.txt")] == "FILE 4\n"
+        shutil.rmtree(self.outputdir)
+        parallel = self.run_parser("--jobs=3")
+        assert parallel == serial
+        assert self.read_outputs() == serialoutputs
+
+    def test_changed_only(self):
+        """test that only files with outdated outputs get processed again"""
+        self.run_parser()
+        # make sure the outputs are newer than the inputs
+        outputmtime = int(time.time()) + 10
+        for outputpath in self.read_outputs():
+            os.utime(outputpath, (outputmtime, outputmtime))
+        changedpath = os.path.join(self.inputdir, "dir2", "file5.txt")
+        open(changedpath, "w").write("changed\n")
+        os.utime(changedpath, (outputmtime + 10, outputmtime + 10))
+        outputpath = os.path.join(self.outputdir, "dir0", "file0.txt")
+        os.remove(outputpath)
+
+        processed = self.run_parser("--changed-only")
+        assert len(processed) == 10
+        outputs = self.read_outputs()
+        assert outputs[os.path.join(self.outputdir, "dir2", "file5.txt")] == "CHANGED\n"
+        assert outputs[outputpath] == "FILE 0\n"
+        unchangedpath = os.path.join(self.outputdir, "dir1", "file4.txt")
+        assert os.path.getmtime(unchangedpath) == outputmtime
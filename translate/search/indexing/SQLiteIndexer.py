@@ -0,0 +1,589 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Zuza Software Foundation
+#
+# This file is part of translate.
+#
+# translate is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# translate is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with translate; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Interface to an SQLite based indexing engine for the Translate Toolkit
+
+The index is a single SQLite database file holding a postings table of
+(document, field, term) rows. It needs nothing beyond the sqlite3 module
+of the Python standard library, so it is always available - but it is only
+chosen if no other indexing engine is installed.
+
+Queries are compiled to SELECT statements returning the IDs of the matching
+documents. Partial matching is done with a range scan on the term index.
+"""
+
+__revision__ = "$Id$"
+
+import os
+import re
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    from pysqlite2 import dbapi2 as sqlite3
+
+import CommonIndexer
+
+
+def is_available():
+    return sqlite3.sqlite_version_info >= (3, 3, 0)
+
+
+# tokens are sequences of alphanumeric characters (including the underscore)
+_TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+# the field name used for plain terms
+_PLAIN_FIELD = u""
+
+# number of term conditions combined in a single SELECT of an OR query -
+# this keeps us below the limits of SQLite for compound statements
+_MAX_CONDITIONS = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    docid INTEGER PRIMARY KEY AUTOINCREMENT
+);
+CREATE TABLE IF NOT EXISTS terms (
+    docid INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    term TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS terms_field_term ON terms (field, term, docid);
+CREATE INDEX IF NOT EXISTS terms_docid ON terms (docid, field);
+"""
+
+
+class SQLiteQuery(object):
+    """a query of the SQLite indexer
+
+    Simple queries are a list of term conditions (combined with OR), while
+    combined queries consist of other queries. Both are turned into a
+    SELECT statement returning the matching document IDs.
+    """
+
+    def __init__(self, conditions=None, queries=None, require_all=True):
+        self.conditions = conditions
+        self.queries = queries
+        self.require_all = require_all
+
+    def is_simple(self):
+        return self.conditions is not None
+
+    def get_sql(self):
+        """return the SELECT statement and its parameters for this query
+
+        @return: the SELECT statement returning the document IDs and the
+            list of its parameters
+        @rtype: tuple of (unicode, list)
+        """
+        if self.is_simple():
+            return _select_conditions(self.conditions)
+        queries = self.queries
+        if not queries:
+            return (u"SELECT docid FROM documents WHERE 0", [])
+        if len(queries) == 1:
+            return queries[0].get_sql()
+        if self.require_all:
+            operator = u" INTERSECT "
+            parts = [query.get_sql() for query in queries]
+        else:
+            operator = u" UNION "
+            # merge simple queries, so we need less compound statements
+            conditions = []
+            parts = []
+            for query in queries:
+                if query.is_simple():
+                    conditions.extend(query.conditions)
+                else:
+                    parts.append(query.get_sql())
+            for start in range(0, len(conditions), _MAX_CONDITIONS):
+                parts.append(_select_conditions(
+                        conditions[start:start + _MAX_CONDITIONS]))
+        sql = operator.join([u"SELECT docid FROM (%s)" % part_sql
+                for part_sql, part_params in parts])
+        params = []
+        for part_sql, part_params in parts:
+            params.extend(part_params)
+        return (sql, params)
+
+    def __str__(self):
+        if self.is_simple():
+            text = u" OR ".join([u"%s:%s%s" % (field, term, partial and u"*" or u"")
+                    for field, term, partial in self.conditions])
+        else:
+            if self.require_all:
+                operator = u" AND "
+            else:
+                operator = u" OR "
+            text = operator.join([unicode(query) for query in self.queries])
+        return (u"(%s)" % text).encode("utf-8")
+
+    def __unicode__(self):
+        return str(self).decode("utf-8")
+
+
+class SQLiteDatabase(CommonIndexer.CommonDatabase):
+    """interface to an SQLite based indexing database
+    """
+
+    QUERY_TYPE = SQLiteQuery
+    INDEX_DIRECTORY_NAME = "sqlite"
+
+    def __init__(self, basedir, analyzer=None, create_allowed=True):
+        """initialize or open an SQLite index database
+
+        @raise ValueError: the given location exists, but the database type
+                is incompatible (e.g. created by a different indexing engine)
+        @raise OSError: the database failed to initialize
+
+        @param basedir: the parent directory of the database
+        @type basedir: str
+        @param analyzer: bitwise combination of possible analyzer flags
+            to be used as the default analyzer for this database. Leave it empty
+            to use the system default analyzer (self.ANALYZER_DEFAULT).
+            see self.ANALYZER_TOKENIZE, self.ANALYZER_PARTIAL, ...
+        @type analyzer: int
+        @param create_allowed: create the database, if necessary; default: True
+        @type create_allowed: bool
+        """
+        # call the __init__ function of our parent
+        super(SQLiteDatabase, self).__init__(basedir, analyzer=analyzer,
+                create_allowed=create_allowed)
+        # every thread gets its own connection (and its own transactions),
+        # since sqlite3 connections can't be shared between threads
+        self._local = threading.local()
+        if os.path.exists(self.location):
+            # try to open an existing database
+            try:
+                tables = [row[0] for row in self.connection.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table'")]
+            except sqlite3.DatabaseError, err_msg:
+                raise ValueError("Indexer: failed to open sqlite database " \
+                        + "(%s) - maybe it is not a sqlite database: %s" \
+                        % (self.location, str(err_msg)))
+            if "documents" not in tables or "terms" not in tables:
+                self.connection.close()
+                self._local.connection = None
+                raise ValueError("Indexer: the sqlite database (%s) does " \
+                        % self.location + "not contain an index")
+        else:
+            # create a new database
+            if not create_allowed:
+                raise OSError("Indexer: skipping database creation")
+            try:
+                # create the parent directory if it does not exist
+                parent_path = os.path.dirname(self.location)
+                if not os.path.isdir(parent_path):
+                    # recursively create all directories up to parent_path
+                    os.makedirs(parent_path)
+            except IOError, err_msg:
+                raise OSError("Indexer: failed to create the parent " \
+                        + "directory (%s) of the indexing database: %s" \
+                        % (parent_path, str(err_msg)))
+            try:
+                self.connection.executescript(_SCHEMA)
+            except sqlite3.DatabaseError, err_msg:
+                raise OSError("Indexer: failed to create a sqlite " \
+                        + "database (%s): %s" % (self.location, str(err_msg)))
+
+    def __del__(self):
+        # the connections of other threads are closed when they are
+        # garbage collected
+        local = getattr(self, "_local", None)
+        if getattr(local, "connection", None) is not None:
+            if self._in_transaction:
+                self.cancel_transaction()
+            local.connection.close()
+            local.connection = None
+
+    def _get_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    connection = property(_get_connection)
+
+    def _get_in_transaction(self):
+        return getattr(self._local, "in_transaction", False)
+
+    def _set_in_transaction(self, value):
+        self._local.in_transaction = value
+
+    _in_transaction = property(_get_in_transaction, _set_in_transaction)
+
+    def _connect(self):
+        """open the database file
+
+        The connection runs in autocommit mode - transactions are started
+        explicitely (see L{begin_transaction}).
+        """
+        connection = sqlite3.connect(self.location, timeout=30,
+                isolation_level=None)
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def flush(self, optimize=False):
+        """force to write the current changes to disk immediately
+
+        All changes outside of transactions are written immediately anyway.
+
+        @param optimize: update the statistics used by the query planner
+        @type optimize: bool
+        """
+        if optimize and not self._in_transaction:
+            self.connection.execute("ANALYZE")
+
+    def get_doccount(self):
+        """return the number of documents in the database
+
+        @rtype: int
+        """
+        return self.connection.execute(
+                "SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def _create_query_for_query(self, query):
+        """generate a query based on an existing query object
+
+        queries are never changed - so there is no need for a copy
+
+        @param query: the original query object
+        @type query: SQLiteQuery
+        @return: the resulting query object
+        @rtype: SQLiteQuery
+        """
+        return query
+
+    def _create_query_for_string(self, text, require_all=True,
+            analyzer=None):
+        """generate a query for a plain term of a string query
+
+        basically this function parses the string and returns the resulting
+        query
+
+        @param text: the query string
+        @type text: str
+        @param require_all: boolean operator
+            (True -> AND (default) / False -> OR)
+        @type require_all: bool
+        @param analyzer: Define query options (partial matching, exact matching,
+            tokenizing, ...) as bitwise combinations of
+            CommonIndexer.ANALYZER_???.
+            This can override previously defined field analyzer settings.
+            If analyzer is None (default), then the configured analyzer for the
+            field is used.
+        @type analyzer: int
+        @return: resulting query object
+        @rtype: SQLiteQuery
+        """
+        if analyzer is None:
+            analyzer = self.analyzer
+        return self._parse_query(_PLAIN_FIELD, text, require_all, analyzer)
+
+    def _create_query_for_field(self, field, value, analyzer=None):
+        """generate a field query
+
+        this functions creates a field->value query
+
+        @param field: the fieldname to be used
+        @type field: str
+        @param value: the wanted value of the field
+        @type value: str
+        @param analyzer: Define query options (partial matching, exact matching,
+            tokenizing, ...) as bitwise combinations of
+            CommonIndexer.ANALYZER_???.
+            This can override previously defined field analyzer settings.
+            If analyzer is None (default), then the configured analyzer for the
+            field is used.
+        @type analyzer: int
+        @return: the resulting query object
+        @rtype: SQLiteQuery
+        """
+        if analyzer is None:
+            analyzer = self.analyzer
+        return self._parse_query(field, value, True, analyzer)
+
+    def _parse_query(self, field, text, require_all, analyzer):
+        """turn a query string into a query object
+
+        Like the xapian query parser, partial matching applies to the last
+        word of the query string only.
+        """
+        if analyzer == self.ANALYZER_EXACT:
+            # exact matching -> keep special characters
+            return SQLiteQuery([(field, text, False)])
+        tokens = _tokenize(text)
+        partial = (analyzer & self.ANALYZER_PARTIAL > 0)
+        queries = [SQLiteQuery([(field, token, False)])
+                for token in tokens[:-1]]
+        if tokens:
+            queries.append(SQLiteQuery([(field, tokens[-1], partial)]))
+        if len(queries) == 1:
+            return queries[0]
+        return SQLiteQuery(queries=queries, require_all=require_all)
+
+    def _create_query_combined(self, queries, require_all=True):
+        """generate a combined query
+
+        @param queries: list of the original queries
+        @type queries: list of SQLiteQuery
+        @param require_all: boolean operator
+            (True -> AND (default) / False -> OR)
+        @type require_all: bool
+        @return: the resulting combined query object
+        @rtype: SQLiteQuery
+        """
+        if len(queries) == 1:
+            return queries[0]
+        return SQLiteQuery(queries=queries, require_all=require_all)
+
+    def _create_empty_document(self):
+        """create an empty document to be filled and added to the index later
+
+        @return: the new document object
+        @rtype: list of (field, term) tuples
+        """
+        return []
+
+    def _add_plain_term(self, document, term, tokenize=True):
+        """add a term to a document
+
+        @param document: the document to be changed
+        @type document: list of (field, term) tuples
+        @param term: a single term to be added
+        @type term: str
+        @param tokenize: should the term be tokenized automatically
+        @type tokenize: bool
+        """
+        self._add_field_term(document, _PLAIN_FIELD, term, tokenize)
+
+    def _add_field_term(self, document, field, term, tokenize=True):
+        """add a field term to a document
+
+        @param document: the document to be changed
+        @type document: list of (field, term) tuples
+        @param field: name of the field
+        @type field: str
+        @param term: term to be associated to the field
+        @type term: str
+        @param tokenize: should the term be tokenized automatically
+        @type tokenize: bool
+        """
+        field = self._decode(field)
+        if tokenize:
+            for token in _tokenize(term):
+                document.append((field, token))
+        else:
+            document.append((field, term))
+
+    def _add_document_to_index(self, document):
+        """add a prepared document to the index database
+
+        @param document: the document to be added
+        @type document: list of (field, term) tuples
+        """
+        # every term is stored only once per document
+        terms = []
+        for item in document:
+            if not item in terms:
+                terms.append(item)
+        self._write(self._insert_document, terms)
+
+    def _insert_document(self, terms):
+        cursor = self.connection.execute(
+                "INSERT INTO documents DEFAULT VALUES")
+        docid = cursor.lastrowid
+        self.connection.executemany(
+                "INSERT INTO terms (docid, field, term) VALUES (?, ?, ?)",
+                [(docid, field, term) for field, term in terms])
+
+    def _write(self, function, *args):
+        """run a modification of the database in a transaction
+
+        Modifications outside of a transaction get their own one.
+        """
+        if self._in_transaction:
+            return function(*args)
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = function(*args)
+        except:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+        return result
+
+    def begin_transaction(self):
+        """begin a transaction
+
+        All modifications are written in one go when the transaction is
+        committed. This avoids syncing every single document to disk and
+        therefore increases performance.
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+
+    def cancel_transaction(self):
+        """cancel an ongoing transaction
+
+        no changes since the last execution of 'begin_transcation' are written
+        """
+        self._in_transaction = False
+        self.connection.execute("ROLLBACK")
+
+    def commit_transaction(self):
+        """submit the changes of an ongoing transaction
+
+        all changes since the last execution of 'begin_transaction' are written
+        """
+        self._in_transaction = False
+        self.connection.execute("COMMIT")
+
+    def get_query_result(self, query):
+        """return an object containing the results of a query
+
+        @param query: a pre-compiled query
+        @type query: SQLiteQuery
+        @return: an object that allows access to the results
+        @rtype: SQLiteIndexer.CommonEnquire
+        """
+        return SQLiteEnquire((self, query.get_sql()))
+
+    def delete_document_by_id(self, docid):
+        """delete a specified document
+
+        @param docid: the document ID to be deleted
+        @type docid: int
+        """
+        return self._write(self._delete_document, docid)
+
+    def _delete_document(self, docid):
+        cursor = self.connection.execute(
+                "DELETE FROM documents WHERE docid = ?", (docid,))
+        if cursor.rowcount < 1:
+            return False
+        self.connection.execute("DELETE FROM terms WHERE docid = ?", (docid,))
+        return True
+
+    def search(self, query, fieldnames):
+        """return a list of the contents of specified fields for all matches of
+        a query
+
+        @param query: the query to be issued
+        @type query: SQLiteQuery
+        @param fieldnames: the name(s) of a field of the document content
+        @type fieldnames: string | list of strings
+        @return: a list of dicts containing the specified field(s)
+        @rtype: list of dicts
+        """
+        if isinstance(fieldnames, basestring):
+            fieldnames = [fieldnames]
+        # map the stored field names to the requested ones
+        names = {}
+        for fname in fieldnames:
+            if fname is None:
+                names[_PLAIN_FIELD] = None
+            else:
+                names[self._decode(fname)] = fname
+        sql, params = query.get_sql()
+        docids = [docid for (docid,) in self.connection.execute(
+                "SELECT docid FROM (%s) ORDER BY docid" % sql, params)]
+        documents = dict([(docid, {}) for docid in docids])
+        field_marks = ", ".join(["?"] * len(names))
+        for start in range(0, len(docids), _MAX_CONDITIONS):
+            chunk = docids[start:start + _MAX_CONDITIONS]
+            rows = self.connection.execute(
+                    "SELECT docid, field, term FROM terms " \
+                    + "WHERE docid IN (%s) AND field IN (%s) ORDER BY rowid" \
+                    % (", ".join(["?"] * len(chunk)), field_marks),
+                    chunk + names.keys())
+            for docid, field, term in rows:
+                documents[docid].setdefault(names[field], []).append(term)
+        return [documents[docid] for docid in docids]
+
+
+class SQLiteEnquire(CommonIndexer.CommonEnquire):
+    """the matches of a query are fetched lazily from the database
+    """
+
+    def get_matches(self, start, number):
+        """return a specified number of qualified matches of a previous query
+
+        @param start: index of the first match to return (starting from zero)
+        @type start: int
+        @param number: the number of matching entries to return
+        @type number: int
+        @return: a set of matching entries and some statistics
+        @rtype: tuple of (returned number, available number, matches)
+                "matches" is a dictionary of::
+                    ["rank", "percent", "document", "docid"]
+        """
+        database, (sql, params) = self.enquire
+        # use the connection of the current thread
+        connection = database.connection
+        available = connection.execute("SELECT COUNT(*) FROM (%s)" % sql,
+                params).fetchone()[0]
+        rows = connection.execute(
+                "SELECT docid FROM (%s) ORDER BY docid LIMIT ? OFFSET ?" % sql,
+                params + [number, start])
+        result = []
+        for rank, (docid,) in enumerate(rows):
+            elem = {}
+            elem["rank"] = start + rank
+            elem["docid"] = docid
+            elem["percent"] = 100
+            elem["document"] = None
+            result.append(elem)
+        return (len(result), available, result)
+
+
+def _tokenize(text):
+    """split a text into lower case words"""
+    return [token.lower() for token in _TOKEN_REGEX.findall(text)]
+
+
+def _select_conditions(conditions):
+    """return a SELECT statement for documents matching any of the given
+    term conditions
+
+    @param conditions: list of (field, term, partial) tuples
+    @type conditions: list of tuples
+    @rtype: tuple of (unicode, list)
+    """
+    clauses = []
+    params = []
+    for field, term, partial in conditions:
+        if partial:
+            # a range scan on the term index finds all terms with this prefix
+            clauses.append(u"(field = ? AND term >= ? AND term < ?)")
+            params.extend([field, term, term + u"\U0010ffff"])
+        else:
+            clauses.append(u"(field = ? AND term = ?)")
+            params.extend([field, term])
+    if len(conditions) == 1 and not conditions[0][2]:
+        # terms are unique within a document
+        select = u"SELECT docid FROM terms WHERE %s"
+    else:
+        select = u"SELECT DISTINCT docid FROM terms WHERE %s"
+    return (select % u" OR ".join(clauses), params)
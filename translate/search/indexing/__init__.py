@@ -40,6 +40,11 @@ import CommonIndexer
     * do unittests for PyLucene v1.x
     """
 
+# indexing engines that are always available (e.g. based on the python
+# standard library) - they are only used if no other engine is installed,
+# or if they are asked for (see L{get_indexer})
+_FALLBACK_INDEXERS = ["SQLiteIndexer"]
+
 
 def _get_available_indexers():
     """get a list of the available supported indexing engines
@@ -92,6 +97,9 @@ def _get_available_indexers():
             except TypeError:
                 # 'element' is not a class
                 continue
+    # move the fallback engines to the end (the sort is stable)
+    result.sort(key=lambda indexer_class: \
+            indexer_class.__module__.split(".")[-1] in _FALLBACK_INDEXERS)
     return result
 
 
@@ -136,13 +144,16 @@ _AVAILABLE_INDEXERS = _get_available_indexers()
 HAVE_INDEXER = bool(_AVAILABLE_INDEXERS)
 
 
-def get_indexer(basedir, preference=None):
+def get_indexer(basedir, preference=None, fallback=True):
     """return an appropriate indexer for the given directory
 
     If the directory already exists, then we check, if one of the available
     indexers knows how to handle it. Otherwise we return the first available
     indexer.
 
+    Applications that keep their own search without an indexing engine can
+    turn off the fallback engines, which are always available.
+
     @raise IndexError: there is no indexing engine available
     @raise ValueError: the database location already exists, but we did not find
                        a suitable indexing engine for it
@@ -152,16 +163,24 @@ def get_indexer(basedir, preference=None):
     @param basedir: the parent directory of (possible) different indexing
              databases
     @type basedir: string
+    @param preference: names of the preferred indexing engines
+    @type preference: list of str
+    @param fallback: also use the fallback engines (see L{_FALLBACK_INDEXERS})
+    @type fallback: bool
     @return: the class of the most appropriate indexer
     @rtype: subclass of L{CommonIndexer.CommonDatabase}
     """
-    if not _AVAILABLE_INDEXERS:
+    if fallback:
+        indexers = _AVAILABLE_INDEXERS
+    else:
+        indexers = [indexer_class for indexer_class in _AVAILABLE_INDEXERS
+                if indexer_class.__module__.split(".")[-1] not in _FALLBACK_INDEXERS]
+    if not indexers:
         raise IndexError("Indexer: no indexing engines are available")
     if preference is None:
         preference = []
     # sort available indexers by preference
-    preferred_indexers = _sort_indexers_by_preference(_AVAILABLE_INDEXERS,
-            preference)
+    preferred_indexers = _sort_indexers_by_preference(indexers, preference)
     if os.path.exists(basedir):
         for index_class in preferred_indexers:
             try:
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Zuza Software Foundation
+#
+# This file is part of translate.
+#
+# translate is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# translate is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with translate; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""compare the indexing throughput and the query latency of the available
+indexing engines
+
+The documents are modelled after the ones indexed by Pootle: one document
+per translation unit with the name of its file, some ids and the source and
+target text.
+
+usage: python benchmark.py [--documents=N] [--queries=N] [engine ...]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+WORDS = ("file open save close window edit view help about print copy "
+         "paste cut undo redo search replace find next previous select all "
+         "none document page line column format font size color insert "
+         "delete remove add new name value option setting preference tool "
+         "error warning message question cancel apply ok yes no").split()
+
+FIELD_ANALYZERS = ("pofilename", "itemno", "pomtime", "dbid")
+
+
+def make_documents(count, files=50):
+    """create a reproducible list of documents"""
+    generator = random.Random(count)
+
+    def sentence():
+        return " ".join(generator.sample(WORDS, generator.randint(2, 8)))
+
+    documents = []
+    for index in range(count):
+        documents.append({
+            "pofilename": "/af/project/file%d.po" % (index % files),
+            "pomtime": "1234567890",
+            "itemno": str(index / files),
+            "dbid": str(index),
+            "source": sentence(),
+            "target": sentence(),
+            })
+    return documents
+
+
+def make_queries(database, count):
+    """create a reproducible list of the queries Pootle is using"""
+    generator = random.Random(count)
+    queries = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            # check if a file is indexed
+            queries.append(database.make_query(
+                [("pofilename", "/af/project/file%d.po" % generator.randint(0, 49)),
+                 ("pomtime", "1234567890")], True))
+        elif kind == 1:
+            # search for a word (partial matching)
+            queries.append(database.make_query(
+                [("source", generator.choice(WORDS)[:3])], True))
+        elif kind == 2:
+            # search for multiple words in source or target
+            text = " ".join(generator.sample(WORDS, 2))
+            queries.append(database.make_query(
+                [database.make_query([("source", text)], True),
+                 database.make_query([("target", text)], True)], False))
+        else:
+            # search within the files of a directory
+            pofilenames = [("pofilename", "/af/project/file%d.po" % number)
+                    for number in generator.sample(range(50), 10)]
+            queries.append(database.make_query(
+                [database.make_query(pofilenames, False),
+                 database.make_query([("target", generator.choice(WORDS))],
+                     True)], True))
+    return queries
+
+
+def run_benchmark(indexer_class, documents, query_count):
+    """index the documents and run the queries with one indexing engine
+
+    @return: documents per second, average query time in milliseconds
+    @rtype: tuple of (float, float)
+    """
+    basedir = tempfile.mkdtemp()
+    try:
+        database = indexer_class(basedir)
+        database.set_field_analyzers(dict([(field, database.ANALYZER_EXACT)
+                for field in FIELD_ANALYZERS]))
+        start = time.time()
+        database.begin_transaction()
+        for document in documents:
+            database.index_document(document)
+        database.commit_transaction()
+        database.flush(optimize=True)
+        throughput = len(documents) / (time.time() - start)
+        queries = make_queries(database, query_count)
+        start = time.time()
+        for query in queries:
+            database.search(query, "dbid")
+        latency = (time.time() - start) * 1000 / len(queries)
+        del database
+    finally:
+        shutil.rmtree(basedir, ignore_errors=True)
+    return throughput, latency
+
+
+def main():
+    parser = OptionParser(usage="%prog [options] [engine ...]")
+    parser.add_option("--documents", type="int", default=20000,
+            help="number of documents to index (default: %default)")
+    parser.add_option("--queries", type="int", default=1000,
+            help="number of queries to run (default: %default)")
+    options, engines = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import __init__ as indexing
+    indexer_classes = indexing._sort_indexers_by_preference(
+            indexing._AVAILABLE_INDEXERS, engines)
+    if engines:
+        indexer_classes = [indexer_class for indexer_class in indexer_classes
+                if indexer_class.__module__ in engines]
+    if not indexer_classes:
+        parser.error("no indexing engines are available")
+    documents = make_documents(options.documents)
+    print "%-20s %15s %15s" % ("engine", "documents/s", "ms/query")
+    for indexer_class in indexer_classes:
+        throughput, latency = run_benchmark(indexer_class, documents,
+                options.queries)
+        print "%-20s %15.0f %15.3f" % (indexer_class.__module__, throughput,
+                latency)
+
+
+if __name__ == "__main__":
+    main()
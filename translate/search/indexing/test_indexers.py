@@ -24,6 +24,7 @@
 import os
 import sys
 import shutil
+import threading
 
 import __init__ as indexing
 import CommonIndexer
@@ -34,7 +35,8 @@ DATABASE = "tmp-index"
 default_engine = ""
 
 # order of tests to be done
-ORDER_OF_TESTS = ["XapianIndexer", "PyLuceneIndexer", "PyLuceneIndexer1"]
+ORDER_OF_TESTS = ["XapianIndexer", "PyLuceneIndexer", "PyLuceneIndexer1",
+        "SQLiteIndexer"]
 
 
 def _get_indexer(location):
@@ -385,10 +387,48 @@ def test_multiple_terms():
     clean_database()
 
 
+def test_threads():
+    """test if a database can be searched from another thread than the one
+    that created it (like Pootle does)"""
+    # clean up everything first
+    clean_database()
+    # initialize the database with example content
+    new_db = _get_indexer(DATABASE)
+    create_example_content(new_db)
+    query = new_db.make_query({"fname1": "bar_field1"})
+    results = []
+
+    def search():
+        results.append(new_db.search(query, ["fname2"]))
+        results.append(new_db.get_query_result(query).get_matches(0, 10)[0])
+    thread = threading.Thread(target=search)
+    thread.start()
+    thread.join()
+    assert results == [[{"fname2": ["foo_field2"]}], 1]
+    # clean up
+    clean_database()
+
+
+def test_without_fallback():
+    """test if the fallback engines are left out if asked to"""
+    clean_database()
+    try:
+        new_db = indexing.get_indexer(DATABASE, fallback=False)
+    except IndexError:
+        # no other engine is installed
+        pass
+    else:
+        assert get_engine_name(new_db).split(".")[-1] not in indexing._FALLBACK_INDEXERS
+    # clean up
+    clean_database()
+
+
 def show_database(database):
     """print the complete database - for debugging purposes"""
     if database.INDEX_DIRECTORY_NAME == "xapian":
         _show_database_xapian(database)
+    elif database.INDEX_DIRECTORY_NAME == "sqlite":
+        _show_database_sqlite(database)
     else:
         _show_database_pylucene(database)
 
@@ -416,10 +456,22 @@ def _show_database_xapian(database):
                 for one_term in document.termlist()]))
 
 
+def _show_database_sqlite(database):
+    print "Database overview: %d items" % database.get_doccount()
+    documents = {}
+    for docid, field, term in database.connection.execute(
+            "SELECT docid, field, term FROM terms ORDER BY docid, rowid"):
+        documents.setdefault(docid, []).append((field, term))
+    for docid in sorted(documents):
+        print "\tDocument [%d]: %s" % (docid, str(documents[docid]))
+
+
 def _get_number_of_docs(database):
     if database.INDEX_DIRECTORY_NAME == "xapian":
         # xapian
         return database.reader.get_doccount()
+    elif database.INDEX_DIRECTORY_NAME == "sqlite":
+        return database.get_doccount()
     else:
         # pylucene
         database._writer_close()
@@ -496,6 +548,8 @@ if __name__ == "__main__":
         test_tokenizing()
         test_searching()
         test_multiple_terms()
+        test_threads()
+        test_without_fallback()
         # TODO: add test for document deletion
         # TODO: add test for transaction handling
         # TODO: add test for multiple engine/database handling in "get_indexer"
@@ -24,6 +24,9 @@ distance. See http://en.wikipedia.org/wiki/Levenshtein_distance.
 If available, the python-Levenshtein package will be used which will provide
 better performance as it is implemented natively. See
 http://trific.ath.cx/python/levenshtein/
+
+When comparing one string with many others, L{LevenshteinComparer.similarity_many}
+can also use NumPy to calculate the distances to all of them at once.
 """
 
 import math
@@ -65,13 +68,120 @@ def native_distance(a, b, stopvalue=0):
     string types."""
     return Levenshtein.distance(a, b)
 
+def _pattern_masks(a):
+    """Returns a dictionary mapping every character in a to a bit mask of the
+    positions where it occurs in a."""
+    masks = {}
+    bit = 1
+    for char in a:
+        masks[char] = masks.get(char, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def bitparallel_distance(a, b, stopvalue=0):
+    """Same as python_distance in functionality, but using the bit-parallel
+    algorithm of Myers (as formulated by Hyyrö). Every row of the distance
+    matrix is kept as bit vectors of the vertical differences, so the distance
+    is found with a handful of operations on long integers per character of
+    b instead of an inner loop over a. The distance is always calculated
+    completely."""
+    l1 = len(a)
+    if l1 == 0:
+        return len(b)
+    masks = _pattern_masks(a)
+    full = (1 << l1) - 1
+    high = 1 << (l1 - 1)
+    pv, mv, score = full, 0, l1
+    for char in b:
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+def numpy_distances(a, strings):
+    """Calculates the distances between a and each of the given strings at
+    once with NumPy, using the same algorithm as bitparallel_distance with
+    the bit vectors of all the strings in arrays of 64 bit integers. Only
+    strings a of 1 to 64 characters are supported."""
+    l1 = len(a)
+    assert 0 < l1 <= 64
+    masks = _pattern_masks(a)
+    # Handle the longest strings first, so that the strings still being
+    # processed are always at the front of the arrays.
+    order = sorted(xrange(len(strings)), key=lambda i: len(strings[i]), reverse=True)
+    lengths = [len(strings[i]) for i in order]
+    maxlen = lengths and lengths[0] or 0
+    eqs = numpy.zeros((maxlen, len(strings)), dtype=numpy.uint64)
+    for column, i in enumerate(order):
+        eqs[:lengths[column], column] = [masks.get(char, 0) for char in strings[i]]
+
+    one = numpy.uint64(1)
+    high = numpy.uint64(1 << (l1 - 1))
+    pv = numpy.empty(len(strings), dtype=numpy.uint64)
+    pv.fill(numpy.uint64((1 << l1) - 1))
+    mv = numpy.zeros(len(strings), dtype=numpy.uint64)
+    scores = numpy.empty(len(strings), dtype=numpy.int64)
+    scores.fill(l1)
+    active = len(strings)
+    for row in xrange(maxlen):
+        while lengths[active - 1] <= row:
+            active -= 1
+        eq = eqs[row, :active]
+        pva, mva = pv[:active], mv[:active]
+        xv = eq | mva
+        xh = (((eq & pva) + pva) ^ pva) | eq
+        ph = mva | ~(xh | pva)
+        mh = pva & xh
+        scores[:active] += (ph & high) != 0
+        scores[:active] -= (mh & high) != 0
+        ph = (ph << one) | one
+        mh = mh << one
+        pv[:active] = mh | ~(xv | ph)
+        mv[:active] = ph & xv
+
+    distances = [0] * len(strings)
+    for column, i in enumerate(order):
+        distances[i] = int(scores[column])
+    return distances
+
+
+def native_distances(a, strings):
+    return [Levenshtein.distance(a, b) for b in strings]
+
+
+def python_distances(a, strings):
+    """Calculates the distances between a and each of the given strings,
+    using NumPy if possible."""
+    if numpy is not None and 0 < len(a) <= 64 and strings:
+        return numpy_distances(a, strings)
+    return [bitparallel_distance(a, b) for b in strings]
+
 try:
     import Levenshtein as Levenshtein
     distance = native_distance
+    distances = native_distances
 except ImportError:
     import logging
     logging.warning("Python-Levenshtein not found. Continuing with built-in (slower) fuzzy matching.")
     distance = python_distance
+    distances = python_distances
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class LevenshteinComparer:
@@ -99,6 +209,46 @@ class LevenshteinComparer:
 #            measurements += 1
         return similarity / measurements
 
+    def similarity_many(self, text, candidates, stoppercentage=40):
+        """Returns the similarities between text and each of the candidates,
+        exactly as similarity() would for each of them, but calculating all
+        the distances in one batch."""
+        results = [0] * len(candidates)
+        pending = []
+        text_l = len(text)
+        if text_l == 0:
+            return results
+        trimmed_text = text[:self.MAX_LEN]
+        for i, candidate in enumerate(candidates):
+            candidate_l = len(candidate)
+            if candidate_l == 0:
+                continue
+            l1, l2 = min(text_l, candidate_l), max(text_l, candidate_l)
+            maxsimilarity = 100 - 100.0*abs(l1 - l2)/l2
+            if maxsimilarity < stoppercentage:
+                results[i] = maxsimilarity * 1.0
+                continue
+            # Trimming both strings is the same as trimming the longer string
+            # and maybe the shorter one in similarity_real()
+            penalty = 0
+            if l2 > self.MAX_LEN:
+                l2 = self.MAX_LEN
+                penalty += 7
+                if l1 > self.MAX_LEN:
+                    penalty += 7
+            pending.append((i, candidate[:self.MAX_LEN], l2, penalty))
+
+        batch_distances = distances(trimmed_text, [candidate for _i, candidate, _l2, _penalty in pending])
+        for (i, candidate, l2, penalty), dist in zip(pending, batch_distances):
+            stopvalue = math.ceil((100.0 - stoppercentage)/100 * l2)
+            if dist > stopvalue:
+                results[i] = stoppercentage - 1.0
+                continue
+            if dist != 0:
+                penalty = 0
+            results[i] = 100 - (dist*1.0/l2)*100 - penalty
+        return results
+
     def similarity_real(self, a, b, stoppercentage=40):
         """Returns the similarity between a and b based on Levenshtein distance. It
            can stop prematurely as soon as it sees that a and b will be no simmilar than
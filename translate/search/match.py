@@ -20,12 +20,16 @@
 
 """Class to perform translation memory matching from a store of translation units"""
 
+import bisect
 import heapq
+import math
 import re
 
 from translate.search import lshtein
 from translate.search import terminology
+from translate.search import tmsnapshot
 from translate.storage import base
+from translate.storage import factory
 from translate.storage import po
 from translate.misc.multistring import multistring
 
@@ -45,20 +49,74 @@ def _sort_matches(matches, match_info):
     matches.sort(_matches_cmp)
 
 
+class NgramIndex(object):
+    """An inverted index from character n-grams to the candidates containing
+    them, used to discard candidates before calculating their Levenshtein
+    distance.
+
+    If the edit distance between two strings is at most k, they have at least
+    max(len(a), len(b)) - n + 1 - k*n n-grams in common (counting repeated
+    n-grams). Candidates sharing fewer n-grams with the query can therefore
+    never reach the required similarity."""
+
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = {}
+
+    def grams(self, text):
+        """Returns a dictionary mapping the n-grams in text to the number of
+        times they occur."""
+        n = self.n
+        counts = {}
+        for i in xrange(len(text) - n + 1):
+            gram = text[i:i+n]
+            counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def add(self, unit):
+        for gram, count in self.grams(unit.source).iteritems():
+            self.postings.setdefault(gram, []).append((unit, count))
+
+    def shared(self, text):
+        """Returns a dictionary mapping the id() of every candidate with an
+        n-gram in common with text to the number of n-grams they share."""
+        shared = {}
+        for gram, count in self.grams(text).iteritems():
+            for unit, unitcount in self.postings.get(gram, ()):
+                key = id(unit)
+                shared[key] = shared.get(key, 0) + min(count, unitcount)
+        return shared
+
+    def mincommon(self, length, min_similarity):
+        """Returns the minimum number of n-grams that a candidate must share
+        with the query to reach min_similarity, where length is the length of
+        the longer of the two strings as considered by the comparer."""
+        # This mirrors the stopvalue in LevenshteinComparer.similarity_real()
+        maxdistance = math.ceil((100.0 - min_similarity) / 100 * length)
+        return length - self.n + 1 - self.n * maxdistance
+
+
 class matcher(object):
     """A class that will do matching and store configuration for the matching process"""
 
     sort_reverse = False
+    ngrams = None
+    batch_size = 128
 
-    def __init__(self, store, max_candidates=10, min_similarity=75, max_length=70, comparer=None, usefuzzy=False):
+    def __init__(self, store, max_candidates=10, min_similarity=75, max_length=70, comparer=None, usefuzzy=False, usengrams=False):
         """max_candidates is the maximum number of candidates that should be assembled,
         min_similarity is the minimum similarity that must be attained to be included in
-        the result, comparer is an optional Comparer with similarity() function"""
+        the result, comparer is an optional Comparer with similarity() function.
+        If usengrams is True, an index of character trigrams is kept to avoid
+        comparing text with candidates that can't be similar enough. This
+        doesn't change the results, and is only used with the default
+        Levenshtein comparer."""
         if comparer is None:
             comparer = lshtein.LevenshteinComparer(max_length)
         self.comparer = comparer
         self.setparameters(max_candidates, min_similarity, max_length)
         self.usefuzzy = usefuzzy
+        self.usengrams = usengrams and isinstance(comparer, lshtein.LevenshteinComparer)
         self.inittm(store)
         self.addpercentage = True
 
@@ -83,6 +141,14 @@ class matcher(object):
         # reverse is deprectated - just use self.sort_reverse
         self.existingunits = {}
         self.candidates = base.TranslationStore()
+        self.ngrams = None
+        if isinstance(stores, tmsnapshot.TMSnapshot):
+            # The candidates were selected and sorted when the snapshot was
+            # compiled. The n-gram index is built by matches() when needed.
+            self.candidates.units = stores
+            return
+        if self.usengrams:
+            self.ngrams = NgramIndex()
 
         if isinstance(stores, base.TranslationStore):
             stores = [stores]
@@ -104,6 +170,11 @@ class matcher(object):
         """
         if isinstance(units, base.TranslationUnit):
             units = [units]
+        if isinstance(self.candidates.units, tmsnapshot.TMSnapshot):
+            # a snapshot is read only, so we continue with a copy
+            self.candidates.units = list(self.candidates.units)
+            for candidate in self.candidates.units:
+                self.existingunits[candidate.source] = candidate.target
         candidates = filter(self.usable, units)
         for candidate in candidates:
             simpleunit = base.TranslationUnit("")
@@ -125,9 +196,17 @@ class matcher(object):
             simpleunit.addnote(candidate.getnotes(origin="translator"))
             simpleunit.fuzzy = candidate.isfuzzy()
             self.candidates.units.append(simpleunit)
+            if self.ngrams is not None:
+                self.ngrams.add(simpleunit)
         if sort:
             self.candidates.units.sort(key=sourcelen, reverse=self.sort_reverse)
 
+    def buildngrams(self):
+        """Builds the n-gram index of all the candidates."""
+        self.ngrams = NgramIndex()
+        for candidate in self.candidates.units:
+            self.ngrams.add(candidate)
+
     def setparameters(self, max_candidates=10, min_similarity=75, max_length=70):
         """Sets the parameters without reinitialising the tm. If a parameter
         is not specified, it is set to the default, not ignored"""
@@ -167,34 +246,74 @@ class matcher(object):
 
         # minimum source string length to be considered
         startlength = self.getstartlength(min_similarity, text)
-        startindex = 0
-        endindex = len(self.candidates.units)
-        while startindex < endindex:
-            mid = (startindex + endindex) // 2
-            if sourcelen(self.candidates.units[mid]) < startlength:
-                startindex = mid + 1
-            else:
-                endindex = mid
+        lengths = getattr(self.candidates.units, "lengths", None)
+        if lengths is not None:
+            # a snapshot has an index of the source lengths
+            startindex = bisect.bisect_left(lengths, startlength)
+        else:
+            startindex = 0
+            endindex = len(self.candidates.units)
+            while startindex < endindex:
+                mid = (startindex + endindex) // 2
+                if sourcelen(self.candidates.units[mid]) < startlength:
+                    startindex = mid + 1
+                else:
+                    endindex = mid
 
         # maximum source string length to be considered
         stoplength = self.getstoplength(min_similarity, text)
         lowestscore = 0
 
-        for candidate in self.candidates.units[startindex:]:
-            cmpstring = candidate.source
-            if len(cmpstring) > stoplength:
+        if self.usengrams and self.ngrams is None:
+            self.buildngrams()
+        if self.ngrams is not None:
+            shared = self.ngrams.shared(text)
+            textlength = len(text)
+            max_len = self.comparer.MAX_LEN
+
+        # The candidates are compared with text in batches, so that comparers
+        # with a similarity_many() method can calculate them all at once.
+        similarity_many = getattr(self.comparer, "similarity_many", None)
+        candidates = self.candidates.units
+        index = startindex
+        while index < len(candidates):
+            batch = []
+            while index < len(candidates) and len(batch) < self.batch_size:
+                candidate = candidates[index]
+                cmpstring = candidate.source
+                if len(cmpstring) > stoplength:
+                    break
+                index += 1
+                if self.ngrams is not None:
+                    length = min(max(textlength, len(cmpstring)), max_len)
+                    if shared.get(id(candidate), 0) < self.ngrams.mincommon(length, min_similarity):
+                        continue
+                batch.append(candidate)
+            if not batch:
                 break
-            similarity = self.comparer.similarity(text, cmpstring, min_similarity)
-            if similarity < min_similarity:
-                continue
-            if similarity > lowestscore:
-                heapq.heapreplace(bestcandidates, (similarity, candidate))
-                lowestscore = bestcandidates[0][0]
-                if lowestscore >= 100:
+
+            cmpstrings = [candidate.source for candidate in batch]
+            if similarity_many is not None:
+                similarities = similarity_many(text, cmpstrings, min_similarity)
+            else:
+                similarities = [self.comparer.similarity(text, cmpstring, min_similarity) for cmpstring in cmpstrings]
+            # Scores below the min_similarity at the start of the batch might
+            # not be exact, but those are rejected anyway.
+            for candidate, similarity in zip(batch, similarities):
+                if len(candidate.source) > stoplength:
+                    index = len(candidates)
                     break
-                if min_similarity < lowestscore:
-                    min_similarity = lowestscore
-                    stoplength = self.getstoplength(min_similarity, text)
+                if similarity < min_similarity:
+                    continue
+                if similarity > lowestscore:
+                    heapq.heapreplace(bestcandidates, (similarity, candidate))
+                    lowestscore = bestcandidates[0][0]
+                    if lowestscore >= 100:
+                        index = len(candidates)
+                        break
+                    if min_similarity < lowestscore:
+                        min_similarity = lowestscore
+                        stoplength = self.getstoplength(min_similarity, text)
 
         #Remove the empty ones:
         def notzero(item):
@@ -224,6 +343,26 @@ class matcher(object):
         return units
 
 
+def getsnapshot(tmfiles, usefuzzy=False, cachedir=None):
+    """Returns a L{tmsnapshot.TMSnapshot} of the candidates that a matcher
+    uses from the given TM files. The snapshot is kept in cachedir (by default
+    the user's toolkit cache directory) and only compiled again when the
+    files change.
+
+    @param tmfiles: The names of the TM files.
+    @param usefuzzy: Whether fuzzy units are used, as for L{matcher}.
+    """
+    filename = tmsnapshot.getsnapshotname(tmfiles, "usefuzzy=%s" % bool(usefuzzy), cachedir)
+    info = tmsnapshot.getsourceinfo(tmfiles)
+    snapshot = tmsnapshot.load(filename, info)
+    if snapshot is None:
+        stores = [factory.getobject(tmfile) for tmfile in tmfiles]
+        tmmatcher = matcher(stores, usefuzzy=usefuzzy)
+        tmsnapshot.write(filename, tmmatcher.candidates.units, info)
+        snapshot = tmsnapshot.TMSnapshot(filename)
+    return snapshot
+
+
 # We don't want to miss certain forms of words that only change a little
 # at the end. Now we are tying this code to English, but it should serve
 # us well. For example "category" should be found in "categories",
@@ -247,6 +386,8 @@ class terminologymatcher(matcher):
 
     sort_reverse = True
 
+    automaton = None
+
     def __init__(self, store, max_candidates=10, min_similarity=75, max_length=500, comparer=None):
         if comparer is None:
             comparer = terminology.TerminologyComparer(max_length)
@@ -273,6 +414,24 @@ class terminologymatcher(matcher):
             # We don't sort, so that the altered forms are at the back and
             # considered last.
             self.extendtm(extras, sort=False)
+        self.buildautomaton()
+
+    def extendtm(self, units, store=None, sort=True):
+        matcher.extendtm(self, units, store, sort)
+        # rebuilt on the next call to matches()
+        self.automaton = None
+
+    def buildautomaton(self):
+        """Compiles all candidate terms into a L{terminology.TermAutomaton}
+        so that matches() can find them with a single pass over the text.
+        This is only possible with the default comparer."""
+        self.automaton = None
+        if not isinstance(self.comparer, terminology.TerminologyComparer):
+            return
+        self.termindex = {}
+        for index, unit in enumerate(self.candidates.units):
+            self.termindex.setdefault(unit.source, []).append(index)
+        self.automaton = terminology.TermAutomaton(self.termindex)
 
     def getstartlength(self, min_similarity, text):
         # Let's number false matches by not working with terms of two
@@ -305,6 +464,25 @@ class terminologymatcher(matcher):
         matches = []
         known = set()
 
+        if self.automaton is None:
+            self.buildautomaton()
+        if self.automaton is not None:
+            found = self.automaton.find(text[:comparer.MAX_LEN])
+            # Keep the order of the candidates, so that terms at the same
+            # position come out the same way as when comparing one by one
+            indices = []
+            for source, pos in found.iteritems():
+                comparer.match_info[source] = match_info[source] = {'pos': pos}
+                indices.extend(self.termindex[source])
+            indices.sort()
+            for index in indices:
+                cand = self.candidates.units[index]
+                if (cand.source, cand.target) in known:
+                    continue
+                matches.append(cand)
+                known.add((cand.source, cand.target))
+            return self.finalmatches(matches, match_info)
+
         # We want to limit our search in self.candidates, so we want to ignore
         # all units with a source string that is too long. We use binary search
         # to find the first string short enough to occur in text, from where we
@@ -328,7 +506,11 @@ class terminologymatcher(matcher):
                 match_info[source] = {'pos': comparer.match_info[source]['pos']}
                 matches.append(cand)
                 known.add((source, cand.target))
+        return self.finalmatches(matches, match_info)
 
+    def finalmatches(self, matches, match_info):
+        """Selects the longest non-overlapping matches, and other matches for
+        the same terms."""
         final_matches = []
         lastend = 0
         _sort_matches(matches, match_info)
@@ -46,3 +46,77 @@ class TerminologyComparer:
             self.match_info[term] = {'pos': pos}
             return 100
         return 0
+
+
+class TermAutomaton:
+    """An Aho-Corasick automaton that finds all occurrences of a set of terms
+    in a text in a single pass.
+
+    Transitions are kept in one dictionary keyed on (state, character) to
+    keep memory use down with large glossaries."""
+
+    def __init__(self, terms=()):
+        self.goto = {}
+        self.fail = [0]
+        self.terms = {}
+        self.output = {}
+        for term in terms:
+            self.add(term)
+        self.build()
+
+    def add(self, term):
+        """Adds a term. The automaton must be rebuilt with L{build} before
+        searching again."""
+        state = 0
+        for char in term:
+            next = self.goto.get((state, char))
+            if next is None:
+                next = len(self.fail)
+                self.fail.append(0)
+                self.goto[(state, char)] = next
+            state = next
+        self.terms[state] = term
+
+    def build(self):
+        """Calculates the failure transitions."""
+        children = {}
+        for (state, char), child in self.goto.iteritems():
+            children.setdefault(state, []).append((char, child))
+        self.output = dict((state, (term,)) for state, term in self.terms.iteritems())
+        # breadth first, so that the failure transitions of shorter prefixes
+        # are known when we need them
+        queue = [child for char, child in children.get(0, ())]
+        goto = self.goto
+        for state in queue:
+            for char, child in children.get(state, ()):
+                queue.append(child)
+                fail = self.fail[state]
+                while fail and (fail, char) not in goto:
+                    fail = self.fail[fail]
+                fail = goto.get((fail, char), 0)
+                self.fail[child] = fail
+                if fail in self.output:
+                    self.output[child] = self.output.get(child, ()) + self.output[fail]
+
+    def find(self, text):
+        """Returns a dictionary mapping every term occurring in C{text} to
+        the position of its first occurrence."""
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        positions = {}
+        state = 0
+        for i, char in enumerate(text):
+            while True:
+                next = goto.get((state, char))
+                if next is not None:
+                    state = next
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            if state in output:
+                for term in output[state]:
+                    if term not in positions:
+                        positions[term] = i - len(term) + 1
+        return positions
@@ -1,3 +1,5 @@
+import py.test
+
 from translate.search import lshtein
 
 
@@ -33,3 +35,30 @@ class TestLevenshtein:
         #since the sentence is long it might be chopped and report higher.
         assert levenshtein.similarity(sentence, sentence[0:62], 0) > 25
         assert levenshtein.similarity(sentence, sentence[0:62], 0) < 50
+
+    def test_bitparallel_distance(self):
+        """Tests that the bit-parallel distance agrees with the Python version"""
+        pairs = [("word", "word"), ("word", ""), ("", "word"), ("word", "word 2"),
+                 ("words", "word"), ("word", "woord"), ("kitten", "sitting"),
+                 (u"ekstra w\xeareld", u"ekstra wereld"), ("a" * 70, "b" + "a" * 80)]
+        for a, b in pairs:
+            assert lshtein.bitparallel_distance(a, b) == lshtein.python_distance(a, b)
+
+    def test_numpy_distances(self):
+        """Tests that the NumPy batch distances agree with the Python version"""
+        if lshtein.numpy is None:
+            py.test.skip("NumPy is not installed")
+        strings = ["word", "", "word 2", "words", "woord", "a" * 100, "drow"]
+        assert lshtein.numpy_distances("word", strings) == \
+               [lshtein.python_distance("word", b) for b in strings]
+
+    def test_similarity_many(self):
+        """Tests that similarity_many() gives the same results as similarity()"""
+        sentence = "A long, dreary sentence about a cow that never new his mother."
+        candidates = ["word", "words", "wood", "", "Cow", sentence, sentence[0:30], "bbb"]
+        for text in ("word", "aaa", "Cow", sentence, ""):
+            for max_len in (10, 200):
+                levenshtein = lshtein.LevenshteinComparer(max_len)
+                for stoppercentage in (0, 40, 75):
+                    assert levenshtein.similarity_many(text, candidates, stoppercentage) == \
+                           [levenshtein.similarity(text, candidate, stoppercentage) for candidate in candidates]
@@ -80,6 +80,31 @@ class TestMatch:
         assert len(candidates) == 1
         assert candidates[0] == "Open file"
 
+    def test_ngrams(self):
+        """Test that the n-gram index doesn't change the results"""
+        sources = ["Open file", "Open files", "Open a file", "Close file",
+                   "Save file as...", "Open file...", "Opened the file",
+                   "File", "Op", "pen file", "Open", "Print file",
+                   "Open the file now please", "Please open file"]
+        csvfile = self.buildcsv(sources)
+        for min_similarity in (40, 60, 75, 90):
+            plain = match.matcher(csvfile, max_candidates=20, min_similarity=min_similarity)
+            indexed = match.matcher(csvfile, max_candidates=20, min_similarity=min_similarity, usengrams=True)
+            assert indexed.ngrams is not None
+            for message in ["Open file...", "Open the file", "Close files", "Op", "Print"]:
+                # Candidates with the same score are in arbitrary order
+                expected = [(unit.getnotes(), unit.source) for unit in plain.matches(message)]
+                actual = [(unit.getnotes(), unit.source) for unit in indexed.matches(message)]
+                assert sorted(actual) == sorted(expected)
+
+    def test_ngrams_extendtm(self):
+        """Test that extending the TM also updates the n-gram index"""
+        matcher = match.matcher(self.buildcsv(["Close application"]), usengrams=True)
+        assert self.candidatestrings(matcher.matches("Open file...")) == []
+        csvfile = self.buildcsv(["Open file"])
+        matcher.extendtm(csvfile.units, store=csvfile)
+        assert self.candidatestrings(matcher.matches("Open file...")) == ["Open file"]
+
     def test_terminology(self):
         csvfile = self.buildcsv(["file", "computer", "directory"])
         matcher = match.terminologymatcher(csvfile)
@@ -87,6 +112,37 @@ class TestMatch:
         candidates.sort()
         assert candidates == ["computer", "file"]
 
+    def test_terminology_automaton(self):
+        """Test that the automaton finds the same terms as comparing the terms
+        one by one"""
+        sources = ["file", "files", "open file", "computer", "pre-order",
+                   "down time", "certify", "submit", "File (noun)", "le"]
+        targets = ["leer", "leers", "open leer", "rekenaar", "voorbestel",
+                   "staantyd", "sertifiseer", "dien in", "leer", "le"]
+        csvfile = self.buildcsv(sources, targets)
+        # A duplicate source with another translation
+        unit = csvfile.addsourceunit("file")
+        unit.target = "dossier"
+        fast = match.terminologymatcher(csvfile)
+        assert fast.automaton is not None
+        slow = match.terminologymatcher(csvfile)
+        slow.buildautomaton = lambda: None
+        slow.automaton = None
+        for text in ["Open the files on your computer", "Open file", "Pre order or preorder",
+                     "The site was certified after downtime", "Submitted", "Nothing here", "le file"]:
+            expected = [(unit.source, unit.target) for unit in slow.matches(text)]
+            actual = [(unit.source, unit.target) for unit in fast.matches(text)]
+            assert actual == expected
+            assert fast.match_info == slow.match_info
+
+    def test_terminology_extendtm(self):
+        """Test that terms added later are found too"""
+        matcher = match.terminologymatcher(self.buildcsv(["file"]))
+        assert self.candidatestrings(matcher.matches("Open the computer file")) == ["file"]
+        matcher.extendtm(self.buildcsv(["computer"]).units)
+        candidates = self.candidatestrings(matcher.matches("Open the computer file"))
+        assert candidates == ["computer", "file"]
+
     def test_brackets(self):
         """Tests that brackets at the end of a term are ignored"""
         csvfile = self.buildcsv(["file (noun)", "ISP (Internet Service Provider)"])
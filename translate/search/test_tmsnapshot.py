@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from translate.search import match
+from translate.search import tmsnapshot
+from translate.storage import factory
+
+tmtext = r'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\n"
+
+# a translator comment
+#. a developer comment
+msgid "Open file"
+msgstr "Maak lêer oop"
+
+msgid "Open files"
+msgstr "Maak lêers oop"
+
+#, fuzzy
+msgid "Open a file"
+msgstr "Maak 'n lêer oop"
+
+msgid "Close file"
+msgstr "Sluit lêer"
+
+msgid "Opened the file"
+msgstr "Het die lêer oopgemaak"
+
+msgid "%d file"
+msgid_plural "%d files"
+msgstr[0] "%d lêer"
+msgstr[1] "%d lêers"
+
+msgid "x"
+msgstr "y"
+'''
+
+
+class TestTMSnapshot:
+
+    def setup_method(self, method):
+        self.path = tempfile.mkdtemp()
+        self.tmfile = os.path.join(self.path, "tm.po")
+        self.writetm(tmtext)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.path)
+
+    def writetm(self, text):
+        tmfile = open(self.tmfile, "w")
+        tmfile.write(text)
+        tmfile.close()
+
+    def matchresults(self, matcher, text):
+        return [(unit.source, unit.target, unit.getnotes(), unit.isfuzzy())
+                for unit in matcher.matches(text)]
+
+    def test_same_matches(self):
+        """checks that a matcher gives the same results with a snapshot"""
+        for usefuzzy in (False, True):
+            plain = match.matcher(factory.getobject(self.tmfile), max_candidates=5,
+                                  min_similarity=50, usefuzzy=usefuzzy, usengrams=True)
+            snapshot = match.getsnapshot([self.tmfile], usefuzzy=usefuzzy, cachedir=self.path)
+            assert len(snapshot) == len(plain.candidates.units)
+            compiled = match.matcher(snapshot, max_candidates=5, min_similarity=50,
+                                     usengrams=True)
+            for text in [u"Open file", u"Open the file", u"%d files", u"Close", u"x"]:
+                assert self.matchresults(compiled, text) == self.matchresults(plain, text)
+
+    def test_plurals(self):
+        """checks that the plural forms are kept"""
+        snapshot = match.getsnapshot([self.tmfile], cachedir=self.path)
+        unit = [unit for unit in snapshot if unit.source == u"%d file"][0]
+        assert unit.orig_source.strings == [u"%d file", u"%d files"]
+        assert unit.orig_target.strings == [u"%d lêer", u"%d lêers"]
+
+    def test_rebuild(self):
+        """checks that the snapshot is only compiled again when the TM file
+        changes"""
+        snapshot = match.getsnapshot([self.tmfile], cachedir=self.path)
+        filename = tmsnapshot.getsnapshotname([self.tmfile], "usefuzzy=False", self.path)
+        info = tmsnapshot.getsourceinfo([self.tmfile])
+        assert tmsnapshot.load(filename, info).info == snapshot.info
+        self.writetm(tmtext + '\nmsgid "Save file"\nmsgstr "Stoor lêer"\n')
+        assert tmsnapshot.load(filename, tmsnapshot.getsourceinfo([self.tmfile])) is None
+        snapshot = match.getsnapshot([self.tmfile], cachedir=self.path)
+        assert u"Save file" in [unit.source for unit in snapshot]
+
+    def test_extendtm(self):
+        """checks that a matcher with a snapshot can be extended"""
+        matcher = match.matcher(match.getsnapshot([self.tmfile], cachedir=self.path),
+                                usengrams=True)
+        assert self.matchresults(matcher, u"Save file") == []
+        store = factory.getobject(self.tmfile)
+        store.units[1].source = u"Save file"
+        matcher.extendtm(store.units, store=store)
+        assert [unit.source for unit in matcher.matches(u"Save file")] == [u"Save file"]
+        # units that are already in the snapshot aren't added again
+        assert len(matcher.candidates.units) == 6
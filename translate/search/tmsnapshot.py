@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Zuza Software Foundation
+#
+# This file is part of the Translate Toolkit.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Compiled snapshots of the candidates of a translation memory.
+
+A snapshot holds the candidates of a L{match.matcher} (source, target and
+notes, sorted by the length of the source) and an index of the source lengths
+in a single file. The file is memory mapped, so that the operating system
+shares it between all the processes using it, and the candidates are only
+decoded when they are needed.
+
+The file starts with a header (magic, version, number of candidates, length
+of the info), followed by the info (see L{getsourceinfo}), the source lengths,
+the fuzzy flags, the offsets of the strings of each candidate and the strings
+themselves, encoded in UTF-8. All numbers are little endian.
+"""
+
+import array
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from translate.storage import base
+from translate.misc.multistring import multistring
+from translate import __version__ as toolkitversion
+
+MAGIC = "TTKTMSNP"
+VERSION = 1
+HEADER = struct.Struct("<8sIII")
+# source, target, notes and the plural forms of source and target, if any
+FIELDS = 5
+# separates the plural forms of a string
+PLURAL_SEPARATOR = u"\0"
+
+
+def getcachedir():
+    """Returns the directory where snapshots are kept by default, the same
+    one where the toolkit keeps its statistics cache."""
+    userdir = os.path.expanduser("~")
+    if os.name == "nt":
+        cachedir = os.path.join(userdir, "Translate Toolkit")
+    else:
+        cachedir = os.path.join(userdir, ".translate_toolkit")
+    if not os.path.exists(cachedir):
+        os.mkdir(cachedir)
+    return cachedir
+
+
+def getsnapshotname(filenames, key="", cachedir=None):
+    """Returns the name of the snapshot for the given TM files. The key
+    distinguishes snapshots of the same files built in different ways."""
+    if cachedir is None:
+        cachedir = getcachedir()
+    paths = [os.path.realpath(filename) for filename in filenames]
+    digest = hashlib.sha1("\0".join(paths + [key])).hexdigest()
+    return os.path.join(cachedir, "tm-%s.snapshot" % digest)
+
+
+def getsourceinfo(filenames):
+    """Returns what identifies the state of the TM files: the toolkit build
+    and the path, modification time and size of each file. A snapshot is out
+    of date when this changes."""
+    sources = []
+    for filename in filenames:
+        filestat = os.stat(filename)
+        sources.append((os.path.realpath(filename), filestat.st_mtime, filestat.st_size))
+    return (toolkitversion.build, sources)
+
+
+def _unicode(text):
+    if isinstance(text, unicode):
+        return text
+    return str(text).decode("utf-8")
+
+
+def _joinplurals(text):
+    strings = getattr(text, "strings", [text])
+    return PLURAL_SEPARATOR.join([_unicode(string) for string in strings])
+
+
+def write(filename, units, info):
+    """Writes a snapshot of the given candidates to filename.
+
+    The units should be simple units as made by L{match.matcher.extendtm},
+    sorted by the length of their source. The snapshot is written to a
+    temporary file that is renamed when it is complete, so that processes
+    reading the previous snapshot or building the same one at the same time
+    aren't disturbed."""
+    lengths = array.array("I")
+    flags = array.array("B")
+    offsets = array.array("I", [0])
+    strings = []
+    position = 0
+    for unit in units:
+        source = _unicode(unit.source)
+        lengths.append(len(source))
+        flags.append(bool(getattr(unit, "fuzzy", False)))
+        fields = [source, _unicode(unit.target), _unicode(unit.getnotes())]
+        if hasattr(unit, "orig_source"):
+            fields.append(_joinplurals(unit.orig_source))
+            fields.append(_joinplurals(unit.orig_target))
+        else:
+            fields.extend([u"", u""])
+        for field in fields:
+            field = field.encode("utf-8")
+            strings.append(field)
+            position += len(field)
+            offsets.append(position)
+    if sys.byteorder == "big":
+        for numbers in (lengths, offsets):
+            numbers.byteswap()
+    info = marshal.dumps(info)
+    directory, basename = os.path.split(filename)
+    handle, tempname = tempfile.mkstemp(prefix=basename, dir=directory)
+    try:
+        output = os.fdopen(handle, "wb")
+        try:
+            output.write(HEADER.pack(MAGIC, VERSION, len(lengths), len(info)))
+            output.write(info)
+            output.write(lengths.tostring())
+            output.write(flags.tostring())
+            output.write(offsets.tostring())
+            output.write("".join(strings))
+        finally:
+            output.close()
+        if os.name == "nt" and os.path.exists(filename):
+            os.remove(filename)
+        os.rename(tempname, filename)
+    except:
+        if os.path.exists(tempname):
+            os.remove(tempname)
+        raise
+
+
+class TMSnapshot(object):
+    """A read only sequence of the candidates in a snapshot file, see
+    L{write}. The candidates are decoded from the memory mapped file when
+    they are first accessed."""
+
+    def __init__(self, filename):
+        snapshotfile = open(filename, "rb")
+        try:
+            self.data = mmap.mmap(snapshotfile.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            snapshotfile.close()
+        if len(self.data) < HEADER.size:
+            raise ValueError("%s is not a TM snapshot" % filename)
+        magic, version, count, infolength = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a TM snapshot" % filename)
+        start = HEADER.size
+        self.info = marshal.loads(self.data[start:start+infolength])
+        start += infolength
+        self.lengths = array.array("I", self.data[start:start+4*count])
+        start += 4*count
+        self.flags = self.data[start:start+count]
+        start += count
+        self.offsets = array.array("I", self.data[start:start+4*(count*FIELDS+1)])
+        start += 4*(count*FIELDS+1)
+        if sys.byteorder == "big":
+            for numbers in (self.lengths, self.offsets):
+                numbers.byteswap()
+        self.stringstart = start
+        if len(self.data) != start + self.offsets[-1]:
+            raise ValueError("%s is truncated" % filename)
+        self._units = [None] * count
+
+    def _getstring(self, index):
+        start = self.stringstart
+        return self.data[start+self.offsets[index]:start+self.offsets[index+1]].decode("utf-8")
+
+    def _getunit(self, index):
+        first = index * FIELDS
+        unit = base.TranslationUnit(self._getstring(first))
+        unit.target = self._getstring(first + 1)
+        unit.addnote(self._getstring(first + 2))
+        unit.fuzzy = self.flags[index] != "\0"
+        orig_source = self._getstring(first + 3)
+        if orig_source:
+            unit.orig_source = multistring(orig_source.split(PLURAL_SEPARATOR))
+            unit.orig_target = multistring(self._getstring(first + 4).split(PLURAL_SEPARATOR))
+        self._units[index] = unit
+        return unit
+
+    def __len__(self):
+        return len(self._units)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+        unit = self._units[index]
+        if unit is None:
+            unit = self._getunit(index % len(self._units))
+        return unit
+
+    def __iter__(self):
+        for index in xrange(len(self._units)):
+            yield self[index]
+
+    def close(self):
+        self.data.close()
+
+
+def load(filename, info):
+    """Returns the snapshot in filename, or C{None} if there is no such
+    snapshot or if it was built from a different info (see
+    L{getsourceinfo})."""
+    if not os.path.isfile(filename):
+        return None
+    try:
+        snapshot = TMSnapshot(filename)
+    except (ValueError, TypeError, EOFError, EnvironmentError):
+        return None
+    if snapshot.info != info:
+        snapshot.close()
+        return None
+    return snapshot
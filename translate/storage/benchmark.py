@@ -24,7 +24,9 @@ import pstats
 import random
 import sys
 
+from translate.filters import pofilter
 from translate.storage import factory
+from translate.storage import statsdb
 
 
 class TranslateBenchmarker:
@@ -83,13 +85,37 @@ class TranslateBenchmarker:
                 count += len(parsedfile.units)
         print "counted %d units" % count
 
+    def count_file(self):
+        """counts the words in all the files like pocount does, without
+        using the stats database"""
+        count = 0
+        for dirpath, subdirs, filenames in os.walk(self.file_dir, topdown=False):
+            for name in filenames:
+                pofilename = os.path.join(dirpath, name)
+                totals = statsdb.countfile(pofilename)[3]
+                count += sum(totals)
+        print "counted %d totals" % count
+
+    def filter_file(self):
+        """runs the pofilter checks over all the files"""
+        options, args = pofilter.cmdlineparser().parse_args([self.file_dir])
+        checkfilter = pofilter.pocheckfilter(options, None,
+                pofilter.build_checkerconfig(options))
+        count = 0
+        for dirpath, subdirs, filenames in os.walk(self.file_dir, topdown=False):
+            for name in filenames:
+                pofilename = os.path.join(dirpath, name)
+                parsedfile = self.StoreClass(open(pofilename, 'r'))
+                count += len(checkfilter.filterfile(parsedfile).units)
+        print "filtered %d units" % count
+
 if __name__ == "__main__":
     storetype = "po"
     if len(sys.argv) > 1:
         storetype = sys.argv[1]
-    if storetype in factory.classes:
-        storeclass = factory.classes[storetype]
-    else:
+    try:
+        storeclass = factory.getclass("benchmark.%s" % storetype)
+    except ValueError:
         print "StoreClass: '%s' is not a base class that the class factory can load" % storetype
         sys.exit()
     for sample_file_sizes in [
@@ -108,7 +134,8 @@ if __name__ == "__main__":
         benchmarker = TranslateBenchmarker("BenchmarkDir", storeclass)
         benchmarker.clear_test_dir()
         benchmarker.create_sample_files(*sample_file_sizes)
-        methods = [("create_sample_files", "*sample_file_sizes"), ("parse_file", ""), ]
+        methods = [("create_sample_files", "*sample_file_sizes"), ("parse_file", ""),
+                   ("count_file", ""), ("filter_file", ""), ]
         for methodname, methodparam in methods:
             print methodname, "%d dirs, %d files, %d strings, %d/%d words" % sample_file_sizes
             print "_______________________________________________________"
@@ -191,6 +191,33 @@ def getobject(storefile, ignore=None, classes=None, classes_str=classes_str, hid
     return store
 
 
+def iterobject(storefile, ignore=None, classes=None, classes_str=classes_str, hiddenclasses=hiddenclasses):
+    """Factory like L{getobject} that parses the file one unit at a time.
+
+    @type storefile: file or str
+    @param storefile: File object or file name.
+    @return: The store and an iterator over its units. Stores with an
+    C{iterparse} method (like PO) yield the units as they are parsed without
+    keeping them, so large files can be processed without holding every unit
+    in memory. Other stores are parsed completely first.
+    """
+    storefilename = _getname(storefile)
+    storeclass = getclass(storefile, ignore, classes=classes, classes_str=classes_str, hiddenclasses=hiddenclasses)
+    if not hasattr(storeclass, "iterparse") or \
+           not (os.path.exists(storefilename) or not getattr(storefile, "closed", True)):
+        store = getobject(storefile, ignore, classes=classes, classes_str=classes_str, hiddenclasses=hiddenclasses)
+        return store, iter(store.units)
+    name, ext = os.path.splitext(storefilename)
+    ext = ext[len(os.path.extsep):].lower()
+    if ext in decompressclass:
+        _module, _class = decompressclass[ext]
+        module = __import__(_module, globals(), {}, [])
+        _file = getattr(module, _class)
+        storefile = _file(storefilename)
+    store = storeclass()
+    return store, store.iterparse(storefile)
+
+
 supported = [
         ('Gettext PO file', ['po', 'pot'], ["text/x-gettext-catalog", "text/x-gettext-translation", "text/x-po", "text/x-pot"]),
         ('XLIFF Translation File', ['xlf', 'xliff', 'sdlxliff'], ["application/x-xliff", "application/x-xliff+xml"]),
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Zuza Software Foundation
+#
+# This file is part of the Translate Toolkit.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""compare parse() with the previous implementation of it, parse_old(), on
+the strings used in the placeable tests
+
+usage: python benchmark.py [--rounds=N] [test_file.py ...]
+"""
+
+import ast
+import os
+import sys
+import time
+import tokenize
+from optparse import OptionParser
+
+from translate.storage.placeables import general
+from translate.storage.placeables.parse import parse, parse_old
+
+
+def get_strings(filenames):
+    """collect the unicode string literals in the given Python files"""
+    strings = []
+    for filename in filenames:
+        for token in tokenize.generate_tokens(open(filename).readline):
+            if token[0] == tokenize.STRING and token[1][:1] in "uU":
+                strings.append(ast.literal_eval(token[1]))
+    return strings
+
+
+def run_benchmark(parse_func, strings, rounds):
+    """@return: the average time in milliseconds to parse all the strings"""
+    start = time.time()
+    for i in range(rounds):
+        for string in strings:
+            parse_func(string, general.parsers)
+    return (time.time() - start) * 1000 / rounds
+
+
+def main():
+    parser = OptionParser(usage="%prog [options] [test_file.py ...]")
+    parser.add_option("--rounds", type="int", default=20,
+            help="number of times to parse all the strings (default: %default)")
+    options, filenames = parser.parse_args()
+    if not filenames:
+        filenames = [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                "test_general.py")]
+    strings = get_strings(filenames)
+    for string in strings:
+        if parse(string, general.parsers) != parse_old(string, general.parsers):
+            print >> sys.stderr, "different trees for %r" % string
+    print "%d strings" % len(strings)
+    print "%-12s %15s" % ("function", "ms/round")
+    for parse_func in (parse_old, parse):
+        print "%-12s %15.3f" % (parse_func.__name__,
+                run_benchmark(parse_func, strings, options.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,149 @@ Contains the C{parse} function that parses normal strings into StringElem-
 based "rich" string element trees.
 """
 
+import re
+
 from translate.storage.placeables import base, StringElem
+from translate.storage.placeables.general import regex_parse
+
+# The re module doesn't support more groups in one expression
+MAX_GROUPS = 99
+# The number of tokenizers kept by get_tokenizer()
+MAX_TOKENIZERS = 100
+# Whitespace that is ignored in verbose regular expressions
+VERBOSE_WHITESPACE = " \t\n\r\v\f"
+
+_tokenizers = {}
+
+
+def verbose_pattern(regex):
+    """Returns the pattern of the given compiled regular expression in a form
+        that means the same when compiled with C{re.VERBOSE}."""
+    if regex.flags & re.VERBOSE:
+        return regex.pattern
+    pattern = regex.pattern
+    result = []
+    inclass = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        i += 1
+        if char == '\\':
+            char += pattern[i:i+1]
+            i += 1
+        elif inclass:
+            if char == ']':
+                inclass = False
+        elif char == '[':
+            inclass = True
+            # A "]" right after the (negated) opening bracket is a literal
+            if pattern[i:i+1] == '^':
+                char += '^'
+                i += 1
+            if pattern[i:i+1] == ']':
+                char += ']'
+                i += 1
+        elif char in VERBOSE_WHITESPACE or char == '#':
+            char = '\\' + char
+        result.append(char)
+    return type(pattern)().join(result)
+
+
+class Tokenizer(object):
+    """Finds the first of a list of parsing functions that splits a string.
+
+        Consecutive parsing functions that use C{regex_parse} are combined into
+        one regular expression with a named group for each of them, in the
+        order of the parsing functions. A single scan of a string with this
+        expression tells whether any of them will match, and which one has to
+        be tried first. Other parsing functions are simply called in turn."""
+
+    def __init__(self, parse_funcs):
+        self.parse_funcs = list(parse_funcs)
+        self.regexes = [self._get_regex(parse_func) for parse_func in self.parse_funcs]
+        self._combined = {}
+
+    def _get_regex(self, parse_func):
+        """Returns the regular expression used by C{parse_func}, or C{None}
+            if it can't be combined with others."""
+        if getattr(parse_func, 'im_func', None) is not regex_parse:
+            return None
+        regex = parse_func.im_self.regex
+        if regex is None or regex.groupindex or re.search(r'\\[1-9]|\(\?P=', regex.pattern):
+            # Group names and back references don't survive the combining
+            return None
+        if isinstance(regex.pattern, str):
+            try:
+                regex.pattern.decode('ascii')
+            except UnicodeDecodeError:
+                return None
+        return regex
+
+    def _get_combined(self, index):
+        """Returns the combined regular expression for the parsing functions
+            from C{index} onwards and the index following the last of them.
+
+            The expression is C{None} if the parsing function at C{index}
+            can't be combined with the ones following it."""
+        if index in self._combined:
+            return self._combined[index]
+        end = index
+        patterns = []
+        groups = 0
+        if self.regexes[index] is not None:
+            flags = self.regexes[index].flags & ~re.VERBOSE
+            for regex in self.regexes[index:]:
+                if regex is None or regex.flags & ~re.VERBOSE != flags or \
+                   groups + regex.groups + 1 > MAX_GROUPS:
+                    break
+                # The newline ends a trailing comment in verbose expressions
+                patterns.append(u'(?P<p%d>%s\n)' % (end, verbose_pattern(regex)))
+                groups += regex.groups + 1
+                end += 1
+        if len(patterns) > 1:
+            combined = re.compile(u'|'.join(patterns), flags | re.VERBOSE), end
+        else:
+            combined = None, index + 1
+        self._combined[index] = combined
+        return combined
+
+    def first_match(self, pstr, index=0):
+        """Finds the first parsing function from C{index} onwards that splits
+            C{pstr}.
+
+            @returns: The index of the parsing function and its result, or
+                C{(None, None)} if none of the functions could parse C{pstr}."""
+        while index < len(self.parse_funcs):
+            combined, end = self._get_combined(index)
+            if combined is not None:
+                match = combined.search(pstr)
+                if match is None:
+                    index = end
+                    continue
+                # The expressions before the one that matched have no match
+                # up to here, but they might still match further on.
+                found = int(match.lastgroup[1:])
+                for i in range(index, found):
+                    if self.regexes[i].search(pstr, match.start() + 1):
+                        found = i
+                        break
+                index = found
+            subleaves = self.parse_funcs[index](pstr)
+            if subleaves is not None:
+                return index, subleaves
+            index += 1
+        return None, None
+
+
+def get_tokenizer(parse_funcs):
+    """Returns a (cached) L{Tokenizer} for the given parsing functions."""
+    key = tuple(parse_funcs)
+    tokenizer = _tokenizers.get(key)
+    if tokenizer is None:
+        if len(_tokenizers) >= MAX_TOKENIZERS:
+            _tokenizers.clear()
+        tokenizer = _tokenizers[key] = Tokenizer(parse_funcs)
+    return tokenizer
 
 
 def parse(tree, parse_funcs):
@@ -35,9 +177,10 @@ def parse(tree, parse_funcs):
 
         An over-simplification of the algorithm: the leaves in the C{StringElem}
         tree are expanded to the output of the first parsing function in
-        C{parse_funcs}. The next level of recursion is then started on the new
-        set of leaves with the used parsing function removed from
-        C{parse_funcs}.
+        C{parse_funcs} that could parse it. The next level of recursion is then
+        started on the new set of leaves with the parsing functions up to the
+        used one removed from C{parse_funcs}. See L{Tokenizer} for how the
+        parsing function is found.
 
         @type  tree: unicode|StringElem
         @param tree: The string or string element sub-tree to parse.
@@ -49,6 +192,38 @@ def parse(tree, parse_funcs):
         tree = StringElem(tree)
     if not parse_funcs:
         return tree
+    _parse_leaves(tree, get_tokenizer(parse_funcs), 0)
+    return tree
+
+
+def _parse_leaves(tree, tokenizer, index):
+    for leaf in tree.flatten():
+        #FIXME: we might rather want to test for editability, but for now this
+        # works better
+        if not leaf.istranslatable:
+            continue
+
+        unileaf = unicode(leaf)
+        if not unileaf:
+            continue
+
+        found, subleaves = tokenizer.first_match(unileaf, index)
+        if subleaves is not None:
+            if not (len(subleaves) == 1 and type(leaf) is type(subleaves[0]) and leaf == subleaves[0]):
+                leaf.sub = subleaves
+            _parse_leaves(leaf, tokenizer, found + 1)
+
+        leaf.prune()
+
+
+def parse_old(tree, parse_funcs):
+    """This is the previous implementation of parse() and is left for
+        comparison and debugging purposes. It calls every parsing function on
+        every leaf."""
+    if isinstance(tree, unicode):
+        tree = StringElem(tree)
+    if not parse_funcs:
+        return tree
 
     parse_func = parse_funcs[0]
 
@@ -79,7 +254,7 @@ def parse(tree, parse_funcs):
             else:
                 leaf.sub = subleaves
 
-        parse(leaf, parse_funcs[1:])
+        parse_old(leaf, parse_funcs[1:])
 
         if isinstance(leaf, StringElem):
             leaf.prune()
@@ -18,9 +18,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import re
+
 from py.test import mark
 
 from translate.storage.placeables import base, general, parse, xliff, StringElem
+from translate.storage.placeables.parse import parse_old, verbose_pattern
 
 
 class TestStringElem:
@@ -206,6 +209,38 @@ class TestConverters:
         assert repr(xliff_from_base) == repr(xliff_from_gen)
 
 
+class TestParse:
+
+    STRINGS = [
+        u'Press <b>Ctrl+S</b> to save %s to ~/Documents/file.txt\n',
+        u'Visit http://translate.sourceforge.net/ or mail info@example.com',
+        u'&brandShortName; has %1 NEW messages for KBabel\u2026',
+        u'Use --verbose to see 1,000.50 lines of <img alt="Image">',
+        u'%(count)d ITEMS in {0} CamelCase',
+        u'No placeables here at all',
+    ]
+
+    def test_same_trees(self):
+        """parse() must build the same trees as the previous implementation"""
+        for string in self.STRINGS:
+            assert repr(parse(string, general.parsers)) == repr(parse_old(string, general.parsers))
+
+    def test_other_parsers(self):
+        """parsing functions not based on regular expressions are called in turn"""
+        def parse_save(pstr):
+            if pstr == u'save':
+                return [general.CapsPlaceable([pstr])]
+        parsers = [general.XMLTagPlaceable.parse, parse_save, general.NumberPlaceable.parse]
+        for string in (u'<b>save</b> 2 files', u'save'):
+            assert repr(parse(string, parsers)) == repr(parse_old(string, parsers))
+
+    def test_verbose_pattern(self):
+        regex = re.compile(r'a b#[ #\]]\ c')
+        verbose = re.compile(verbose_pattern(regex), re.VERBOSE)
+        for string in (u'a b#  c', u'a b#] c', u'ab'):
+            assert bool(regex.match(string)) == bool(verbose.match(string))
+
+
 if __name__ == '__main__':
     for test in [TestStringElem(), TestConverters()]:
         for method in dir(test):
@@ -41,6 +41,9 @@ startswith = str.startswith
 append = list.append
 decode = str.decode
 
+# the maximum number of distinct comment lines shared between units
+MAX_INTERNED = 10000
+
 
 class ParseState(object):
 
@@ -51,6 +54,7 @@ class ParseState(object):
         self.encoding = encoding
         self.read_line()
         self.UnitClass = UnitClass
+        self.interned = {}
 
     def decode(self, string):
         if self.encoding is not None:
@@ -58,6 +62,23 @@ class ParseState(object):
         else:
             return string
 
+    def intern(self, string):
+        """Returns an equal string that was seen before, if any.
+
+        Flags, locations and automatic comments repeat a lot in large files,
+        so units share a single copy of each of these lines. The built-in
+        intern() only handles byte strings, and would keep the strings alive
+        after parsing."""
+        if self.encoding is None:
+            # the header is decoded later on, don't mix it with unicode lines
+            return string
+        interned = self.interned.get(string)
+        if interned is not None:
+            return interned
+        if len(self.interned) < MAX_INTERNED:
+            self.interned[string] = string
+        return string
+
     def read_line(self):
         current = self.next_line
         if self.eof:
@@ -72,7 +93,9 @@ class ParseState(object):
         return current
 
     def new_input(self, _input):
-        return ParseState(_input, self.UnitClass, self.encoding)
+        parse_state = ParseState(_input, self.UnitClass, self.encoding)
+        parse_state.interned = self.interned
+        return parse_state
 
 
 def read_prevmsgid_lines(parse_state):
@@ -110,7 +133,7 @@ def parse_comment(parse_state, unit):
     if len(next_line) > 0 and next_line[0] in ('#', '|'):
         next_char = next_line[1]
         if next_char == '.':
-            append(unit.automaticcomments, parse_state.decode(next_line))
+            append(unit.automaticcomments, parse_state.intern(parse_state.decode(next_line)))
         elif next_line[0] == '|' or next_char == '|':
             # Read all the lines starting with #|
             prevmsgid_lines = read_prevmsgid_lines(parse_state)
@@ -124,9 +147,9 @@ def parse_comment(parse_state, unit):
             parse_prev_msgid_plural(ps, unit)
             return parse_state.next_line
         elif next_char == ':':
-            append(unit.sourcecomments, parse_state.decode(next_line))
+            append(unit.sourcecomments, parse_state.intern(parse_state.decode(next_line)))
         elif next_char == ',':
-            append(unit.typecomments, parse_state.decode(next_line))
+            append(unit.typecomments, parse_state.intern(parse_state.decode(next_line)))
         elif next_char == '~':
             # Special case: we refuse to parse obsoletes: they are done
             # elsewhere to ensure we reuse the normal unit parsing code
@@ -347,9 +370,16 @@ def parse_header(parse_state, store):
     return first_unit
 
 
-def parse_units(parse_state, store):
+def iter_units(parse_state, store):
+    """Yields the units one at a time as they are parsed. Only the current
+    unit is kept in memory, so this can be used on very large files."""
     unit = parse_header(parse_state, store)
     while unit:
-        store.addunit(unit)
+        yield unit
         unit = parse_unit(parse_state)
+
+
+def parse_units(parse_state, store):
+    for unit in iter_units(parse_state, store):
+        store.addunit(unit)
     return parse_state.eof
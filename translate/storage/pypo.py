@@ -149,6 +149,10 @@ class pounit(pocommon.pounit):
     # fashion
     __shallow__ = ['_store']
 
+    # decoded source and target, see getsource() and gettarget()
+    _source = None
+    _target = None
+
     def __init__(self, source=None, encoding="UTF-8"):
         self._encoding = encodingToUse(encoding)
         self.obsolete = False
@@ -157,10 +161,10 @@ class pounit(pocommon.pounit):
         self.prev_msgid = []
         self.prev_msgid_plural = []
         self.msgctxt = []
-        self.msgid = []
+        self._msgid = []
         self.msgid_pluralcomments = []
-        self.msgid_plural = []
-        self.msgstr = []
+        self._msgid_plural = []
+        self._msgstr = []
         pocommon.pounit.__init__(self, source)
 
     def _initallcomments(self, blankall=False):
@@ -209,9 +213,36 @@ class pounit(pocommon.pounit):
             msgid_plural = []
         return msgid, msgid_plural
 
+    def _get_msgid(self):
+        return self._msgid
+
+    def _set_msgid(self, msgid):
+        self._msgid = msgid
+        self._source = None
+    msgid = property(_get_msgid, _set_msgid)
+
+    def _get_msgid_plural(self):
+        return self._msgid_plural
+
+    def _set_msgid_plural(self, msgid_plural):
+        self._msgid_plural = msgid_plural
+        self._source = None
+    msgid_plural = property(_get_msgid_plural, _set_msgid_plural)
+
+    def _get_msgstr(self):
+        return self._msgstr
+
+    def _set_msgstr(self, msgstr):
+        self._msgstr = msgstr
+        self._target = None
+    msgstr = property(_get_msgstr, _set_msgstr)
+
     def getsource(self):
         """Returns the unescaped msgid"""
-        return self._get_source_vars(self.msgid, self.msgid_plural)
+        # the decoded value is cached until msgid or msgid_plural is set
+        if self._source is None:
+            self._source = self._get_source_vars(self._msgid, self._msgid_plural)
+        return self._source
 
     def setsource(self, source):
         """Sets the msgid to the given (unescaped) value.
@@ -236,11 +267,12 @@ class pounit(pocommon.pounit):
 
     def gettarget(self):
         """Returns the unescaped msgstr"""
-        if isinstance(self.msgstr, dict):
-            multi = multistring(map(unquotefrompo, self.msgstr.values()), self._encoding)
-        else:
-            multi = multistring(unquotefrompo(self.msgstr), self._encoding)
-        return multi
+        if self._target is None:
+            if isinstance(self._msgstr, dict):
+                self._target = multistring(map(unquotefrompo, self._msgstr.values()), self._encoding)
+            else:
+                self._target = multistring(unquotefrompo(self._msgstr), self._encoding)
+        return self._target
 
     def settarget(self, target):
         """Sets the msgstr to the given (unescaped) value"""
@@ -350,17 +382,14 @@ class pounit(pocommon.pounit):
         return copy.deepcopy(self)
 
     def _msgidlen(self):
-        if self.hasplural():
-            return len(unquotefrompo(self.msgid)) + len(unquotefrompo(self.msgid_plural))
-        else:
-            return len(unquotefrompo(self.msgid))
+        return sum([len(string) for string in self.source.strings])
 
     def _msgstrlen(self):
         if isinstance(self.msgstr, dict):
             combinedstr = "\n".join(filter(None, [unquotefrompo(msgstr) for msgstr in self.msgstr.itervalues()]))
             return len(combinedstr)
         else:
-            return len(unquotefrompo(self.msgstr))
+            return len(self.target)
 
     def merge(self, otherpo, overwrite=False, comments=True, authoritative=False):
         """Merges the otherpo (with the same msgid) into this one.
@@ -717,6 +746,28 @@ class pofile(pocommon.pofile):
 #        except Exception, e:
 #            raise base.ParseError(e)
 
+    def iterparse(self, input):
+        """Parses the given file (or file name) one unit at a time, yielding
+        the units as they are parsed.
+
+        Only the header is kept in L{units}, so large files can be processed
+        in constant memory."""
+        if isinstance(input, basestring):
+            input = open(input, 'rb')
+        self.fileobj = input
+        self._assignname()
+        self.units = []
+        try:
+            for unit in poparser.iter_units(poparser.ParseState(input, pounit), self):
+                if not self.units and unit.isheader():
+                    # keep the header, it is needed for the store's metadata
+                    self.addunit(unit)
+                else:
+                    unit._store = self
+                yield unit
+        finally:
+            input.close()
+
     def removeduplicates(self, duplicatestyle="merge"):
         """Make sure each msgid is unique ; merge comments etc from duplicates into original"""
         # TODO: can we handle consecutive calls to removeduplicates()? What
@@ -36,9 +36,14 @@ import sys
 import stat
 import thread
 from UserDict import UserDict
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
 
 from translate import __version__ as toolkitversion
 from translate.lang.common import Common
+from translate.misc.hash import md5_f
 from translate.misc.multistring import multistring
 from translate.storage import factory
 from translate.storage.workflow import StateEnum
@@ -100,6 +105,25 @@ def wordsinunit(unit):
     return sourcewords, targetwords
 
 
+def unithash(unit):
+    """Returns a digest of everything in the unit that influences its cached
+    statistics and checks, so that changed units can be found cheaply."""
+    digest = md5_f()
+    for value in (unit.getid(), unit.source, unit.target):
+        if isinstance(value, multistring):
+            strings = value.strings
+        else:
+            strings = [value or u""]
+        for string in strings:
+            if isinstance(string, unicode):
+                string = string.encode("utf-8")
+            digest.update(string)
+            digest.update("\0")
+        digest.update("\1")
+    digest.update("%d:%d" % (statefordb(unit), unit.get_state_id()))
+    return digest.hexdigest()
+
+
 class Record(UserDict):
 
     def __init__(self, record_keys, record_values=None, compute_derived_values=lambda x: x):
@@ -274,6 +298,48 @@ def suggestion_filename(filename):
     return filename + suggestion_extension()
 
 
+def unitrows(indexedunits, file_totals_record):
+    """Calculates the statistics of the given (unitindex, unit) pairs.
+
+    Returns the values to store in the units table (without the fileid) and
+    file_totals_record with the totals of the units added."""
+    unitvalues = []
+    for index, unit in indexedunits:
+        if unit.istranslatable():
+            sourcewords, targetwords = wordsinunit(unit)
+            # what about plurals in .source and .target?
+            unit_state_for_db = statefordb(unit)
+            target = unit.target
+            if target is not None:
+                target = unicode(target)
+            unitvalues.append((unit.getid(), index, \
+                            unicode(unit.source), target, \
+                            sourcewords, targetwords, \
+                            unit_state_for_db,
+                            unit.get_state_id(),
+                            unithash(unit)))
+            file_totals_record = file_totals_record + FileTotals.new_record(unit_state_for_db, sourcewords, targetwords)
+    return unitvalues, file_totals_record
+
+
+def countfile(filename):
+    """Parses and counts a file outside of any StatsCache.
+
+    This is run in the worker processes of L{StatsCache.cachefiles}, so it
+    only returns picklable values: the real path and modification info of
+    the file, its rows for the units table and its file totals as a tuple.
+    Returns None if the file can't be parsed."""
+    try:
+        realpath = os.path.realpath(filename)
+        mod_info = get_mod_info(realpath)
+        store, units = factory.iterobject(realpath)
+        unitvalues, file_totals_record = unitrows(enumerate(units), FileTotals.new_record())
+        return realpath, mod_info, unitvalues, file_totals_record.to_tuple()
+    except Exception:
+        # The serial path will report the problem when the file is used.
+        return None
+
+
 # ALL PUBLICLY ACCESSIBLE METHODS MUST BE DECORATED WITH THE transaction DECORATOR.
 class StatsCache(object):
     """An object instantiated as a singleton for each statsfile that provides
@@ -361,7 +427,15 @@ class StatsCache(object):
             state INTEGER,
             e_state INTEGER,
             sourcewords INTEGER,
-            targetwords INTEGER);""")
+            targetwords INTEGER,
+            unithash VARCHAR);""")
+
+        # Databases created before unit hashes were introduced still have
+        # the old layout. Rows without a hash are simply recached on the next
+        # change to the file.
+        self.cur.execute("""PRAGMA table_info(units);""")
+        if "unithash" not in [column[1] for column in self.cur.fetchall()]:
+            self.cur.execute("""ALTER TABLE units ADD COLUMN unithash VARCHAR;""")
 
         self.cur.execute("""CREATE INDEX IF NOT EXISTS fileidindex
             ON units(fileid);""")
@@ -384,6 +458,14 @@ class StatsCache(object):
         self.cur.execute("""CREATE INDEX IF NOT EXISTS uniterrorindex
             ON uniterrors(fileid, configid);""")
 
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS pendingchecks(
+            fileid INTEGER NOT NULL,
+            configid INTEGER NOT NULL,
+            unitindex INTEGER NOT NULL);""")
+
+        self.cur.execute("""CREATE INDEX IF NOT EXISTS pendingchecksindex
+            ON pendingchecks(fileid, configid);""")
+
     @transaction
     def _getfileid(self, filename, check_mod_info=True, store=None):
         """return fileid representing the given file in the statscache.
@@ -433,47 +515,233 @@ class StatsCache(object):
         else:
             return configrow[0]
 
+    def _insertunits(self, indexedunits, fileid, file_totals_record):
+        """Stores the statistics of the given (unitindex, unit) pairs and
+        returns file_totals_record with their totals added."""
+        unitvalues, file_totals_record = unitrows(indexedunits, file_totals_record)
+        self._insertunitrows(unitvalues, fileid)
+        return file_totals_record
+
+    def _insertunitrows(self, unitvalues, fileid):
+        # XXX: executemany is non-standard
+        self.cur.executemany("""INSERT INTO units
+            (fileid, unitid, unitindex, source, target, sourcewords, targetwords, state, e_state, unithash)
+            values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);""",
+            [(fileid,) + values for values in unitvalues])
+
     @transaction
     def _cacheunitstats(self, units, fileid, unitindex=None, file_totals_record=FileTotals.new_record()):
         """Cache the statistics for the supplied unit(s)."""
-        unitvalues = []
-        for index, unit in enumerate(units):
-            if unit.istranslatable():
-                sourcewords, targetwords = wordsinunit(unit)
-                if unitindex:
-                    index = unitindex
-                # what about plurals in .source and .target?
-                unit_state_for_db = statefordb(unit)
-                unitvalues.append((unit.getid(), fileid, index, \
-                                unit.source, unit.target, \
-                                sourcewords, targetwords, \
-                                unit_state_for_db,
-                                unit.get_state_id()))
-                file_totals_record = file_totals_record + FileTotals.new_record(unit_state_for_db, sourcewords, targetwords)
-        # XXX: executemany is non-standard
-        self.cur.executemany("""INSERT INTO units
-            (unitid, fileid, unitindex, source, target, sourcewords, targetwords, state, e_state)
-            values (?, ?, ?, ?, ?, ?, ?, ?, ?);""",
-            unitvalues)
-        self.file_totals[fileid] = file_totals_record
+        if unitindex:
+            indexedunits = [(unitindex, unit) for unit in units]
+        else:
+            indexedunits = enumerate(units)
+        self.file_totals[fileid] = self._insertunits(indexedunits, fileid, file_totals_record)
         if unitindex:
             return state_strings[statefordb(units[0])]
         return ""
 
+    def _reindexunits(self, fileid, moved):
+        """Moves the cached rows of units that only changed position, given as
+        (oldindex, newindex) pairs.
+
+        The rows are first parked at negative indices (below the -1 used by
+        the noerror marker) so that units swapping places don't collide."""
+        parked = [(-newindex - 2, fileid, oldindex) for oldindex, newindex in moved]
+        for table in ("units", "uniterrors", "pendingchecks"):
+            self.cur.executemany("""UPDATE %s SET unitindex=?
+                WHERE fileid=? AND unitindex=?;""" % table, parked)
+            self.cur.execute("""UPDATE %s SET unitindex=-unitindex-2
+                WHERE fileid=? AND unitindex<-1;""" % table, (fileid,))
+
+    def _addpendingchecks(self, fileid, unitindices, skipconfigid=None):
+        """Marks the given units to be rechecked by every checker
+        configuration that has already checked this file."""
+        self.cur.execute("""SELECT configid FROM uniterrors
+            WHERE fileid=? AND unitindex=-1;""", (fileid,))
+        configids = [row[0] for row in self.cur.fetchall() if row[0] != skipconfigid]
+        self.cur.executemany("""INSERT INTO pendingchecks
+            (fileid, configid, unitindex) values (?, ?, ?);""",
+            [(fileid, configid, index) for configid in configids for index in unitindices])
+
+    def _cachedelta(self, fileid, current, insertchanged):
+        """Brings the cached statistics of a previously cached file up to
+        date by only recaching the units that changed since.
+
+        C{current} lists the translatable units of the file as (unitindex,
+        unitid, unithash, unit) tuples, and C{insertchanged} is called with
+        the changed (unitindex, unit) pairs and the file totals without them
+        to store them and return the new file totals. Units are matched on
+        their ids and compared by L{unithash}, and only the changed units are
+        scheduled to be rechecked. Returns False (without touching the
+        database) if the units can't be matched unambiguously, in which case
+        the caller should recache the whole file."""
+        self.cur.execute("""SELECT unitid, unitindex, unithash, state, sourcewords, targetwords
+            FROM units WHERE fileid=?;""", (fileid,))
+        cached = {}
+        for row in self.cur.fetchall():
+            if row[0] in cached:
+                return False
+            cached[row[0]] = row
+        if len(set([unitid for _index, unitid, _hash, _unit in current])) != len(current):
+            return False
+
+        file_totals_record = self.file_totals[fileid]
+        changed = []
+        moved = []
+        stale = []
+        for index, unitid, hash, unit in current:
+            row = cached.pop(unitid, None)
+            if row is not None and row[2] == hash:
+                if row[1] != index:
+                    moved.append((row[1], index))
+                continue
+            if row is not None:
+                stale.append(row[1])
+                file_totals_record = file_totals_record - FileTotals.new_record(*row[3:])
+            changed.append((index, unit))
+        for row in cached.itervalues():
+            stale.append(row[1])
+            file_totals_record = file_totals_record - FileTotals.new_record(*row[3:])
+
+        staleindices = [(fileid, index) for index in stale]
+        for table in ("units", "uniterrors", "pendingchecks"):
+            self.cur.executemany("""DELETE FROM %s
+                WHERE fileid=? AND unitindex=?;""" % table, staleindices)
+        if moved:
+            self._reindexunits(fileid, moved)
+        self.file_totals[fileid] = insertchanged(changed, file_totals_record)
+        self._addpendingchecks(fileid, [index for index, _unit in changed])
+        return True
+
+    def _cachestoredelta(self, store, fileid):
+        """Recaches the units of the store that changed since it was last
+        cached. See L{_cachedelta}."""
+        current = [(index, unit.getid(), unithash(unit), unit)
+                   for index, unit in enumerate(store.units) if unit.istranslatable()]
+
+        def insertchanged(changed, file_totals_record):
+            return self._insertunits(changed, fileid, file_totals_record)
+        return self._cachedelta(fileid, current, insertchanged)
+
+    def _cacherowsdelta(self, unitvalues, fileid):
+        """Recaches the rows (as returned by L{unitrows}) of the units that
+        changed since the file was last cached. See L{_cachedelta}."""
+        current = [(values[1], values[0], values[8], values) for values in unitvalues]
+
+        def insertchanged(changed, file_totals_record):
+            changedvalues = [values for _index, values in changed]
+            self._insertunitrows(changedvalues, fileid)
+            for values in changedvalues:
+                file_totals_record = file_totals_record + FileTotals.new_record(values[6], values[4], values[5])
+            return file_totals_record
+        return self._cachedelta(fileid, current, insertchanged)
+
+    def _cachedfileid(self, realpath):
+        """Returns the fileid of the file if it was cached by this build of
+        the toolkit, so that its cached units can be updated in place."""
+        self.cur.execute("""SELECT fileid, toolkitbuild FROM files WHERE
+            path=?;""", (realpath,))
+        filerow = self.cur.fetchone()
+        if filerow and filerow[1] == toolkitversion.build:
+            return filerow[0]
+        return None
+
+    def _updatemodinfo(self, fileid, mod_info):
+        self.cur.execute("""UPDATE files
+                SET st_mtime=?, st_size=?
+                WHERE fileid=?;""", (mod_info[0], mod_info[1], fileid))
+
     @transaction
     def _cachestore(self, store, realpath, mod_info):
-        """Calculates and caches the statistics of the given store
-        unconditionally."""
+        """Calculates and caches the statistics of the given store.
+
+        If the store was cached before, only the units that changed are
+        recached."""
+        fileid = self._cachedfileid(realpath)
+        if fileid is not None and self._cachestoredelta(store, fileid):
+            self._updatemodinfo(fileid, mod_info)
+            return fileid
+        fileid = self._newfileid(realpath, mod_info)
+        self._cacheunitstats(store.units, fileid)
+        return fileid
+
+    def _newfileid(self, realpath, mod_info):
+        """Drops everything cached about the file and registers it anew."""
+        self.cur.execute("""SELECT fileid FROM files WHERE
+            path=?;""", (realpath,))
+        filerow = self.cur.fetchone()
+        if filerow:
+            for table in ("units", "uniterrors", "pendingchecks", "filetotals"):
+                self.cur.execute("""DELETE FROM %s WHERE
+                    fileid=?;""" % table, (filerow[0],))
         self.cur.execute("""DELETE FROM files WHERE
             path=?;""", (realpath,))
         self.cur.execute("""INSERT INTO files
             (fileid, path, st_mtime, st_size, toolkitbuild) values (NULL, ?, ?, ?, ?);""",
             (realpath, mod_info[0], mod_info[1], toolkitversion.build))
-        fileid = self.cur.lastrowid
-        self.cur.execute("""DELETE FROM units WHERE
-            fileid=?""", (fileid,))
-        self._cacheunitstats(store.units, fileid)
-        return fileid
+        return self.cur.lastrowid
+
+    @transaction
+    def cachefiles(self, filenames, jobs=None):
+        """Makes sure the statistics of all the given files are cached.
+
+        The files that aren't cached yet or changed since are parsed and
+        counted by a pool of C{jobs} worker processes (one per CPU by
+        default), while this process writes all their results to the
+        database in a single transaction. Files that were cached before
+        only have their changed units recached, as in L{_cachestore}. Files
+        that can't be parsed are skipped, so that they can be reported as
+        usual when they are used.
+
+        Without the multiprocessing module the files are counted serially.
+        """
+        stale = []
+        for filename in filenames:
+            if isinstance(filename, str):
+                filename = unicode(filename, sys.getfilesystemencoding())
+            realpath = os.path.realpath(filename)
+            try:
+                mod_info = get_mod_info(realpath)
+            except (OSError, AssertionError):
+                continue
+            self.cur.execute("""SELECT st_mtime, st_size, toolkitbuild FROM files
+                WHERE path=?;""", (realpath,))
+            filerow = self.cur.fetchone()
+            if filerow is None or tuple(filerow) != mod_info + (toolkitversion.build,):
+                stale.append(realpath)
+        if not stale:
+            return 0
+
+        if multiprocessing is None or jobs == 1 or len(stale) == 1:
+            pool = None
+            results = (countfile(filename) for filename in stale)
+        else:
+            pool = multiprocessing.Pool(jobs)
+            results = pool.imap(countfile, stale, max(1, len(stale) / (4 * (jobs or multiprocessing.cpu_count()))))
+        try:
+            cached = 0
+            for result in results:
+                if result is None:
+                    continue
+                realpath, mod_info, unitvalues, totals = result
+                fileid = self._cachedfileid(realpath)
+                if fileid is not None and self._cacherowsdelta(unitvalues, fileid):
+                    self._updatemodinfo(fileid, mod_info)
+                else:
+                    fileid = self._newfileid(realpath, mod_info)
+                    self._insertunitrows(unitvalues, fileid)
+                    self.file_totals[fileid] = Record(FileTotals.keys, totals, FileTotals._compute_derived_values)
+                cached += 1
+        except:
+            if pool is not None:
+                pool.terminate()
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return cached
 
     def file_extended_totals(self, filename, store=None):
         stats = {}
@@ -499,37 +767,45 @@ class StatsCache(object):
             stats["extended"] = self.file_extended_totals(filename, store=store)
         return stats
 
+    def _insertunitschecks(self, indexedunits, fileid, configid, checker):
+        """Runs the checker on the given (unitindex, unit) pairs and stores
+        the failures. Returns the names of the failing checks."""
+        unitvalues = []
+        errornames = []
+        indexedunits = [(index, unit) for index, unit in indexedunits if unit.istranslatable()]
+        unitsfailures = checker.run_filters_batch([unit for index, unit in indexedunits])
+        for (index, unit), failures in zip(indexedunits, unitsfailures):
+            for checkname, checkmessage in failures.iteritems():
+                unitvalues.append((index, fileid, configid, checkname, checkmessage))
+                errornames.append("check-" + checkname)
+        # XXX: executemany is non-standard
+        self.cur.executemany("""INSERT INTO uniterrors
+            (unitindex, fileid, configid, name, message)
+            values (?, ?, ?, ?, ?);""",
+            unitvalues)
+        return errornames
+
     @transaction
     def _cacheunitschecks(self, units, fileid, configid, checker, unitindex=None):
         """Helper method for cachestorechecks() and recacheunit()"""
-        # We always want to store one dummy error to know that we have actually
-        # run the checks on this file with the current checker configuration
-        dummy = (-1, fileid, configid, "noerror", "")
-        unitvalues = [dummy]
+        if unitindex:
+            # We are only updating a single unit, so we don't want to add an
+            # extra noerror-entry
+            indexedunits = [(unitindex, unit) for unit in units]
+        else:
+            # We always want to store one dummy error to know that we have
+            # actually run the checks on this file with the current checker
+            # configuration
+            self.cur.execute("""INSERT INTO uniterrors
+                (unitindex, fileid, configid, name, message)
+                values (-1, ?, ?, 'noerror', '');""", (fileid, configid))
+            indexedunits = enumerate(units)
         # if we are doing a single unit, we want to return the checknames
-        errornames = []
-        for index, unit in enumerate(units):
-            if unit.istranslatable():
-                # Correctly assign the unitindex
-                if unitindex:
-                    index = unitindex
-                failures = checker.run_filters(unit)
-                for checkname, checkmessage in failures.iteritems():
-                    unitvalues.append((index, fileid, configid, checkname, checkmessage))
-                    errornames.append("check-" + checkname)
+        errornames = self._insertunitschecks(indexedunits, fileid, configid, checker)
         checker.setsuggestionstore(None)
 
         if unitindex:
-            # We are only updating a single unit, so we don't want to add an
-            # extra noerror-entry
-            unitvalues.remove(dummy)
             errornames.append("total")
-
-        # XXX: executemany is non-standard
-        self.cur.executemany("""INSERT INTO uniterrors
-            (unitindex, fileid, configid, name, message)
-            values (?, ?, ?, ?, ?);""",
-            unitvalues)
         return errornames
 
     @transaction
@@ -540,9 +816,29 @@ class StatsCache(object):
         # fill up the database without much use.
         self.cur.execute("""DELETE FROM uniterrors WHERE
             fileid=?;""", (fileid,))
+        self.cur.execute("""DELETE FROM pendingchecks WHERE
+            fileid=?;""", (fileid,))
         self._cacheunitschecks(store.units, fileid, configid, checker)
         return fileid
 
+    @transaction
+    def _recheckunits(self, fileid, store, checker, configid, unitindices):
+        """Reruns the checks on the units that changed since the store was
+        last checked with this checker configuration."""
+        units = store.units
+        indexedunits = [(index, units[index]) for index in unitindices if index < len(units)]
+        self._insertunitschecks(indexedunits, fileid, configid, checker)
+        checker.setsuggestionstore(None)
+        self.cur.execute("""DELETE FROM pendingchecks WHERE
+            fileid=? AND configid=?;""", (fileid, configid))
+        return fileid
+
+    def _getpendingchecks(self, fileid, configid):
+        self.cur.execute("""SELECT unitindex FROM pendingchecks
+            WHERE fileid=? AND configid=?
+            ORDER BY unitindex;""", (fileid, configid))
+        return [row[0] for row in self.cur.fetchall()]
+
     def get_unit_stats(self, fileid, unitid):
         values = self.cur.execute("""
             SELECT   state, sourcewords, targetwords
@@ -583,6 +879,10 @@ class StatsCache(object):
         # remove the current errors
         self.cur.execute("""DELETE FROM uniterrors WHERE
             fileid=? AND unitindex=?;""", (fileid, unitindex))
+        self.cur.execute("""DELETE FROM pendingchecks WHERE
+            fileid=? AND unitindex=?;""", (fileid, unitindex))
+        # other checker configurations lost their errors for this unit too
+        self._addpendingchecks(fileid, [unitindex], skipconfigid=configid)
         if os.path.exists(suggestion_filename(filename)):
             checker.setsuggestionstore(factory.getobject(suggestion_filename(filename), ignore=suggestion_extension()))
         state.extend(self._cacheunitschecks([unit], fileid, configid, checker, unitindex))
@@ -598,12 +898,13 @@ class StatsCache(object):
                 ORDER BY unitindex;""", (fileid, configid))
             return self.cur.fetchone(), self.cur
 
+        pending = self._getpendingchecks(fileid, configid)
         first, cur = geterrors()
-        if first is not None:
+        if first is not None and not pending:
             return first, cur
 
-        # This could happen if we haven't done the checks before, or the
-        # file changed, or we are using a different configuration
+        # This could happen if we haven't done the checks before, or some
+        # units changed, or we are using a different configuration
         if callable(store):
             store = store()
         else:
@@ -611,7 +912,10 @@ class StatsCache(object):
 
         if os.path.exists(suggestion_filename(filename)):
             checker.setsuggestionstore(factory.getobject(suggestion_filename(filename), ignore=suggestion_extension()))
-        self._cachestorechecks(fileid, store, checker, configid)
+        if first is None:
+            self._cachestorechecks(fileid, store, checker, configid)
+        else:
+            self._recheckunits(fileid, store, checker, configid, pending)
         return geterrors()
 
     def _geterrors(self, filename, fileid, configid, checker, store):
@@ -95,6 +95,13 @@ class BaseTestFactory:
         store = factory.getobject(fileobj)
         assert isinstance(store, self.expected_instance)
 
+    def test_iterobject(self):
+        """Tests that iterating over the units gives the same units as parsing."""
+        store = factory.getobject(givefile(self.filename, self.file_content))
+        iterstore, units = factory.iterobject(givefile(self.filename, self.file_content))
+        assert isinstance(iterstore, self.expected_instance)
+        assert [str(unit) for unit in units] == [str(unit) for unit in store.units]
+
     def test_get_noname_object(self):
         """Tests that we get a valid object from a file object without a name."""
         fileobj = wStringIO.StringIO(self.file_content)
@@ -54,6 +54,23 @@ class TestPYPOUnit(test_po.TestPOUnit):
         unit.target = "Een Boom"
         assert unit.target.strings == ["Een Boom"]
 
+    def test_cached_source_target(self):
+        """tests that the decoded source and target follow changes to the quoted lines"""
+        unit = self.UnitClass("Cow")
+        unit.target = "Koei"
+        assert unit.source is unit.source
+        assert unit.target is unit.target
+        unit.msgid = ['"Bull"']
+        assert unit.source == "Bull"
+        unit.msgid_plural = ['"Bulls"']
+        assert unit.source.strings == ["Bull", "Bulls"]
+        unit.msgstr = {0: ['"Bul"'], 1: ['"Bulle"']}
+        assert unit.target.strings == ["Bul", "Bulle"]
+        newunit = unit.copy()
+        newunit.msgstr = {0: ['"Os"'], 1: ['"Osse"']}
+        assert newunit.target.strings == ["Os", "Osse"]
+        assert unit.target.strings == ["Bul", "Bulle"]
+
     def test_notes(self):
         """tests that the generic notes API works"""
         unit = self.UnitClass("File")
@@ -270,3 +287,54 @@ msgstr[1] "toetse"
         assert pofile.units[4].prev_source == multistring([u"tast", u"tasts"])
 
         assert str(pofile) == posource
+
+    def test_shared_comments(self):
+        """checks that repeated comment lines are shared between the units"""
+        posource = r'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\n"
+
+#: test.c
+#, fuzzy
+msgid "one"
+msgstr "een"
+
+#: test.c
+#, fuzzy
+msgid "two"
+msgstr "twee"
+'''
+        pofile = self.poparse(posource)
+        assert pofile.units[1].sourcecomments[0] is pofile.units[2].sourcecomments[0]
+        assert pofile.units[1].typecomments[0] is pofile.units[2].typecomments[0]
+        assert isinstance(pofile.units[2].typecomments[0], unicode)
+
+    def test_iterparse(self):
+        """checks that iterparse yields the same units as parse, keeping only the header"""
+        posource = r'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=ISO-8859-1\n"
+"Language: af\n"
+
+#: test.c
+msgid "one"
+msgstr "een"
+
+#, fuzzy
+msgid "two"
+msgid_plural "twos"
+msgstr[0] "twee"
+msgstr[1] "tweë"
+
+#~ msgid "three"
+#~ msgstr "drie"
+'''.decode('utf-8').encode('iso-8859-1')
+        pofile = self.poparse(posource)
+        iterfile = self.StoreClass()
+        units = list(iterfile.iterparse(wStringIO.StringIO(posource)))
+        assert [str(unit) for unit in units] == [str(unit) for unit in pofile.units]
+        assert units[2].target.strings[1] == u"twe\xeb"
+        assert len(iterfile.units) == 1
+        assert iterfile.gettargetlanguage() == "af"
+        assert units[1].gettargetlanguage() == "af"
+
@@ -151,3 +151,105 @@ class TestStatsDb:
         f1, cache1 = self.setup_file_and_db(jtoolkit_extract)
         f2, cache2 = self.setup_file_and_db(fr_terminology_extract)
         assert cache1 == cache2
+
+    def rewrite_file(self, filename, file_contents):
+        """Replaces the contents of the file, making sure that the cache can
+        see that it changed."""
+        mtime = os.stat(filename).st_mtime
+        open(filename, "w").write(file_contents)
+        os.utime(filename, (mtime + 10, mtime + 10))
+
+    def get_unit_rowids(self, cache, filename):
+        fileid = cache._getfileid(filename)
+        cache.cur.execute("""SELECT unitindex, id FROM units
+            WHERE fileid=?;""", (fileid,))
+        return dict(cache.cur.fetchall())
+
+    def test_delta_recache_totals(self):
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        totals = cache.filetotals(f.filename)
+        assert totals["translated"] == 3
+        assert totals["untranslated"] == 1
+        changed = jtoolkit_extract.replace('msgid ", please confirm login"\nmsgstr ""',
+                                           'msgid ", please confirm login"\nmsgstr ", bevestig asseblief"')
+        self.rewrite_file(f.filename, changed)
+        totals = cache.filetotals(f.filename)
+        assert totals["translated"] == 4
+        assert totals["untranslated"] == 0
+        assert totals["fuzzy"] == 2
+        assert totals["total"] == 6
+        assert totals["translatedsourcewords"] == 8 + 11 + 9 + 3
+
+    def test_delta_recache_only_changed_units(self):
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        before = self.get_unit_rowids(cache, f.filename)
+        changed = jtoolkit_extract.replace("Verlaat toepassing", "Verlaat die toepassing")
+        self.rewrite_file(f.filename, changed)
+        after = self.get_unit_rowids(cache, f.filename)
+        assert sorted(after.keys()) == [1, 2, 3, 4, 5, 6]
+        assert [index for index in after if after[index] != before[index]] == [4]
+
+    def test_delta_recache_moved_and_removed_units(self):
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        cache.filestats(f.filename, checks.UnitChecker())
+        removed = jtoolkit_extract.replace('''#: web/server.py:91
+msgid "Cancel this action and start a new session"
+msgstr "Kanselleer hierdie aksie en begin 'n nuwe sessie"
+''', "")
+        self.rewrite_file(f.filename, removed)
+        s = cache.filestats(f.filename, checks.UnitChecker())
+        assert s['translated'] == [2, 4]
+        assert s['fuzzy'] == [1, 3]
+        assert s['untranslated'] == [5]
+        assert s['total'] == [1, 2, 3, 4, 5]
+        assert cache.unitstats(f.filename)['sourcewordcount'] == [3, 11, 2, 9, 3]
+        assert cache.filetotals(f.filename)["total"] == 5
+
+    def test_delta_recheck_only_changed_units(self):
+        checker = checks.StandardChecker()
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        assert cache.filechecks(f.filename, checker)["check-endpunc"] == [3]
+        changed = jtoolkit_extract.replace("Verlaat hierdie toepassing en gaan terug na die ouertoepassing",
+                                           "Verlaat hierdie toepassing en gaan terug na die ouertoepassing.")
+        self.rewrite_file(f.filename, changed)
+        errors = cache.filechecks(f.filename, checker)
+        assert errors["check-endpunc"] == [3, 5]
+        assert errors["check-untranslated"] == [6]
+        fileid = cache._getfileid(f.filename)
+        configid = cache._get_config_id(fileid, checker)
+        assert cache._getpendingchecks(fileid, configid) == []
+
+    def test_cachefiles_matches_serial(self):
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        other = os.path.join(self.path, "other.po")
+        open(other, "w").write(fr_terminology_extract)
+        assert cache.cachefiles([f.filename, other], jobs=2) == 2
+        assert cache.cachefiles([f.filename, other], jobs=2) == 0
+        parallel = [cache.filetotals(name, extended=True) for name in (f.filename, other)]
+        parallel_units = cache.unitstats(f.filename)
+        parallel_states = cache.filestatestats(f.filename, extended=True)
+
+        serial_cache = statsdb.StatsCache(os.path.join(self.path, "serial.db"))
+        serial = [serial_cache.filetotals(name, extended=True) for name in (f.filename, other)]
+        assert [dict(totals) for totals in parallel] == [dict(totals) for totals in serial]
+        assert parallel_units == serial_cache.unitstats(f.filename)
+        assert parallel_states == serial_cache.filestatestats(f.filename, extended=True)
+
+    def test_cachefiles_delta(self):
+        checker = checks.StandardChecker()
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        other = os.path.join(self.path, "other.po")
+        open(other, "w").write(fr_terminology_extract)
+        assert cache.filechecks(f.filename, checker)["check-endpunc"] == [3]
+        before = self.get_unit_rowids(cache, f.filename)
+        changed = jtoolkit_extract.replace("Verlaat hierdie toepassing en gaan terug na die ouertoepassing",
+                                           "Verlaat hierdie toepassing en gaan terug na die ouertoepassing.")
+        self.rewrite_file(f.filename, changed)
+        assert cache.cachefiles([f.filename, other], jobs=2) == 2
+        after = self.get_unit_rowids(cache, f.filename)
+        assert [index for index in after if after[index] != before[index]] == [5]
+        fileid = cache._getfileid(f.filename)
+        configid = cache._get_config_id(fileid, checker)
+        assert cache._getpendingchecks(fileid, configid) == [5]
+        assert cache.filechecks(f.filename, checker)["check-endpunc"] == [3, 5]
+        assert dict(cache.filetotals(f.filename)) == dict(statsdb.StatsCache(os.path.join(self.path, "serial.db")).filetotals(f.filename))
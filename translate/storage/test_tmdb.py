@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from translate.storage import tmdb
+from translate.storage.tmdb import dbapi2
+
+sources = [u"Open file", u"Open files", u"Open a file", u"Close file",
+           u"Save file as...", u"Open file...", u"Opened the file", u"File",
+           u"word", u"wood", u"Print file", u"Please open the file"]
+
+
+class TestTMDB:
+
+    def setup_method(self, method):
+        self.path = tempfile.mkdtemp()
+        self.tmdb = tmdb.TMDB(":memory:", max_candidates=20)
+        units = [{"source": source, "target": source.upper(), "context": None} for source in sources]
+        self.tmdb.add_list(units, "en", "af")
+
+    def teardown_method(self, method):
+        tmdb.TMDB._tm_dbs.clear()
+        shutil.rmtree(self.path)
+
+    def test_trigrams(self):
+        assert tmdb.trigrams(u"ab") == {u"  a": 1, u" ab": 1, u"ab ": 1, u"b  ": 1}
+        assert tmdb.trigrams(u"aaa")[u"aaa"] == 1
+        assert tmdb.trigrams(u"aaaa")[u"aaa"] == 2
+
+    def test_min_shared_trigrams(self):
+        # "word" and "wood" are 75% similar and share "  w", " wo" and "d  "
+        assert tmdb.min_shared_trigrams(4, 75) == 3
+        assert tmdb.min_shared_trigrams(10, 40) <= 0
+
+    def test_translate_unit(self):
+        results = self.tmdb.translate_unit(u"Open file", "en", "af")
+        assert self.tmdb.query_stats["method"] == "trigram"
+        assert self.tmdb.query_stats["fetched"] <= len(sources)
+        assert results[0]["source"] == u"Open file"
+        assert results[0]["target"] == u"OPEN FILE"
+        assert results[0]["quality"] == 100
+        assert sorted([result["source"] for result in results]) == \
+               [u"Open a file", u"Open file", u"Open file...", u"Open files"]
+
+    def test_translate_unit_short(self):
+        results = self.tmdb.translate_unit(u"word", "en", "af")
+        assert [result["source"] for result in results] == [u"word", u"wood"]
+
+    def test_translate_unit_brute_force(self):
+        """Tests that the trigram shortlist finds the same matches as scoring
+        every unit in the length window"""
+        for text in [u"Open the file", u"Save file", u"Close files", u"Word"]:
+            results = self.tmdb.translate_unit(text, "en", "af")
+            scored = [(self.tmdb.comparer.similarity(text, source, 75), source) for source in sources]
+            expected = [source for (quality, source) in scored if quality >= 75]
+            assert sorted([result["source"] for result in results]) == sorted(expected)
+
+    def test_shortlist_target_langs(self):
+        """Tests that sources without a target in the requested language
+        don't take up the shortlist"""
+        self.tmdb.max_shortlist = 10
+        units = [{"source": u"Open a file %d" % number, "target": u"Datei %d" % number, "context": None}
+                 for number in range(30)]
+        self.tmdb.add_list(units, "en", "de")
+        self.tmdb.add_list([{"source": u"Open a file 99", "target": u"Maak 'n lêer oop", "context": None}], "en", "af")
+        results = self.tmdb.translate_unit(u"Open a file 1", "en", "af")
+        assert u"Open a file 99" in [result["source"] for result in results]
+
+    def test_lookup_unlocks(self):
+        """Tests that a lookup doesn't keep the database locked"""
+        filename = os.path.join(self.path, "locked.db")
+        reader = tmdb.TMDB(filename)
+        reader.add_list([{"source": source, "target": source.upper(), "context": None} for source in sources], "en", "af")
+        assert reader.translate_unit(u"Open the file", "en", "af")
+        writer = dbapi2.connect(filename, timeout=0)
+        writer.execute("INSERT INTO sources (text, context, lang, length) VALUES (?, ?, ?, ?)",
+                       (u"Close the file", u"", "en", 14))
+        writer.commit()
+        writer.close()
+
+    def test_max_candidates(self):
+        self.tmdb.max_candidates = 2
+        results = self.tmdb.translate_unit(u"Open file", "en", "af")
+        assert len(results) == 2
+        assert results[0]["quality"] >= results[1]["quality"]
+
+    def test_add_bulk(self):
+        bulk = tmdb.TMDB(os.path.join(self.path, "bulk.db"), max_candidates=20)
+        bulk.cursor.execute("PRAGMA journal_mode")
+        journal_mode = bulk.cursor.fetchone()[0]
+        units = [{"source": source, "target": source.upper(), "context": None} for source in sources]
+        # duplicates shouldn't be added twice
+        units.append(units[0])
+        loaded = []
+        assert bulk.add_bulk(units, "en", "af", batch_size=5,
+                             progress=lambda count, rate: loaded.append(count)) == len(sources) + 1
+        assert loaded == [5, 10, 13]
+        bulk.cursor.execute("SELECT COUNT(*) FROM sources")
+        assert bulk.cursor.fetchone()[0] == len(sources)
+        bulk.cursor.execute("SELECT COUNT(*) FROM targets")
+        assert bulk.cursor.fetchone()[0] == len(sources)
+        # the journal mode is kept in the database file
+        bulk.cursor.execute("PRAGMA journal_mode")
+        assert bulk.cursor.fetchone()[0] == journal_mode
+        for text in [u"Open file", u"word", u"Please open the file"]:
+            assert bulk.translate_unit(text, "en", "af") == self.tmdb.translate_unit(text, "en", "af")
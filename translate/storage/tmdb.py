@@ -21,6 +21,7 @@
 
 """Module to provide a translation memory database."""
 
+import heapq
 import logging
 import math
 import re
@@ -38,6 +39,29 @@ from translate.lang import data
 STRIP_REGEXP = re.compile("\W", re.UNICODE)
 
 
+def trigrams(text):
+    """Returns a dictionary mapping the trigrams in text, padded with two
+    spaces on both sides, to the number of times they occur."""
+    text = u"  %s  " % text
+    counts = {}
+    for i in xrange(len(text) - 2):
+        gram = text[i:i+3]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def min_shared_trigrams(length, min_similarity):
+    """Returns the number of padded trigrams that two strings, the longest of
+    which has the given length, have in common at least if their similarity
+    is at least min_similarity.
+
+    Each edit changes at most three trigrams, and padded strings of length n
+    have n + 2 trigrams."""
+    # This mirrors the stopvalue in LevenshteinComparer.similarity_real()
+    maxdistance = math.ceil((100.0 - min_similarity) / 100 * length)
+    return int(length + 2 - 3 * maxdistance)
+
+
 class LanguageError(Exception):
 
     def __init__(self, value):
@@ -50,11 +74,13 @@ class LanguageError(Exception):
 class TMDB(object):
     _tm_dbs = {}
 
-    def __init__(self, db_file, max_candidates=3, min_similarity=75, max_length=1000):
+    def __init__(self, db_file, max_candidates=3, min_similarity=75, max_length=1000, max_shortlist=100):
 
         self.max_candidates = max_candidates
         self.min_similarity = min_similarity
         self.max_length = max_length
+        self.max_shortlist = max_shortlist
+        self.query_stats = {}
 
         self.db_file = db_file
         # share connections to same database file between different instances
@@ -66,6 +92,7 @@ class TMDB(object):
         self.init_database()
         self.fulltext = False
         self.init_fulltext()
+        self.init_trigrams()
 
         self.comparer = LevenshteinComparer(self.max_length)
 
@@ -110,6 +137,15 @@ CREATE INDEX IF NOT EXISTS targets_sid_idx ON targets (sid);
 CREATE INDEX IF NOT EXISTS targets_lang_idx ON targets (lang);
 CREATE INDEX IF NOT EXISTS targets_time_idx ON targets (time);
 CREATE UNIQUE INDEX IF NOT EXISTS targets_uniq_idx ON targets (sid, text, lang);
+
+CREATE TABLE IF NOT EXISTS trigrams (
+       gram VARCHAR NOT NULL,
+       sid INTEGER NOT NULL,
+       count INTEGER NOT NULL,
+       FOREIGN KEY (sid) references sources(sid)
+);
+CREATE INDEX IF NOT EXISTS trigrams_gram_idx ON trigrams (gram, sid, count);
+CREATE INDEX IF NOT EXISTS trigrams_sid_idx ON trigrams (sid);
 """
 
         try:
@@ -176,6 +212,30 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
 """
             self.cursor.executescript(script)
 
+    def init_trigrams(self):
+        """indexes the trigrams of sources that were added to the database
+        before it had a trigrams table"""
+        # looks up each source in trigrams_sid_idx instead of scanning the
+        # whole trigrams table
+        self.cursor.execute("""SELECT sid, text FROM sources s
+WHERE NOT EXISTS (SELECT 1 FROM trigrams t WHERE t.sid = s.sid)""")
+        rows = self.cursor.fetchall()
+        if not rows:
+            return
+        logging.debug("indexing trigrams of %d sources" % len(rows))
+        try:
+            for sid, text in rows:
+                self.add_trigrams(sid, text)
+            self.connection.commit()
+        except:
+            self.connection.rollback()
+            raise
+
+    def add_trigrams(self, sid, text):
+        """inserts the trigrams of a source string in the database"""
+        self.cursor.executemany("INSERT INTO trigrams (gram, sid, count) VALUES (?, ?, ?)",
+                                [(gram, sid, count) for gram, count in trigrams(text).iteritems()])
+
     def preload_db(self):
         """ugly hack to force caching of sqlite db file in memory for
         improved performance"""
@@ -221,6 +281,7 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
                                      source_lang,
                                      len(unit["source"])))
                 sid = self.cursor.lastrowid
+                self.add_trigrams(sid, unit["source"])
             except dbapi2.IntegrityError:
                 # source string already exists in db, run query to find sid
                 self.cursor.execute("SELECT sid FROM sources WHERE text=? AND context=? and lang=?",
@@ -270,6 +331,109 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
             self.connection.commit()
         return count
 
+    def add_bulk(self, units, source_lang, target_lang, batch_size=10000, progress=None):
+        """insert a large number of units, represented as dictionaries, in
+        batches
+
+        Every batch is copied into a staging table with a single
+        executemany(), after which the missing sources and all the targets
+        are inserted with one statement each. The fulltext index is only
+        updated once at the end, and the database is loaded in WAL mode with
+        relaxed synchronisation. The previous modes are restored afterwards,
+        as the journal mode is kept in the database file.
+
+        Like with add_unit(), languages given in the dictionaries as
+        "source_lang" and "target_lang" take precedence over the ones passed
+        as arguments.
+
+        progress is an optional callable that is called after every batch
+        with the number of units loaded so far and the rate in units per
+        second.
+        """
+        codes = {}
+
+        def normalize_code(lang, default):
+            lang = lang or default
+            if not lang:
+                raise LanguageError("undefined language")
+            if lang not in codes:
+                codes[lang] = data.normalize_code(lang)
+            return codes[lang]
+        # journal_mode can't be changed inside a transaction
+        self.connection.commit()
+        self.cursor.execute("PRAGMA synchronous")
+        (synchronous,) = self.cursor.fetchone()
+        self.cursor.execute("PRAGMA journal_mode")
+        (journal_mode,) = self.cursor.fetchone()
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        if self.fulltext:
+            # the triggers would update the fulltext index for every source
+            self.cursor.executescript("""
+DROP TRIGGER IF EXISTS sources_insert_trig;
+DROP TRIGGER IF EXISTS sources_update_trig;
+DROP TRIGGER IF EXISTS sources_delete_trig;
+""")
+        self.cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS staging (
+            source VARCHAR NOT NULL,
+            context VARCHAR DEFAULT NULL,
+            target VARCHAR NOT NULL,
+            length INTEGER NOT NULL,
+            source_lang VARCHAR NOT NULL,
+            target_lang VARCHAR NOT NULL)""")
+
+        count = 0
+        start = time.time()
+        try:
+            batch = []
+            for unit in units:
+                batch.append((unit["source"], unit["context"], unit["target"], len(unit["source"]),
+                              normalize_code(unit.get("source_lang"), source_lang),
+                              normalize_code(unit.get("target_lang"), target_lang)))
+                if len(batch) >= batch_size:
+                    count += self._add_batch(batch)
+                    batch = []
+                    if progress is not None:
+                        progress(count, count / max(time.time() - start, 0.001))
+            if batch:
+                count += self._add_batch(batch)
+                if progress is not None:
+                    progress(count, count / max(time.time() - start, 0.001))
+        finally:
+            if self.fulltext:
+                # indexes the new sources and restores the triggers
+                self.init_fulltext()
+            self.cursor.execute("PRAGMA synchronous=%d" % synchronous)
+            self.cursor.execute("PRAGMA journal_mode=%s" % journal_mode)
+        logging.debug("loaded %d units in %.1f seconds" % (count, time.time() - start))
+        return count
+
+    def _add_batch(self, batch):
+        """insert a batch of (source, context, target, length, source_lang,
+        target_lang) tuples using the staging table"""
+        try:
+            self.cursor.execute("DELETE FROM staging")
+            self.cursor.executemany("INSERT INTO staging (source, context, target, length, source_lang, target_lang) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            self.cursor.execute("SELECT COALESCE(MAX(sid), 0) FROM sources")
+            (lastsid,) = self.cursor.fetchone()
+            self.cursor.execute("""INSERT INTO sources (text, context, lang, length)
+                SELECT st.source, st.context, st.source_lang, st.length FROM staging st
+                WHERE NOT EXISTS (SELECT 1 FROM sources s WHERE s.text = st.source AND s.context IS st.context AND s.lang = st.source_lang)
+                GROUP BY st.source, st.context, st.source_lang""")
+            self.cursor.execute("SELECT sid, text FROM sources WHERE sid > ?", (lastsid,))
+            self.cursor.executemany("INSERT INTO trigrams (gram, sid, count) VALUES (?, ?, ?)",
+                                    [(gram, sid, count) for sid, text in self.cursor.fetchall()
+                                                        for gram, count in trigrams(text).iteritems()])
+            self.cursor.execute("""INSERT OR IGNORE INTO targets (sid, text, lang, time)
+                SELECT s.sid, st.target, st.target_lang, ? FROM staging st
+                JOIN sources s ON s.text = st.source AND s.context IS st.context AND s.lang = st.source_lang""",
+                (int(time.time()),))
+            self.connection.commit()
+        except:
+            self.connection.rollback()
+            raise
+        return len(batch)
+
     def translate_unit(self, unit_source, source_langs, target_langs):
         """return TM suggestions for unit_source"""
         if isinstance(unit_source, str):
@@ -288,6 +452,70 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
         minlen = min_levenshtein_length(len(unit_source), self.min_similarity)
         maxlen = max_levenshtein_length(len(unit_source), self.min_similarity, self.max_length)
 
+        rows = self._shortlist_trigrams(unit_source, source_langs, target_langs, minlen, maxlen)
+        if rows is None:
+            rows = self._shortlist_words(unit_source, source_langs, target_langs, minlen, maxlen)
+
+        qualities = self.comparer.similarity_many(unit_source, [row[0] for row in rows], self.min_similarity)
+        results = []
+        for row, quality in zip(rows, qualities):
+            if quality >= self.min_similarity:
+                result = {}
+                result['source'] = row[0]
+                result['target'] = row[1]
+                result['context'] = row[2]
+                result['quality'] = quality
+                results.append(result)
+        self.query_stats['scored'] = len(rows)
+        self.query_stats['matched'] = len(results)
+        results = heapq.nlargest(self.max_candidates, results, key=lambda match: match['quality'])
+        logging.debug("query stats: %s", self.query_stats)
+        logging.debug("results: %s", unicode(results))
+        return results
+
+    def _shortlist_trigrams(self, unit_source, source_langs, target_langs, minlen, maxlen):
+        """returns up to max_shortlist sources (with their targets) sharing
+        the most trigrams with unit_source, or None if the trigrams can't
+        rule out any candidates.
+
+        Sources with fewer trigrams in common than they must have to reach
+        min_similarity are discarded in the query already."""
+        length = len(unit_source)
+        if length > self.max_length or minlen > maxlen:
+            # the comparer only considers the first max_length characters
+            return None
+        lengths = xrange(max(length, int(minlen)), max(length, int(maxlen)) + 1)
+        min_shared = min([min_shared_trigrams(l, self.min_similarity) for l in lengths])
+        if min_shared <= 0:
+            return None
+
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS query_trigrams (gram VARCHAR PRIMARY KEY, count INTEGER NOT NULL)")
+        self.cursor.execute("DELETE FROM query_trigrams")
+        self.cursor.executemany("INSERT INTO query_trigrams (gram, count) VALUES (?, ?)",
+                                trigrams(unit_source).iteritems())
+        logging.debug("trigram matching")
+        query = """SELECT s.text, t.text, s.context, m.shared FROM
+                   (SELECT g.sid AS sid, SUM(MIN(g.count, q.count)) AS shared
+                    FROM query_trigrams q JOIN trigrams g ON g.gram = q.gram JOIN sources s ON s.sid = g.sid
+                    WHERE s.lang IN (?) AND s.length BETWEEN ? AND ?
+                    AND EXISTS (SELECT 1 FROM targets t WHERE t.sid = s.sid AND t.lang IN (?))
+                    GROUP BY g.sid HAVING shared >= ?
+                    ORDER BY shared DESC LIMIT ?) m
+                   JOIN sources s ON s.sid = m.sid JOIN targets t ON s.sid = t.sid
+                   WHERE t.lang IN (?)
+                   ORDER BY m.shared DESC"""
+        self.cursor.execute(query, (source_langs, minlen, maxlen, target_langs, min_shared, self.max_shortlist, target_langs))
+        rows = self.cursor.fetchall()
+        # Filling query_trigrams started a transaction, which would keep the
+        # database locked for other connections
+        self.connection.commit()
+        self.query_stats = {'method': 'trigram', 'fetched': len(rows)}
+        return rows
+
+    def _shortlist_words(self, unit_source, source_langs, target_langs, minlen, maxlen):
+        """returns the sources (with their targets) in the length window that
+        share a word with unit_source, or all of them if fulltext indexing
+        isn't available or unit_source has few words"""
         # split source into words, remove punctuation and special
         # chars, keep words that are at least 3 chars long
         unit_words = STRIP_REGEXP.sub(' ', unit_source).split()
@@ -300,26 +528,17 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
                        AND fulltext MATCH ?"""
             search_str = " OR ".join(unit_words)
             self.cursor.execute(query, (source_langs, target_langs, minlen, maxlen, search_str))
+            method = 'fulltext'
         else:
             logging.debug("nonfulltext matching")
             query = """SELECT s.text, t.text, s.context, s.lang, t.lang FROM sources s JOIN targets t ON s.sid = t.sid
             WHERE s.lang IN (?) AND t.lang IN (?)
             AND s.length >= ? AND s.length <= ?"""
             self.cursor.execute(query, (source_langs, target_langs, minlen, maxlen))
-
-        results = []
-        for row in self.cursor:
-            result = {}
-            result['source'] = row[0]
-            result['target'] = row[1]
-            result['context'] = row[2]
-            result['quality'] = self.comparer.similarity(unit_source, result['source'], self.min_similarity)
-            if result['quality'] >= self.min_similarity:
-                results.append(result)
-        results.sort(key=lambda match: match['quality'], reverse=True)
-        results = results[:self.max_candidates]
-        logging.debug("results: %s", unicode(results))
-        return results
+            method = 'length'
+        rows = self.cursor.fetchall()
+        self.query_stats = {'method': method, 'fetched': len(rows)}
+        return rows
 
 
 def min_levenshtein_length(length, min_similarity):
@@ -35,43 +35,62 @@ class Builder:
         self.source_lang = source_lang
         self.target_lang = target_lang
 
-        for filename in filenames:
-            if not os.path.exists(filename):
-                print >> sys.stderr, "cannot process %s: does not exist" % filename
-                continue
-            elif os.path.isdir(filename):
-                self.handledir(filename)
-            else:
-                self.handlefile(filename)
-        self.tmdb.connection.commit()
+        count = self.tmdb.add_bulk(self.handlefilenames(filenames),
+                                   self.source_lang, self.target_lang,
+                                   progress=self.progress)
+        print "Units added: %d" % count
+
+    def progress(self, count, rate):
+        print >> sys.stderr, "%d units loaded (%d units/s)" % (count, rate)
 
     def handlefile(self, filename):
         try:
-            store = factory.getobject(filename)
+            # stream the units, compendia can be too big to hold in memory
+            store, units = factory.iterobject(filename)
+            # only translated units are useful as translation memory
+            for unit in units:
+                if unit.istranslatable() and unit.istranslated():
+                    yield {"source": unit.source,
+                           "target": unit.target,
+                           "context": unit.getcontext(),
+                           "source_lang": unit.getsourcelanguage(),
+                           "target_lang": unit.gettargetlanguage(),
+                          }
         except Exception, e:
             print >> sys.stderr, str(e)
             return
-        # do something useful with the store and db
-        try:
-            self.tmdb.add_store(store, self.source_lang, self.target_lang, commit=False)
-        except Exception, e:
-            print e
         print "File added:", filename
 
+    def handlefilenames(self, filenames):
+        """Yields the units to add from the files and directories given on
+        the command line."""
+        for filename in filenames:
+            if not os.path.exists(filename):
+                print >> sys.stderr, "cannot process %s: does not exist" % filename
+                continue
+            elif os.path.isdir(filename):
+                units = self.handledir(filename)
+            else:
+                units = self.handlefile(filename)
+            for unit in units:
+                yield unit
+
     def handlefiles(self, dirname, filenames):
         for filename in filenames:
             pathname = os.path.join(dirname, filename)
             if os.path.isdir(pathname):
-                self.handledir(pathname)
+                units = self.handledir(pathname)
             else:
-                self.handlefile(pathname)
+                units = self.handlefile(pathname)
+            for unit in units:
+                yield unit
 
     def handledir(self, dirname):
         path, name = os.path.split(dirname)
         if name in ["CVS", ".svn", "_darcs", ".git", ".hg", ".bzr"]:
-            return
+            return []
         entries = os.listdir(dirname)
-        self.handlefiles(dirname, entries)
+        return self.handlefiles(dirname, entries)
 
 
 def main():
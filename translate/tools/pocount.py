@@ -180,7 +180,7 @@ def untranslatedmessages(units):
 
 class summarizer:
 
-    def __init__(self, filenames, style=default_style, incomplete_only=False):
+    def __init__(self, filenames, style=default_style, incomplete_only=False, jobs=1):
         self.totals = {}
         self.filecount = 0
         self.longestfilename = 0
@@ -197,6 +197,10 @@ Review Messages, Review Source Words"
             for filename in filenames:  # find longest filename
                 if (len(filename) > self.longestfilename):
                     self.longestfilename = len(filename)
+        if jobs != 1:
+            # Count all files in parallel up front, so that the normal
+            # processing below only reads their statistics from the cache.
+            statsdb.StatsCache().cachefiles(self.collectfiles(filenames), jobs)
         for filename in filenames:
             if not os.path.exists(filename):
                 print >> sys.stderr, "cannot process %s: does not exist" % filename
@@ -225,6 +229,22 @@ Review Messages, Review Source Words"
                 self.totals[key] = 0
             self.totals[key] += stats[key]
 
+    def collectfiles(self, filenames):
+        """Returns all the files that will be handled, in the order in which
+        they will be handled."""
+        for filename in filenames:
+            if not os.path.exists(filename):
+                continue
+            elif os.path.isdir(filename):
+                path, name = os.path.split(filename)
+                if name in ["CVS", ".svn", "_darcs", ".git", ".hg", ".bzr"]:
+                    continue
+                entries = [os.path.join(filename, entry) for entry in os.listdir(filename)]
+                for pathname in self.collectfiles(entries):
+                    yield pathname
+            else:
+                yield filename
+
     def handlefile(self, filename):
         try:
             stats = calcstats(filename)
@@ -273,6 +293,9 @@ def main():
     parser.add_option("--short-words", action="store_const",
                       const=style_csv, dest="style_short_words",
                       help="statistics of words in short format - one line per file")
+    parser.add_option("-j", "--jobs", type="int", dest="jobs", default=1,
+                      metavar="JOBS",
+                      help="count files in JOBS parallel processes (0 for one per CPU)")
 
     (options, args) = parser.parse_args()
 
@@ -304,7 +327,10 @@ def main():
     except Exception:
         pass
 
-    summarizer(args, style, options.incomplete_only)
+    if options.jobs < 0:
+        parser.error("--jobs must not be negative")
+
+    summarizer(args, style, options.incomplete_only, options.jobs or None)
 
 if __name__ == '__main__':
     main()
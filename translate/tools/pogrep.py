@@ -213,14 +213,17 @@ class GrepFilter:
                 return True
         return False
 
-    def filterfile(self, thefile):
-        """runs filters on a translation file object"""
+    def filterfile(self, thefile, units=None):
+        """runs filters on a translation file object, or on the given units
+        of it as they are parsed"""
+        if units is None:
+            units = thefile.units
+        matchingunits = [unit for unit in units if self.filterunit(unit)]
         thenewfile = type(thefile)()
         thenewfile.setsourcelanguage(thefile.sourcelanguage)
         thenewfile.settargetlanguage(thefile.targetlanguage)
-        for unit in thefile.units:
-            if self.filterunit(unit):
-                thenewfile.addunit(unit)
+        for unit in matchingunits:
+            thenewfile.addunit(unit)
 
         if isinstance(thenewfile, poheader):
             thenewfile.updateheader(add=True, **thefile.parseheader())
@@ -323,8 +326,8 @@ class GrepOptionParser(optrecurse.RecursiveOptionParser):
 
 def rungrep(inputfile, outputfile, templatefile, checkfilter):
     """reads in inputfile, filters using checkfilter, writes to outputfile"""
-    fromfile = factory.getobject(inputfile)
-    tofile = checkfilter.filterfile(fromfile)
+    fromfile, units = factory.iterobject(inputfile)
+    tofile = checkfilter.filterfile(fromfile, units)
     if tofile.isempty():
         return False
     outputfile.write(str(tofile))
@@ -22,12 +22,16 @@
 translation memory and existing translations.
 """
 
+import os
+
 from translate.storage import factory
 from translate.storage import xliff, po
 from translate.search import match
 
 # We don't want to reinitialise the TM each time, so let's store it here.
 tmmatcher = None
+# Whether TM files are compiled into snapshots, see match.getsnapshot()
+usesnapshots = True
 
 
 def memory(tmfiles, max_candidates=1, min_similarity=75, max_length=1000):
@@ -35,11 +39,20 @@ def memory(tmfiles, max_candidates=1, min_similarity=75, max_length=1000):
     global tmmatcher
     # Only initialise first time
     if tmmatcher is None:
-        if isinstance(tmfiles, list):
+        if not isinstance(tmfiles, list):
+            tmfiles = [tmfiles]
+        tmstore = None
+        paths = [tmfile for tmfile in tmfiles
+                 if isinstance(tmfile, basestring) and os.path.isfile(tmfile)]
+        if usesnapshots and len(paths) == len(tmfiles):
+            try:
+                tmstore = match.getsnapshot(tmfiles)
+            except EnvironmentError:
+                # we can't write to the cache directory
+                pass
+        if tmstore is None:
             tmstore = [factory.getobject(tmfile) for tmfile in tmfiles]
-        else:
-            tmstore = factory.getobject(tmfiles)
-        tmmatcher = match.matcher(tmstore, max_candidates=max_candidates, min_similarity=min_similarity, max_length=max_length)
+        tmmatcher = match.matcher(tmstore, max_candidates=max_candidates, min_similarity=min_similarity, max_length=max_length, usengrams=True)
     return tmmatcher
 
 